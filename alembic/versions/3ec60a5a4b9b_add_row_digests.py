@@ -0,0 +1,39 @@
+"""add row digests
+
+Revision ID: 3ec60a5a4b9b
+Revises: 9c1597ec0f7f
+Create Date: 2025-01-18 09:12:44.803126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3ec60a5a4b9b'
+down_revision: Union[str, None] = '9c1597ec0f7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+tables = [
+    'bybit_linear_perp_instruments',
+    'bybit_linear_perp_kline_5m',
+    'bybit_linear_perp_kline_15m',
+    'bybit_linear_perp_kline_1h',
+    'bybit_linear_perp_kline_4h',
+    'bybit_linear_perp_kline_1d',
+]
+
+
+def upgrade() -> None:
+    # Existing rows keep a NULL digest and are rewritten once on their next upsert
+    for table in tables:
+        op.add_column(table, sa.Column('digest', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    for table in reversed(tables):
+        op.drop_column(table, 'digest')
@@ -0,0 +1,28 @@
+"""add raw kline pending index
+
+Revision ID: 4a5ecb3ba8ce
+Revises: 3ec60a5a4b9b
+Create Date: 2025-01-19 17:30:52.146720
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a5ecb3ba8ce'
+down_revision: Union[str, None] = '3ec60a5a4b9b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Workers claim the oldest unprocessed rows, keep that scan off the backlog
+    op.create_index('ix_bybit_linear_perp_kline_5m_raw_pending', 'bybit_linear_perp_kline_5m_raw', ['id'], unique=False, postgresql_where=sa.text('NOT is_processed'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bybit_linear_perp_kline_5m_raw_pending', table_name='bybit_linear_perp_kline_5m_raw')
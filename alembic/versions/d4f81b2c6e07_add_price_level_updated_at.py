@@ -0,0 +1,40 @@
+"""add price level updated_at
+
+Revision ID: d4f81b2c6e07
+Revises: c3a9e5f17d62
+Create Date: 2025-02-02 10:41:19.527340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f81b2c6e07'
+down_revision: Union[str, None] = 'c3a9e5f17d62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'crypto_symbols_price_pivot_levels',
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    )
+    op.create_index(
+        op.f('ix_crypto_symbols_price_pivot_levels_updated_at'),
+        'crypto_symbols_price_pivot_levels',
+        ['updated_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f('ix_crypto_symbols_price_pivot_levels_updated_at'),
+        table_name='crypto_symbols_price_pivot_levels',
+    )
+    op.drop_column('crypto_symbols_price_pivot_levels', 'updated_at')
@@ -0,0 +1,31 @@
+"""add kline source id
+
+Revision ID: e5b27c1a9f40
+Revises: d4f81b2c6e07
+Create Date: 2025-02-03 09:12:44.108215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b27c1a9f40'
+down_revision: Union[str, None] = 'd4f81b2c6e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing bars keep a NULL source and take the next raw revision
+    op.add_column(
+        'bybit_linear_perp_kline_5m',
+        sa.Column('source_id', sa.BigInteger(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('bybit_linear_perp_kline_5m', 'source_id')
@@ -0,0 +1,31 @@
+"""add price level digest
+
+Revision ID: f1c84d0e3a52
+Revises: e5b27c1a9f40
+Create Date: 2025-02-03 11:27:05.431862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c84d0e3a52'
+down_revision: Union[str, None] = 'e5b27c1a9f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing levels keep a NULL digest and are rewritten once on the next full run
+    op.add_column(
+        'crypto_symbols_price_pivot_levels',
+        sa.Column('digest', sa.BigInteger(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('crypto_symbols_price_pivot_levels', 'digest')
@@ -1,16 +1,35 @@
+from contextlib import asynccontextmanager
 import json
+from decimal import Decimal
 from typing import List, Optional
+import numpy as np
 from fastapi import (
     FastAPI,
+    HTTPException,
     Query,
     WebSocket,
     WebSocketDisconnect,
 )
 from sqlmodel import text
 from dataManagers.ByBitMarketDataManager import ByBitDataService
+from dataManagers.KlineCache import KlineCache, KlineCacheInvalidator
+from dataManagers.PriceLevelIndex import PriceLevelIndex
+from dataManagers.PriceZones import PriceZoneIndex
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="CryptoData API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Evict cached klines in this worker as ingestion revises them
+    bb = ByBitDataService()
+    invalidator = KlineCacheInvalidator(bb.redis_client, KlineCache(bb)).start()
+    # Loaded up front, requests only merge in what changed since
+    print(f"Loaded {price_levels.reload(bb)} price levels")
+    yield
+    invalidator.stop()
+
+
+app = FastAPI(title="CryptoData API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://frontend:3000"],  # Your frontend URL
@@ -37,6 +56,8 @@ class ConnectionManager:
 
 
 manager = ConnectionManager()
+price_zones = PriceZoneIndex()
+price_levels = PriceLevelIndex()
 
 
 @app.websocket("/ws")
@@ -73,22 +94,27 @@ def read_klines(
 ):
     bb = ByBitDataService()
     klines = bb.get_linear_instrument_klines(
-        symbol=symbol, timeframe=timeframe, data_source="db"
+        symbol=symbol, timeframe=timeframe, data_source="cache", output="records"
     )
     formatted_klines = [
         {
-            "time": kline.period_start.timestamp(),
-            "open": kline.open_price,
-            "high": kline.high_price,
-            "low": kline.low_price,
-            "close": kline.close_price,
-            "volume": kline.turnover,
+            "time": kline["period_start"].timestamp(),
+            "open": kline["open_price"],
+            "high": kline["high_price"],
+            "low": kline["low_price"],
+            "close": kline["close_price"],
+            "volume": kline["turnover"],
         }
         for kline in klines
     ]
     return formatted_klines
 
 
+@app.get("/api/cache/stats")
+def read_kline_cache_stats():
+    return ByBitDataService().get_kline_cache_stats()
+
+
 @app.get("/api/symbols/{symbol}")
 def get_symbol_info(symbol: Optional[str] = None):
     if symbol is None:
@@ -218,3 +244,67 @@ def get_symbol_info(symbol: Optional[str] = None):
         for instrument in instruments_info
     ]
     return formatted_instruments
+
+
+def format_price_zone(zone):
+    return {
+        "low": zone.low,
+        "high": zone.high,
+        "price": zone.price,
+        "touches": zone.touches,
+        "weight": zone.weight,
+        "supports": zone.supports,
+        "resistances": zone.resistances,
+        "last_touch": zone.last_touch.timestamp(),
+    }
+
+
+@app.get("/api/zones/{symbol}")
+def read_price_zones(
+    symbol: str,
+    price: float = Query(..., description="Price to find the nearest zones around"),
+    k: int = Query(3, ge=1, description="Zones to return on each side"),
+    timeframe: str = Query("1h", description="Timeframe of the pivots"),
+    lookback: int = Query(10, description="Lookback period of the pivots"),
+    refresh: bool = Query(False, description="Rebuild zones from the database"),
+):
+    key = (symbol, timeframe, lookback)
+    if refresh or price_zones.stale(key):
+        price_zones.refresh(
+            ByBitDataService(), symbol, timeframe=timeframe, lookback=lookback
+        )
+    below, inside, above = price_zones.nearest(key, Decimal(repr(price)), k=k)
+    return {
+        "symbol": symbol,
+        "price": price,
+        "below": [format_price_zone(zone) for zone in below],
+        "inside": format_price_zone(inside) if inside else None,
+        "above": [format_price_zone(zone) for zone in above],
+    }
+
+
+@app.get("/api/levels/nearest")
+def read_nearest_price_levels(
+    symbols: List[str] = Query(..., description="Symbols to look up"),
+    prices: List[float] = Query(..., description="Price per symbol, same order"),
+    timeframe: str = Query("1h", description="Timeframe of the pivots"),
+    lookback: int = Query(10, description="Lookback period of the pivots"),
+):
+    if len(symbols) != len(prices):
+        raise HTTPException(
+            status_code=400, detail="symbols and prices must have the same length"
+        )
+    if price_levels.stale():
+        price_levels.refresh(ByBitDataService())
+    support, resistance = price_levels.nearest(
+        symbols, prices, timeframe=timeframe, lookback=lookback
+    )
+    return [
+        {
+            "symbol": symbol,
+            "price": price,
+            "support": None if np.isnan(below) else float(below),
+            "resistance": None if np.isnan(above) else float(above),
+        }
+        for symbol, price, below, above in zip(symbols, prices, support, resistance)
+    ]
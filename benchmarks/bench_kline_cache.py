@@ -0,0 +1,119 @@
+"""
+Range read latency of the one key per bar Redis layout (SCAN + GET) against
+the per (timeframe, symbol) sorted sets (ZRANGEBYSCORE) with the keyspace
+filled to --keys bars. Runs against a scratch Redis database that is
+flushed first, so point --db at one nothing else uses.
+
+    python -m benchmarks.bench_kline_cache --keys 10000000 --symbols 500
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from redis import Redis
+from dataManagers import KlineCodec
+from dataManagers.ByBitMarketDataManager import ByBitDataService
+
+START = datetime(2020, 1, 1)
+
+
+def populate(bb: ByBitDataService, n_keys: int, n_symbols: int, batch_size: int):
+    bars = n_keys // n_symbols
+    pipeline = bb.redis_client.pipeline(transaction=False)
+    for s in range(n_symbols):
+        for i in range(bars):
+            period_start = START + timedelta(minutes=5 * i)
+            kline = {
+                "symbol": f"SYM{s}USDT",
+                "period_start": period_start,
+                "open_price": "100.5",
+                "high_price": "101.25",
+                "low_price": "99.75",
+                "close_price": "100.75",
+                "volume": "12.345",
+                "turnover": "1240.12345678",
+            }
+            key = bb._kline_redis_key(
+                "5m", kline["symbol"], int(period_start.timestamp())
+            )
+            pipeline.set(key, KlineCodec.encode_v1(kline))
+            if (s * bars + i + 1) % batch_size == 0:
+                pipeline.execute()
+    pipeline.execute()
+    return bars
+
+
+def scan_read(bb: ByBitDataService, symbol: str, start: int, end: int):
+    # The read path before sorted sets, kept here for comparison
+    keys = [
+        key
+        for key in bb.redis_client.scan_iter(f"bybit:kline:5m:{symbol}:*", 10000)
+        if start <= int(key.split(":")[-1]) <= end
+    ]
+    pipeline = bb.redis_client.pipeline()
+    for key in keys:
+        pipeline.get(key)
+    return [json.loads(value) for value in pipeline.execute() if value]
+
+
+def zset_read(bb: ByBitDataService, symbol: str, start: int, end: int):
+    return bb.get_linear_instrument_klines(
+        symbol,
+        "5m",
+        start_time=datetime.fromtimestamp(start),
+        end_time=datetime.fromtimestamp(end),
+        data_source="redis",
+        output="numpy",
+    )["period_start"]
+
+
+def timed(label: str, fn, bb: ByBitDataService, n_symbols: int, reads: int, span):
+    latencies = []
+    start = int(START.timestamp())
+    end = int((START + span).timestamp())
+    for i in range(reads):
+        started = time.perf_counter()
+        rows = fn(bb, f"SYM{i % n_symbols}USDT", start, end)
+        latencies.append(time.perf_counter() - started)
+    print(
+        f"{label:>6}: {len(rows)} bars per read, "
+        f"median {statistics.median(latencies) * 1000:10.2f}ms, "
+        f"max {max(latencies) * 1000:10.2f}ms"
+    )
+
+
+def main(n_keys: int, n_symbols: int, reads: int, db: int, batch_size: int):
+    bb = ByBitDataService()
+    bb.redis_client = Redis(db=db, decode_responses=True)
+    bb.redis_bytes_client = Redis(db=db)
+    bb.redis_client.flushdb()
+    started = time.perf_counter()
+    bars = populate(bb, n_keys, n_symbols, batch_size)
+    print(
+        f"Wrote {bars * n_symbols} bars for {n_symbols} symbols in "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+
+    span = timedelta(days=1)
+    timed("scan", scan_read, bb, n_symbols, min(reads, 5), span)
+
+    started = time.perf_counter()
+    bb.migrate_linear_instrument_klines_cache(delete_old=False, batch_size=batch_size)
+    print(f"Migrated in {time.perf_counter() - started:.1f}s")
+    timed("zset", zset_read, bb, n_symbols, reads, span)
+    bb.redis_client.flushdb()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Redis kline layouts.")
+    parser.add_argument("--keys", type=int, default=10_000_000, help="Bars to cache")
+    parser.add_argument("--symbols", type=int, default=500, help="Symbols")
+    parser.add_argument("--reads", type=int, default=100, help="Range reads to time")
+    parser.add_argument("--db", type=int, default=15, help="Scratch Redis database")
+    parser.add_argument(
+        "--batch_size", type=int, default=10000, help="Commands per pipeline"
+    )
+    args = parser.parse_args()
+    main(args.keys, args.symbols, args.reads, args.db, args.batch_size)
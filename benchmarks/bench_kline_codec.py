@@ -0,0 +1,64 @@
+"""
+Decode time of cached klines: JSON with Decimal values (v1) against packed
+int64 records decoded with np.frombuffer (v2). No Redis needed, the values
+are encoded in memory.
+
+    python -m benchmarks.bench_kline_codec --bars 8640
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from dataManagers import KlineCodec
+from dataManagers.ByBitMarketDataManager import ByBitDataService
+
+
+def synthetic_klines(n: int):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "symbol": "BENCHUSDT",
+            "period_start": start + timedelta(minutes=5 * i),
+            "open_price": Decimal("100.5") + i,
+            "high_price": Decimal("101.25") + i,
+            "low_price": Decimal("99.75") + i,
+            "close_price": Decimal("100.75") + i,
+            "volume": Decimal("12.345"),
+            "turnover": Decimal("1240.12345678"),
+        }
+        for i in range(n)
+    ]
+
+
+def timed(label: str, fn, values: list, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(values)
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:>12}: {best * 1000:8.2f}ms ({len(values) / best:12.0f} bars/s)")
+
+
+def main(n_bars: int):
+    bb = ByBitDataService.__new__(ByBitDataService)
+    klines = synthetic_klines(n_bars)
+    v1 = [KlineCodec.encode_v1(kline) for kline in klines]
+    v2 = [KlineCodec.encode_kline(kline) for kline in klines]
+    print(
+        f"Decoding {n_bars} bars : v1 {sum(map(len, v1))} bytes, "
+        f"v2 {sum(map(len, v2))} bytes"
+    )
+    timed(
+        "v1 decimals", lambda v: [bb._deserialize_kline(json.loads(x)) for x in v], v1
+    )
+    timed("v2 decimals", KlineCodec.decode_klines_exact, v2)
+    timed("v2 numpy", KlineCodec.decode_klines, v2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark kline cache decoding.")
+    parser.add_argument("--bars", type=int, default=8640, help="Bars, 30 days of 5m")
+    args = parser.parse_args()
+    main(args.bars)
@@ -0,0 +1,101 @@
+"""
+Reading a 1 year 5m series (105120 bars) from Postgres: ORM rows turned into
+a DataFrame, as the pivots used to, against the Core column select building
+numpy arrays from the cursor. The series is written for a dedicated symbol
+inside a transaction that is rolled back afterwards.
+
+    python -m benchmarks.bench_kline_read --days 365
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pandas as pd
+from sqlmodel import select
+from dataManagers.ByBitMarketDataManager import (
+    ByBitDataService,
+    KLINE_INDEX_ELEMENTS,
+)
+from database import Operations as dbOperations
+from database.models import Market
+
+SYMBOL = "BENCHUSDT"
+START = datetime(2020, 1, 1)
+
+
+def synthetic_klines(n: int):
+    return [
+        {
+            "symbol": SYMBOL,
+            "period_start": START + timedelta(minutes=5 * i),
+            "open_price": Decimal("100.5") + i,
+            "high_price": Decimal("101.25") + i,
+            "low_price": Decimal("99.75") + i,
+            "close_price": Decimal("100.75") + i,
+            "volume": Decimal("12.345"),
+            "turnover": Decimal("1240.12345678"),
+        }
+        for i in range(n)
+    ]
+
+
+def orm_read(bb: ByBitDataService):
+    # The read path before the columnar select, kept here for comparison
+    tbl = Market.ByBitLinearInstrumentsKline5m
+    stmt = select(tbl).where(tbl.symbol == SYMBOL).order_by(tbl.period_start)
+    rows = bb.dbClient.exec(stmt).all()
+    df = pd.DataFrame([row.to_dict() for row in rows])
+    bb.dbClient.expunge_all()
+    return df
+
+
+def columnar_read(bb: ByBitDataService, output: str):
+    return bb.get_linear_instrument_klines(
+        SYMBOL, "5m", data_source="db", output=output
+    )
+
+
+def timed(label: str, fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    del result
+
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:>8}: {len(result)} bars, best {best * 1000:9.1f}ms, "
+        f"peak {peak / 2**20:8.1f}MiB"
+    )
+
+
+def main(days: int):
+    bb = ByBitDataService()
+    rows = synthetic_klines(days * 288)
+    dbOperations.bulk_upsert(
+        bb.dbClient,
+        Market.ByBitLinearInstrumentsKline5m,
+        rows,
+        index_elements=KLINE_INDEX_ELEMENTS,
+    )
+    bb.dbClient.flush()
+    print(f"Reading {len(rows)} 5m klines from bybit_linear_perp_kline_5m")
+    try:
+        timed("orm", lambda: orm_read(bb))
+        timed("numpy", lambda: columnar_read(bb, "numpy")["period_start"])
+        timed("pandas", lambda: columnar_read(bb, "pandas"))
+    finally:
+        bb.dbClient.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark kline read paths.")
+    parser.add_argument("--days", type=int, default=365, help="Days of 5m bars")
+    args = parser.parse_args()
+    main(args.days)
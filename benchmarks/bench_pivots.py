@@ -0,0 +1,74 @@
+"""
+utils.pivotid applied row by row vs the vectorized utils.pivot_points on a
+synthetic random walk, then pivot_points per lookback vs a single
+multi_lookback_pivot_points pass. Checks all produce the same 0/1/2/3 series.
+
+    python -m benchmarks.bench_pivots --bars 5000 --lookback 10 --lookbacks 10 20 50
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import utils
+
+
+def synthetic_klines(n: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n)).round(2)
+    spread = rng.uniform(0, 1, n).round(2)
+    return pd.DataFrame({"low_price": close - spread, "high_price": close + spread})
+
+
+def main(bars: int, lookback: int, lookbacks: list):
+    df = synthetic_klines(bars)
+
+    started = time.perf_counter()
+    old = df.apply(lambda x: utils.pivotid(df, x.name, lookback, lookback), axis=1)
+    pivotid_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    new = utils.pivot_points(df["low_price"], df["high_price"], lookback, lookback)
+    vectorized_elapsed = time.perf_counter() - started
+
+    identical = bool((old.to_numpy() == new).all())
+    print(f"{bars} bars, lookback {lookback}, identical: {identical}")
+    print(f"  pivotid (df.apply)   {pivotid_elapsed:8.3f}s")
+    print(f"  pivot_points         {vectorized_elapsed:8.3f}s")
+    print(f"  speedup              {pivotid_elapsed / vectorized_elapsed:8.0f}x")
+
+    df = synthetic_klines(bars * 20)
+    started = time.perf_counter()
+    each = {
+        k: utils.pivot_points(df["low_price"], df["high_price"], k, k)
+        for k in lookbacks
+    }
+    each_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    together = utils.multi_lookback_pivot_points(
+        df["low_price"], df["high_price"], lookbacks
+    )
+    together_elapsed = time.perf_counter() - started
+
+    identical = all((each[k] == together[k]).all() for k in lookbacks)
+    print(f"{len(df)} bars, lookbacks {lookbacks}, identical: {identical}")
+    print(f"  pivot_points per lookback   {each_elapsed:8.3f}s")
+    print(f"  multi_lookback_pivot_points {together_elapsed:8.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pivot detection.")
+    parser.add_argument("--bars", type=int, default=5000, help="Bars per series")
+    parser.add_argument("--lookback", type=int, default=10, help="Bars each side")
+    parser.add_argument(
+        "--lookbacks",
+        type=int,
+        nargs="+",
+        default=[10, 20, 50],
+        help="Lookbacks for the multi lookback comparison",
+    )
+
+    args = parser.parse_args()
+
+    main(bars=args.bars, lookback=args.lookback, lookbacks=args.lookbacks)
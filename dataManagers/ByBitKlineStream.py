@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+import threading
+from typing import Dict, List, Optional
+import pandas as pd
+from xchanges.ByBit import KlineStream
+from dataManagers.ByBitMarketDataManager import ByBitDataIngestion
+import utils
+
+
+class ByBitKlineStreamIngestion:
+    """
+    Long running 5m kline ingestion from ByBit's public WebSocket. Updates are
+    coalesced per (symbol, bar) in memory and confirmed bars are flushed to
+    Postgres and Redis every `flush_interval_ms`. At startup and after a
+    reconnect the bars missed while down or disconnected are backfilled
+    through fetch_kline.
+    """
+
+    def __init__(
+        self,
+        symbols: Optional[List[str]] = None,
+        flush_interval_ms: int = 500,
+        testnet: bool = False,
+        url: Optional[str] = None,
+        ingestion: Optional[ByBitDataIngestion] = None,
+        backfill_workers: int = 8,
+    ):
+        self.ingestion = ingestion or ByBitDataIngestion(testnet=testnet)
+        self.symbols = symbols or [
+            instrument.symbol
+            for instrument in self.ingestion.bb_data_service.get_linear_usdt_instruments()
+        ]
+        self.flush_interval = flush_interval_ms / 1000
+        self.backfill_workers = backfill_workers
+        self.timeframe = "5m"
+
+        self.lock = threading.Lock()
+        # (symbol, start ms) -> kline in get_kline's list layout
+        self.confirmed_bars: Dict[tuple, list] = {}
+        self.last_confirmed: Dict[str, int] = {}
+        self.backfill_pending = threading.Event()
+        self.stopped = threading.Event()
+
+        self.stream = KlineStream(
+            symbols=self.symbols,
+            interval=self.ingestion.default_interval,
+            on_kline=self._on_kline,
+            on_reconnect=self.backfill_pending.set,
+            testnet=testnet,
+            url=url,
+        )
+
+    def _on_kline(self, symbol: str, kline: dict):
+        row = [
+            str(kline["start"]),
+            kline["open"],
+            kline["high"],
+            kline["low"],
+            kline["close"],
+            kline["volume"],
+            kline["turnover"],
+        ]
+        with self.lock:
+            if kline.get("confirm"):
+                self.confirmed_bars[(symbol, int(kline["start"]))] = row
+
+    def flush(self) -> int:
+        with self.lock:
+            bars, self.confirmed_bars = self.confirmed_bars, {}
+        if not bars:
+            return 0
+
+        by_symbol = defaultdict(list)
+        for (symbol, _), row in bars.items():
+            by_symbol[symbol].append(row)
+        df = pd.concat(
+            [
+                self.ingestion._convert_xchange_klines_frame(symbol, rows)
+                for symbol, rows in by_symbol.items()
+            ],
+            ignore_index=True,
+        )
+
+        try:
+            updated = self.ingestion._store_linear_instruments_klines_frame(df)
+            self.ingestion.dbClient.commit()
+        except Exception as e:
+            self.ingestion.dbClient.rollback()
+            print(f"Database error flushing {len(bars)} streamed klines: {e}")
+            # Retry on the next tick unless a newer update arrived meanwhile
+            with self.lock:
+                for key, row in bars.items():
+                    self.confirmed_bars.setdefault(key, row)
+            return 0
+
+        self.ingestion._cache_linear_instruments_klines(
+            self.timeframe, df.to_dict("records")
+        )
+        for symbol, start in bars:
+            self.last_confirmed[symbol] = max(self.last_confirmed.get(symbol, 0), start)
+        print(f"Flushed {len(bars)} streamed klines : updated/created {updated}")
+        return updated
+
+    def seed_last_confirmed(self):
+        """
+        Start from the latest stored bar per symbol so the first backfill
+        covers the downtime since the previous run. Symbols without any
+        stored bars are left to the gap sync.
+        """
+        latest = (
+            self.ingestion.bb_data_service.get_latest_linear_instrument_kline_starts(
+                self.symbols
+            )
+        )
+        for symbol, period_start in latest.items():
+            start = utils.epoch_seconds(period_start) * 1000
+            self.last_confirmed[symbol] = max(self.last_confirmed.get(symbol, 0), start)
+
+    def backfill_gaps(self):
+        """Fetch bars after each symbol's last confirmed one, at startup and reconnects"""
+        now = datetime.now()
+        step = timedelta(minutes=int(self.ingestion.default_interval.value))
+        jobs = [
+            (symbol, datetime.fromtimestamp(start / 1000) + step, now)
+            for symbol, start in self.last_confirmed.items()
+        ]
+        if jobs:
+            print(f"Backfilling {len(jobs)} symbols after reconnect")
+            self.ingestion._download_linear_instruments_klines_concurrently(
+                jobs=jobs, max_workers=self.backfill_workers
+            )
+
+    def run(self):
+        """Blocks until stop() is called, this thread is the only DB writer"""
+        self.seed_last_confirmed()
+        self.backfill_pending.set()
+        self.stream.start()
+        try:
+            while not self.stopped.wait(self.flush_interval):
+                if self.backfill_pending.is_set():
+                    self.backfill_pending.clear()
+                    self.backfill_gaps()
+                self.flush()
+        finally:
+            self.stream.stop()
+            self.flush()
+
+    def stop(self):
+        self.stopped.set()
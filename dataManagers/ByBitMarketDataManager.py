@@ -1,20 +1,101 @@
 import asyncio
+from functools import partial
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from decimal import Decimal
 import json
-from sqlmodel import Session, and_, select, text, insert, SQLModel, func
+import multiprocessing
+from sqlmodel import (
+    Session,
+    and_,
+    select,
+    text,
+    insert,
+    update,
+    delete,
+    SQLModel,
+    func,
+)
+from sqlalchemy import BigInteger, DateTime, Float, any_, bindparam, cast
 from xchanges.ByBit import MarketData, Category, Interval, ContractType
 from database.models import Market, PriceLevels
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from database import Operations as dbOperations
 from datetime import datetime, date, timedelta
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
+import numpy as np
 import pandas as pd
+from dateutil.tz import tzlocal
 from redis import ConnectionPool, Redis
 from sqlmodel.ext.asyncio.session import AsyncSession
 from collections import namedtuple
-from utils import pivotid
+import utils
+from dataManagers import KlineCodec
+from dataManagers.KlineCache import KLINES_CHANGED_CHANNEL, KlineCache, shared_stats
+
+KLINE_INDEX_ELEMENTS = ["symbol", "period_start"]
+KLINE_VALUE_COLUMNS = Market.KLINE_VALUE_COLUMNS
+KLINE_PRICE_COLUMNS = ["open_price", "high_price", "low_price", "close_price"]
+# numeric(38, 8) prices as exact int64 for vectorized batch aggregation
+KLINE_PRICE_DECIMALS = 8
+KLINE_PRICE_SCALE = 10**KLINE_PRICE_DECIMALS
+# How far back before the last watermark a rollup looks for changed 5m rows
+KLINE_ROLLUP_OVERLAP = timedelta(minutes=10)
+PRICE_LEVEL_INDEX_ELEMENTS = [
+    "exchange",
+    "symbol",
+    "instrument_type",
+    "timeframe",
+    "period_start",
+    "lookback_period",
+]
+PRICE_PIVOT_STATE_INDEX_ELEMENTS = [
+    "exchange",
+    "symbol",
+    "instrument_type",
+    "timeframe",
+    "lookback_period",
+]
+
+ShardResult = namedtuple(
+    "ShardResult", ["shard", "symbols", "done", "failed", "elapsed"]
+)
+
+
+def _run_symbol_job(bb, job: str, shard: int, symbols: list, kwargs: dict):
+    """
+    Run `job` for each of `symbols` on `bb`. A failing symbol is rolled back
+    and reported in the ShardResult instead of raised, serial and sharded runs
+    alike.
+    """
+    started = time.perf_counter()
+    done, failed = [], {}
+    for symbol in symbols:
+        try:
+            if job == "aggregate":
+                bb.aggregate_symbol_klines(symbol=symbol, **kwargs)
+            elif job == "pivots":
+                bb.process_pivot_levels(symbol=symbol, **kwargs)
+            else:
+                raise ValueError(f"Unknown shard job {job}")
+            done.append(symbol)
+        except Exception as e:
+            bb.dbClient.rollback()
+            failed[symbol] = str(e)
+    return ShardResult(shard, symbols, done, failed, time.perf_counter() - started)
+
+
+def _run_symbol_shard(job: str, shard: int, symbols: list, kwargs: dict):
+    """
+    Process pool entry point. Each worker builds its own ByBitDataIngestion,
+    so its own engine and session.
+    """
+    bb = ByBitDataIngestion()
+    try:
+        return _run_symbol_job(bb, job, shard, symbols, kwargs)
+    finally:
+        bb.dbClient.close()
 
 
 class ByBitDataIngestion:
@@ -53,26 +134,43 @@ class ByBitDataIngestion:
             instrument.symbol: instrument for instrument in db_instruments
         }
 
-        inserts, updates, deletes = 0, 0, 0
+        if not bb_instruments:
+            print("No linear instruments fetched, leaving instruments unchanged")
+            return (0, 0, 0)
+
+        tbl = Market.ByBitLinearInstruments
+        insert_rows, update_rows = [], []
         for bb_symbol, bb_instrument in bb_instruments_map.items():
             current_instrument = self._convert_xchange_instruments_dict(bb_instrument)
             # Skip if not USDT
             if current_instrument.quote_coin != self.quote_coin:
                 continue
+            row = current_instrument.model_dump(exclude={"id"})
             existing_instrument = db_instruments_map.get(bb_symbol)
             if existing_instrument:
                 if not existing_instrument.is_equal(current_instrument):
-                    updates += 1
-                    self.dbClient.add(existing_instrument)
+                    update_rows.append({"id": existing_instrument.id, **row})
             else:
-                self.dbClient.add(current_instrument)
-                inserts += 1
+                insert_rows.append(row)
+        delete_symbols = [
+            db_symbol
+            for db_symbol in db_instruments_map
+            if db_symbol not in bb_instruments_map
+        ]
 
-        for db_symbol, db_instrument in db_instruments_map.items():
-            if db_symbol not in bb_instruments_map:
-                self.dbClient.delete(db_instrument)
-                deletes += 1
+        # One statement per kind of change instead of a flush per instrument
+        if insert_rows:
+            self.dbClient.execute(insert(tbl), insert_rows)
+        if update_rows:
+            self.dbClient.execute(update(tbl), update_rows)
+        if delete_symbols:
+            self.dbClient.execute(delete(tbl).where(tbl.symbol.in_(delete_symbols)))
         self.dbClient.commit()
+        inserts, updates, deletes = (
+            len(insert_rows),
+            len(update_rows),
+            len(delete_symbols),
+        )
         print(
             f"Processed linear USDT instruments: {inserts} inserts, {updates} updates, {deletes} deletes"
         )
@@ -97,9 +195,10 @@ class ByBitDataIngestion:
         bb.set_min_price(xchange_dict["priceFilter"]["minPrice"])
         bb.set_max_price(xchange_dict["priceFilter"]["maxPrice"])
         bb.set_tick_size(xchange_dict["priceFilter"]["tickSize"])
+        bb.set_digest()
         return bb
 
-    def _download_linear_instruments_klines(
+    def _fetch_linear_instruments_klines(
         self,
         symbol: str,
         start_time: datetime,
@@ -112,70 +211,219 @@ class ByBitDataIngestion:
             "start_time": start_time,
             "end_time": end_time,
         }
-        klines = self.client.fetch_kline(**params)
+        return self.client.fetch_kline(**params)
+
+    def _convert_xchange_klines_frame(self, symbol: str, klines: list):
+        """
+        Decode get_kline's list[list[str]] column-wise in one pass. Values keep
+        the exchange's decimal strings (written as-is by COPY), validation runs
+        vectorized on a float view and drops rows that don't parse.
+        """
         if not klines:
-            print(f"No klines found for {symbol}")
-            return
+            return pd.DataFrame(
+                columns=["symbol", "period_start", *KLINE_VALUE_COLUMNS]
+            )
+        columns = list(zip(*klines))
+        start_ms = pd.to_numeric(pd.Series(columns[0]), errors="coerce")
+        period_start = (
+            pd.to_datetime(start_ms, unit="ms", utc=True)
+            .dt.tz_convert(tzlocal())
+            .dt.tz_localize(None)
+        )
+        df = pd.DataFrame({"symbol": symbol, "period_start": period_start})
+        is_valid = period_start.notna().to_numpy().copy()
+        for name, values in zip(KLINE_VALUE_COLUMNS, columns[1:]):
+            numeric = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy()
+            is_valid &= np.isfinite(numeric)
+            df[name] = values
 
-        # Process Klines
-        processed_klines = []
-        for kline in klines:
-            new_kline = Market.ByBitLinearInstrumentsKline5m()
-            new_kline.set_symbol(symbol)
-            new_kline.process_xchange_info(kline)
-            processed_klines.append(new_kline)
+        if not is_valid.all():
+            print(f"Error converting {(~is_valid).sum()} klines for {symbol}")
+        return df[is_valid].reset_index(drop=True)
 
-        stmt = select(Market.ByBitLinearInstrumentsKline5m).where(
-            and_(
-                Market.ByBitLinearInstrumentsKline5m.symbol == symbol,
-                Market.ByBitLinearInstrumentsKline5m.period_start
-                <= datetime.fromtimestamp(int(klines[0][0]) / 1000),
-                Market.ByBitLinearInstrumentsKline5m.period_start
-                >= datetime.fromtimestamp(int(klines[-1][0]) / 1000),
+    def _store_linear_instruments_klines(
+        self, symbol: str, klines: list, stored: Optional[list] = None
+    ):
+        df = self._convert_xchange_klines_frame(symbol, klines)
+        if stored is not None:
+            stored.append(df)
+        return self._store_linear_instruments_klines_frame(df)
+
+    def _cache_linear_instruments_klines(self, timeframe: str, klines: list):
+        """
+        Write committed klines (dicts) through to redis and tell API workers
+        to evict them. Redis is only a cache, a failure here is reported and
+        never fails the write.
+        """
+        if not klines:
+            return 0
+        try:
+            cached = self.bb_data_service.cache_linear_instrument_klines(
+                timeframe, klines
             )
-        )
+            self.bb_data_service.publish_klines_changed(timeframe, klines)
+            return cached
+        except Exception as e:
+            print(f"Redis error caching {len(klines)} {timeframe} klines: {e}")
+            return 0
 
-        # Get existing records
-        existing_records = {
-            (record.symbol, record.period_start): record
-            for record in self.dbClient.exec(stmt).all()
-        }
+    def _store_linear_instruments_klines_frame(self, df: pd.DataFrame):
+        if df.empty:
+            return 0
 
-        # Update existing records and create new ones
-        to_update_or_create = []
+        # Unchanged klines are filtered inside the merge by comparing digests
+        return dbOperations.bulk_upsert(
+            self.dbClient,
+            Market.ByBitLinearInstrumentsKline5m,
+            df.to_dict("records"),
+            index_elements=KLINE_INDEX_ELEMENTS,
+            computed_columns=Market.KLINE_COMPUTED_COLUMNS,
+            distinct_column="digest",
+        )
 
-        for kline in processed_klines:
-            key = (kline.symbol, kline.period_start)
-            existing = existing_records.get(key)
-            if existing:
-                # Skip if existing record is the same
-                if existing.is_equal(kline):
-                    continue
+    def _land_linear_instruments_klines(self, symbol: str, klines: list):
+        downloaded_at = int(time.time())
+        rows = [
+            {
+                "downloaded_at": downloaded_at,
+                "symbol": symbol,
+                "startTime": kline[0],
+                "openPrice": kline[1],
+                "highPrice": kline[2],
+                "lowPrice": kline[3],
+                "closePrice": kline[4],
+                "volume": kline[5],
+                "turnover": kline[6],
+            }
+            for kline in klines
+        ]
+        return dbOperations.bulk_insert(
+            self.dbClient, Market.ByBitLinearInstrumentsKline5mRaw, rows
+        )
 
-            stmt = self._update_insert_stmt_for_postgres(
-                tbl=Market.ByBitLinearInstrumentsKline5m,
-                data_for_insert=kline.to_dict(),
-            )
-            to_update_or_create.append(stmt)
-            self.dbClient.exec(stmt)
+    def _download_linear_instruments_klines(
+        self,
+        symbol: str,
+        start_time: datetime,
+        end_time: datetime,
+    ):
+        klines = self._fetch_linear_instruments_klines(symbol, start_time, end_time)
+        if not klines:
+            print(f"No klines found for {symbol}")
+            return
+
+        stored = []
+        updated = self._store_linear_instruments_klines(symbol, klines, stored=stored)
 
         # Commit transaction
         try:
             self.dbClient.commit()
             print(
-                f"Downloaded {symbol}({start_time} -> {end_time}) : updated/created {len(to_update_or_create)}"
+                f"Downloaded {symbol}({start_time} -> {end_time}) : updated/created {updated}"
             )
 
         except Exception as e:
             self.dbClient.rollback()
             print(f"Database error for {symbol}: {e}")
             raise
+        self._cache_linear_instruments_klines("5m", stored[0].to_dict("records"))
+
+    def _timed_fetch_linear_instruments_klines(
+        self, symbol: str, start_time: datetime, end_time: datetime
+    ):
+        started = time.perf_counter()
+        klines = self._fetch_linear_instruments_klines(symbol, start_time, end_time)
+        return klines, time.perf_counter() - started
+
+    def _download_linear_instruments_klines_concurrently(
+        self,
+        jobs: list,
+        max_workers: int,
+        write_batch_size: int = 50,
+        on_stored=None,
+        store=None,
+    ):
+        """
+        Fan fetch_kline out over a thread pool (throttled by the client's shared
+        rate limiter) while this thread stays the only writer on dbClient and
+        commits once per `write_batch_size` jobs.
+
+        `jobs` is a list of (symbol, start_time, end_time). `store(symbol, klines)`
+        writes one job's klines and defaults to the normalized 5m upsert, which
+        is written through to redis after each commit.
+        `on_stored` is called with (symbol, start_time, end_time, klines) before
+        each batch commit so callers can record progress in the same transaction.
+        """
+        stored = []
+        store = store or partial(self._store_linear_instruments_klines, stored=stored)
+        started = time.perf_counter()
+        latencies = defaultdict(float)
+        pending_writes = []
+        updated = 0
+
+        def flush():
+            nonlocal updated
+            try:
+                for job, klines in pending_writes:
+                    updated += store(job[0], klines)
+                    if on_stored is not None:
+                        on_stored(*job, klines)
+                self.dbClient.commit()
+            except Exception as e:
+                self.dbClient.rollback()
+                print(f"Database error for {[job for job, _ in pending_writes]}: {e}")
+                raise
+            pending_writes.clear()
+            if stored:
+                self._cache_linear_instruments_klines(
+                    "5m", pd.concat(stored, ignore_index=True).to_dict("records")
+                )
+                stored.clear()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._timed_fetch_linear_instruments_klines, *job): job
+                for job in jobs
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                klines, latency = future.result()
+                latencies[job[0]] += latency
+                if not klines:
+                    print(f"No klines found for {job[0]}({job[1]} -> {job[2]})")
+                    continue
+                pending_writes.append((job, klines))
+                if len(pending_writes) >= write_batch_size:
+                    flush()
+        flush()
+
+        wall_clock = time.perf_counter() - started
+        self._report_download_latencies(latencies, wall_clock, updated)
+        return dict(latencies), wall_clock
+
+    def _report_download_latencies(
+        self, latencies: Dict[str, float], wall_clock: float, updated: int
+    ):
+        if latencies:
+            ordered = sorted(latencies.items(), key=lambda x: x[1], reverse=True)
+            values = sorted(latencies.values())
+            print(
+                f"Fetch latency over {len(values)} symbols: "
+                f"p50={values[len(values) // 2]:.3f}s "
+                f"p95={values[int(len(values) * 0.95)]:.3f}s "
+                f"max={values[-1]:.3f}s"
+            )
+            for symbol, latency in ordered:
+                print(f"  {symbol}: {latency:.3f}s")
+        print(f"Downloaded klines in {wall_clock:.2f}s : updated/created {updated}")
 
     def download_linear_instrument_klines(
         self,
         symbol: Optional[str] = None,
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
+        max_workers: int = 1,
+        landing: bool = False,
     ):
         # Determine Parameters for Fetching Klines
         start_time = start_time or (datetime.now() - timedelta(minutes=15))
@@ -189,6 +437,15 @@ class ByBitDataIngestion:
             all_instruments = self.bb_data_service.get_linear_usdt_instruments()
             symbols_to_download = [instrument.symbol for instrument in all_instruments]
 
+        # Landing only appends raw rows, process_raw_linear_instruments_klines
+        # normalizes them separately
+        if max_workers > 1 or landing:
+            return self._download_linear_instruments_klines_concurrently(
+                jobs=[(s, start_time, end_time) for s in symbols_to_download],
+                max_workers=max_workers,
+                store=self._land_linear_instruments_klines if landing else None,
+            )
+
         # Download Klines for each symbol
         for symbol in symbols_to_download:
             self._download_linear_instruments_klines(
@@ -197,7 +454,9 @@ class ByBitDataIngestion:
                 end_time=end_time,
             )
 
-    def download_klines_by_date(self, kline_date: date, symbol: str = None):
+    def download_klines_by_date(
+        self, kline_date: date, symbol: str = None, max_workers: int = 1
+    ):
         start_time = datetime.combine(kline_date, datetime.min.time())
         end_time = start_time + timedelta(days=1) - timedelta(seconds=1)
 
@@ -206,23 +465,511 @@ class ByBitDataIngestion:
             symbol=symbol,
             start_time=start_time,
             end_time=end_time,
+            max_workers=max_workers,
         )
 
+    def _plan_linear_instruments_klines_backfill(
+        self,
+        symbols: list,
+        start_time: datetime,
+        end_time: datetime,
+        launch_times: Optional[Dict[str, int]] = None,
+        limit: int = 1000,
+    ):
+        interval_minutes = int(self.default_interval.value)
+        launch_times = launch_times or {}
+        completed = self.bb_data_service.get_completed_kline_backfill_windows(
+            symbols=symbols,
+            interval=self.default_interval.value,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        return [
+            (symbol, window_start, window_end)
+            for symbol in symbols
+            for window_start, window_end in utils.kline_windows(
+                start_time, end_time, interval_minutes, limit
+            )
+            if (symbol, window_start, window_end) not in completed
+            # Nothing to download before the symbol was listed
+            and window_end.timestamp() >= (launch_times.get(symbol) or 0)
+        ]
+
+    def _record_kline_backfill_window(
+        self, symbol: str, window_start: datetime, window_end: datetime, klines: list
+    ):
+        # The window that is still being traded is never final
+        if window_end >= datetime.now():
+            return
+        self.dbClient.add(
+            Market.ByBitLinearInstrumentsKlineBackfill(
+                symbol=symbol,
+                interval=self.default_interval.value,
+                window_start=window_start,
+                window_end=window_end,
+                num_klines=len(klines),
+                completed_at=datetime.now(),
+            )
+        )
+
+    def backfill_linear_instrument_klines(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        symbol: Optional[str] = None,
+        max_workers: int = 8,
+    ):
+        """
+        Download a (symbols x date range) history in request sized windows.
+        Finished windows are checkpointed together with their klines, so an
+        interrupted backfill resumes from the windows still missing.
+        """
+        instruments = self.bb_data_service.get_linear_usdt_instruments()
+        launch_times = {
+            instrument.symbol: instrument.launch_time for instrument in instruments
+        }
+        if symbol is not None:
+            symbols = [symbol]
+        else:
+            symbols = list(launch_times)
+
+        jobs = self._plan_linear_instruments_klines_backfill(
+            symbols=symbols,
+            start_time=start_time,
+            end_time=end_time,
+            launch_times=launch_times,
+        )
+        print(
+            f"Backfilling {len(symbols)} symbols({start_time} -> {end_time}) : "
+            f"{len(jobs)} windows to download"
+        )
+        if not jobs:
+            return {}, 0.0
+        return self._download_linear_instruments_klines_concurrently(
+            jobs=jobs,
+            max_workers=max_workers,
+            on_stored=self._record_kline_backfill_window,
+        )
+
+    def _update_kline_sync_state(
+        self,
+        symbols: list,
+        start_time: Optional[datetime],
+        last_closed: datetime,
+        symbol: Optional[str] = None,
+    ):
+        """
+        Advance complete_until for symbols whose history is now contiguous from
+        listing. Only runs that started at or before the end of the known
+        complete prefix can extend it.
+        """
+        remaining = self.bb_data_service.get_linear_instruments_klines_gaps(
+            start_time=start_time, end_time=last_closed, symbol=symbol
+        )
+        first_gaps = {}
+        for gap in remaining:
+            first_gaps.setdefault(gap.symbol, gap.gap_start)
+
+        step = timedelta(minutes=5)
+        states = []
+        bounds = self.bb_data_service.get_kline_sync_bounds(symbols)
+        for symbol, (launched_at, complete_until) in bounds.items():
+            known_from = (
+                complete_until + step
+                if complete_until
+                else utils.floor_time(launched_at, 5)
+            )
+            if start_time is not None and start_time > known_from:
+                continue
+            first_gap = first_gaps.get(symbol)
+            new_complete_until = first_gap - step if first_gap else last_closed
+            if complete_until is None or new_complete_until > complete_until:
+                states.append(
+                    {
+                        "symbol": symbol,
+                        "complete_until": new_complete_until,
+                        "updated_at": datetime.now(),
+                    }
+                )
+
+        dbOperations.bulk_upsert(
+            self.dbClient,
+            Market.ByBitLinearInstrumentsKlineSyncState,
+            states,
+            index_elements=["symbol"],
+        )
+        self.dbClient.commit()
+        return len(states)
+
+    def sync_linear_instrument_klines(
+        self,
+        symbol: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        max_workers: int = 1,
+    ):
+        """
+        Download only the 5m slots missing from bybit_linear_perp_kline_5m and
+        extend each symbol's completeness index, so history that is already
+        complete costs no API calls.
+        """
+        end_time = end_time or datetime.now()
+        interval_minutes = int(self.default_interval.value)
+        gaps = self.bb_data_service.get_linear_instruments_klines_gaps(
+            start_time=start_time, end_time=end_time, symbol=symbol
+        )
+
+        jobs = []
+        span = timedelta(minutes=interval_minutes * 1000)
+        for gap in gaps:
+            window_start = gap.gap_start
+            while window_start <= gap.gap_end:
+                window_end = min(
+                    window_start + span, gap.gap_end + timedelta(minutes=5)
+                )
+                jobs.append(
+                    (gap.symbol, window_start, window_end - timedelta(seconds=1))
+                )
+                window_start = window_end
+
+        symbols = sorted({gap.symbol for gap in gaps})
+        print(
+            f"Syncing klines : {sum(gap.n_missing for gap in gaps)} missing candles "
+            f"in {len(gaps)} gaps over {len(symbols)} symbols, {len(jobs)} requests"
+        )
+        if jobs:
+            # Checkpointed like backfill windows, so slots the exchange has no
+            # bar for aren't requested again and don't hold complete_until back
+            self._download_linear_instruments_klines_concurrently(
+                jobs=jobs,
+                max_workers=max_workers,
+                on_stored=self._record_kline_backfill_window,
+            )
+
+        # The bar still being traded never counts towards completeness
+        last_closed = utils.floor_time(end_time, interval_minutes) - timedelta(
+            minutes=interval_minutes
+        )
+        if symbol is not None:
+            symbols = [symbol]
+        else:
+            instruments = self.bb_data_service.get_linear_usdt_instruments()
+            symbols = [instrument.symbol for instrument in instruments]
+        return self._update_kline_sync_state(
+            symbols, start_time, last_closed, symbol=symbol
+        )
+
+    def process_raw_linear_instruments_klines(self, batch_size: int = 5000):
+        """
+        Claim up to `batch_size` unprocessed landing rows with FOR UPDATE SKIP
+        LOCKED, merge them into bybit_linear_perp_kline_5m and flag them
+        processed, all in one statement. Safe to run from many workers at once:
+        each bar keeps the raw id it was merged from and is only overwritten
+        by a newer one, so a worker committing an older claim late can't undo
+        a newer revision. Rows that don't parse are flagged without being
+        merged.
+        """
+        value_columns = ", ".join(KLINE_VALUE_COLUMNS)
+        query = text(f"""
+            WITH claimed AS (
+                SELECT id, symbol, "startTime", "openPrice", "highPrice",
+                       "lowPrice", "closePrice", volume, turnover
+                FROM bybit_linear_perp_kline_5m_raw
+                WHERE NOT is_processed
+                ORDER BY id
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            ),
+            flagged AS (
+                UPDATE bybit_linear_perp_kline_5m_raw raw
+                SET is_processed = true
+                FROM claimed
+                WHERE raw.id = claimed.id
+                RETURNING raw.id
+            ),
+            latest AS (
+                SELECT DISTINCT ON (symbol, "startTime") *
+                FROM claimed
+                WHERE "startTime" ~ '^[0-9]+$'
+                AND "openPrice" ~ :number AND "highPrice" ~ :number
+                AND "lowPrice" ~ :number AND "closePrice" ~ :number
+                AND volume ~ :number AND turnover ~ :number
+                ORDER BY symbol, "startTime", id DESC
+            ),
+            normalized AS (
+                SELECT symbol, id AS source_id,
+                       to_timestamp("startTime"::bigint / 1000.0)
+                           AT TIME ZONE :app_tz AS period_start,
+                       "openPrice"::numeric AS open_price,
+                       "highPrice"::numeric AS high_price,
+                       "lowPrice"::numeric AS low_price,
+                       "closePrice"::numeric AS close_price,
+                       volume::numeric AS volume,
+                       turnover::numeric AS turnover
+                FROM latest
+            ),
+            merged AS (
+                INSERT INTO bybit_linear_perp_kline_5m
+                    (symbol, period_start, {value_columns}, digest, updated_at,
+                     source_id)
+                SELECT symbol, period_start, {value_columns},
+                       {Market.KLINE_DIGEST_SQL}, now(), source_id
+                FROM normalized
+                ON CONFLICT (symbol, period_start) DO UPDATE SET
+                    {", ".join(f"{c} = EXCLUDED.{c}" for c in KLINE_VALUE_COLUMNS)},
+                    digest = EXCLUDED.digest,
+                    updated_at = EXCLUDED.updated_at,
+                    source_id = EXCLUDED.source_id
+                WHERE bybit_linear_perp_kline_5m.digest
+                    IS DISTINCT FROM EXCLUDED.digest
+                AND coalesce(bybit_linear_perp_kline_5m.source_id, 0)
+                    < EXCLUDED.source_id
+                RETURNING symbol, period_start, {value_columns}
+            )
+            SELECT counts.*, merged.*
+            FROM (
+                SELECT (SELECT count(*) FROM flagged) AS claimed,
+                       (SELECT count(*) FROM latest) AS valid
+            ) counts
+            LEFT JOIN merged ON true
+            """)
+        params = {
+            "batch_size": batch_size,
+            "number": r"^-?[0-9]+(\.[0-9]+)?$",
+            # Naive local time like the direct path, whatever the session zone
+            "app_tz": utils.local_timezone_name(),
+        }
+        try:
+            result = self.dbClient.exec(query, params=params).all()
+            self.dbClient.commit()
+        except Exception as e:
+            self.dbClient.rollback()
+            print(f"Database error processing raw klines: {e}")
+            raise
+        changed = self._returned_klines(result)
+        print(
+            f"Processed raw klines : claimed {result[0].claimed}, "
+            f"valid {result[0].valid}, updated/created {len(changed)}"
+        )
+        self._cache_linear_instruments_klines("5m", changed)
+        return result[0].claimed
+
+    def _returned_klines(self, result: list) -> list:
+        """Klines from a merge's RETURNING rows, LEFT JOINed onto its counts"""
+        columns = KLINE_INDEX_ELEMENTS + KLINE_VALUE_COLUMNS
+        return [
+            {c: getattr(row, c) for c in columns}
+            for row in result
+            if row.symbol is not None
+        ]
+
     def _get_klines_aggregation_params(self, timeframe: str):
         params = namedtuple(
             "KlinesAggregationParams",
-            ["target_table", "pandas_freq_str", "num_candles"],
+            [
+                "target_table",
+                "pandas_freq_str",
+                "num_candles",
+                "bucket_seconds",
+                # Next lower timeframe and its bars per bucket, for cascading
+                "source_timeframe",
+                "num_source_candles",
+            ],
         )
         if timeframe == "15m":
-            return params(Market.ByBitLinearInstrumentsKline15m, "15min", 3)
+            return params(
+                Market.ByBitLinearInstrumentsKline15m, "15min", 3, 900, "5m", 3
+            )
         elif timeframe == "1h":
-            return params(Market.ByBitLinearInstrumentsKline1h, "h", 12)
+            return params(Market.ByBitLinearInstrumentsKline1h, "h", 12, 3600, "15m", 4)
         elif timeframe == "4h":
-            return params(Market.ByBitLinearInstrumentsKline4h, "4h", 48)
+            return params(
+                Market.ByBitLinearInstrumentsKline4h, "4h", 48, 14400, "1h", 4
+            )
         elif timeframe == "1d":
-            return params(Market.ByBitLinearInstrumentsKline1d, "D", 288)
+            return params(
+                Market.ByBitLinearInstrumentsKline1d, "D", 288, 86400, "4h", 6
+            )
         return None
 
+    def _get_klines_aggregation_source(self, timeframe: str, cascade: bool = False):
+        """
+        (source table, bars per bucket) to build `timeframe` from. Cascading reads
+        the next lower timeframe, whose bars only exist when complete, so a full
+        bucket there implies a full bucket of 5m bars.
+        """
+        params = self._get_klines_aggregation_params(timeframe)
+        if not cascade:
+            return Market.ByBitLinearInstrumentsKline5m, params.num_candles
+        source = Market.timeframe_table_map[Market.Timeframe(params.source_timeframe)]
+        return source, params.num_source_candles
+
+    def _rollup_linear_instruments_klines_query(
+        self,
+        timeframe: str,
+        changed_since: Optional[datetime] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        symbol: Optional[str] = None,
+        cascade: bool = False,
+    ):
+        """
+        One statement that rebuilds, for all symbols, every `timeframe` bucket
+        with a child changed after `changed_since` and/or starting within
+        [start_time, end_time]. Children are 5m bars, or with `cascade` the
+        next lower timeframe. Buckets missing children are dropped by the
+        HAVING clause, unchanged buckets by the digest guard.
+        """
+        params = self._get_klines_aggregation_params(timeframe)
+        source_table, num_children = self._get_klines_aggregation_source(
+            timeframe, cascade
+        )
+        source = source_table.__tablename__
+        target = params.target_table.__tablename__
+        query_params = {
+            "bucket_seconds": params.bucket_seconds,
+            "num_candles": num_children,
+        }
+        filters = []
+        if changed_since is not None:
+            filters.append("updated_at > :changed_since")
+            query_params["changed_since"] = changed_since
+        if start_time is not None:
+            filters.append("period_start >= :start_time")
+            query_params["start_time"] = start_time
+        if end_time is not None:
+            filters.append("period_start <= :end_time")
+            query_params["end_time"] = end_time
+        if symbol is not None:
+            filters.append("symbol = :symbol")
+            query_params["symbol"] = symbol
+
+        value_columns = ", ".join(KLINE_VALUE_COLUMNS)
+        # Epoch aligned floor of the naive timestamp, same buckets as dt.floor
+        bucket = (
+            "to_timestamp(floor(extract(epoch FROM period_start) / :bucket_seconds)"
+            " * :bucket_seconds) AT TIME ZONE 'UTC'"
+        )
+        query = text(f"""
+            WITH changed AS (
+                SELECT DISTINCT symbol, {bucket} AS period_start
+                FROM {source}
+                WHERE {" AND ".join(filters) or "true"}
+            ),
+            rolled AS (
+                SELECT c.symbol, c.period_start,
+                       (array_agg(k.open_price ORDER BY k.period_start))[1]
+                           AS open_price,
+                       max(k.high_price) AS high_price,
+                       min(k.low_price) AS low_price,
+                       (array_agg(k.close_price ORDER BY k.period_start DESC))[1]
+                           AS close_price,
+                       sum(k.volume) AS volume,
+                       sum(k.turnover) AS turnover
+                FROM changed c
+                JOIN {source} k
+                    ON k.symbol = c.symbol
+                    AND k.period_start >= c.period_start
+                    AND k.period_start
+                        < c.period_start + :bucket_seconds * interval '1 second'
+                GROUP BY c.symbol, c.period_start
+                HAVING count(*) = :num_candles
+            ),
+            merged AS (
+                INSERT INTO {target}
+                    (symbol, period_start, {value_columns}, digest, updated_at)
+                SELECT symbol, period_start, {value_columns},
+                       {Market.KLINE_DIGEST_SQL}, now()
+                FROM rolled
+                ON CONFLICT (symbol, period_start) DO UPDATE SET
+                    {", ".join(f"{c} = EXCLUDED.{c}" for c in KLINE_VALUE_COLUMNS)},
+                    digest = EXCLUDED.digest,
+                    updated_at = EXCLUDED.updated_at
+                WHERE {target}.digest IS DISTINCT FROM EXCLUDED.digest
+                RETURNING symbol, period_start, {value_columns}
+            )
+            SELECT counts.*, merged.*
+            FROM (
+                SELECT (SELECT count(*) FROM changed) AS buckets,
+                       (SELECT count(*) FROM rolled) AS complete
+            ) counts
+            LEFT JOIN merged ON true
+            """)
+        return query, query_params
+
+    def _record_kline_rollup_state(self, timeframe: str, changed_until: datetime):
+        dbOperations.bulk_upsert(
+            self.dbClient,
+            Market.ByBitLinearInstrumentsKlineRollupState,
+            [
+                {
+                    "timeframe": timeframe,
+                    "changed_until": changed_until,
+                    "updated_at": datetime.now(),
+                }
+            ],
+            index_elements=["timeframe"],
+        )
+
+    def rollup_linear_instruments_klines(
+        self,
+        symbol: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        cascade: bool = False,
+    ):
+        """
+        Aggregate 15m/1h/4h/1d inside Postgres, one statement per timeframe.
+        Without a time range only buckets whose children changed since the
+        timeframe's watermark are rebuilt, and the watermark moves forward
+        unless the run is limited to one symbol. With `cascade` each timeframe
+        is built from the one below it, in ascending order, so a change rolls
+        all the way up in a single run.
+        """
+        if timeframe not in ("15m", "1h", "4h", "1d") and timeframe is not None:
+            print(f"Invalid Timeframe({timeframe}) for Aggregation")
+            return
+
+        timeframes = [timeframe] if timeframe else ["15m", "1h", "4h", "1d"]
+        incremental = start_time is None and end_time is None
+        written = 0
+        for timeframe in timeframes:
+            changed_since = None
+            if incremental:
+                state = self.bb_data_service.get_kline_rollup_state(timeframe)
+                if state is not None:
+                    # Writers that committed late may carry an older now()
+                    changed_since = state.changed_until - KLINE_ROLLUP_OVERLAP
+            query, params = self._rollup_linear_instruments_klines_query(
+                timeframe,
+                changed_since=changed_since,
+                start_time=start_time,
+                end_time=end_time,
+                symbol=symbol,
+                cascade=cascade,
+            )
+            try:
+                run_started = self.dbClient.exec(text("SELECT now()::timestamp")).one()[
+                    0
+                ]
+                result = self.dbClient.exec(query, params=params).all()
+                if incremental and symbol is None:
+                    self._record_kline_rollup_state(timeframe, run_started)
+                self.dbClient.commit()
+            except Exception as e:
+                self.dbClient.rollback()
+                print(f"Database error rolling up {timeframe} klines: {e}")
+                raise
+            changed = self._returned_klines(result)
+            print(
+                f"Rolled up {timeframe} : {result[0].buckets} buckets changed, "
+                f"{result[0].complete} complete, updated/created {len(changed)}"
+            )
+            self._cache_linear_instruments_klines(timeframe, changed)
+            written += len(changed)
+        return written
+
     def _update_insert_stmt_for_postgres(self, tbl, data_for_insert=None):
         stmt = ""
         if data_for_insert:
@@ -266,64 +1013,248 @@ class ByBitDataIngestion:
 
         return stmt
 
-    def _aggregate_linear_instruments_klines(
-        self, symbol: str, timeframe: str, start_time: datetime, end_time: datetime
-    ):
-        print(f"Aggregating {timeframe} for {symbol}({start_time} -> {end_time})")
+    def _group_linear_instruments_klines_frame(
+        self, df: pd.DataFrame, timeframe: str, num_candles: int
+    ) -> list:
+        """Complete `timeframe` bars of one symbol's frame, partial ones are reported"""
         params = self._get_klines_aggregation_params(timeframe)
-        tbl = Market.ByBitLinearInstrumentsKline5m
-        query = (
-            select(tbl)
-            .where(
-                and_(
-                    tbl.symbol == symbol,
-                    tbl.period_start >= start_time,
-                    tbl.period_start <= end_time,
-                )
-            )
-            .order_by(tbl.period_start)
-        )
-        df = pd.read_sql(query, self.dbClient.connection())
-        if df.shape[0] == 0:
-            print("No data to aggregate for symbol: ", symbol)
-            return
-        df.sort_values(by="period_start", inplace=True)
-        df["period_start_grouped"] = df.period_start.dt.floor(
-            freq=params.pandas_freq_str
+        df = df.assign(
+            period_start_grouped=df.period_start.dt.floor(freq=params.pandas_freq_str),
+            n_candles=1,
         )
-        df["n_candles"] = 1
         df_grouped = (
             df.groupby("period_start_grouped")
             .agg(
                 {
-                    tbl.symbol.name: "first",
-                    tbl.open_price.name: "first",
-                    tbl.high_price.name: "max",
-                    tbl.low_price.name: "min",
-                    tbl.close_price.name: "last",
-                    tbl.volume.name: "sum",
-                    tbl.turnover.name: "sum",
+                    "symbol": "first",
+                    "open_price": "first",
+                    "high_price": "max",
+                    "low_price": "min",
+                    "close_price": "last",
+                    "volume": "sum",
+                    "turnover": "sum",
                     "n_candles": "sum",
                 }
             )
             .reset_index()
         )
-        for _, row in df_grouped.iterrows():
-            if row["n_candles"] != params.num_candles:
-                print(
-                    f"Issues in Candle Count: ",
-                    f"Period_Start[{row['period_start_grouped']}], Symbol[{row['symbol']}]",
-                    f"Count[{row['n_candles']}]",
-                    params.pandas_freq_str,
-                )
-                continue
+        is_complete = df_grouped["n_candles"] == num_candles
+        for _, row in df_grouped[~is_complete].iterrows():
+            print(
+                f"Issues in Candle Count: ",
+                f"Period_Start[{row['period_start_grouped']}], Symbol[{row['symbol']}]",
+                f"Count[{row['n_candles']}]",
+                params.pandas_freq_str,
+            )
+
+        return (
+            df_grouped[is_complete]
+            .drop(columns=["n_candles"])
+            .rename(columns={"period_start_grouped": "period_start"})
+            .to_dict("records")
+        )
+
+    def _aggregate_linear_instruments_klines(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: datetime,
+        end_time: datetime,
+        cascade: bool = False,
+        chunk_size: int = 100_000,
+    ):
+        """
+        Streams the source bars in chunks of `chunk_size` and writes each
+        chunk's buckets as it goes, so any span aggregates in constant memory.
+        A chunk's last bucket may continue in the next one and is carried over.
+        """
+        print(f"Aggregating {timeframe} for {symbol}({start_time} -> {end_time})")
+        params = self._get_klines_aggregation_params(timeframe)
+        _, num_candles = self._get_klines_aggregation_source(timeframe, cascade)
+        chunks = self.bb_data_service.iter_linear_instrument_klines(
+            symbol=symbol,
+            timeframe=(
+                params.source_timeframe
+                if cascade
+                else Market.Timeframe.FIVE_MINUTES.value
+            ),
+            start_time=start_time,
+            end_time=end_time,
+            chunk_size=chunk_size,
+            output="records",
+        )
 
-            stmt = self._update_insert_stmt_for_postgres(
-                tbl=params.target_table,
-                data_for_insert=row.to_dict(),
+        carry, written = None, 0
+        for chunk in chunks:
+            df = pd.DataFrame(chunk)
+            if carry is not None:
+                df = pd.concat([carry, df], ignore_index=True)
+            bucket = df.period_start.dt.floor(freq=params.pandas_freq_str)
+            is_last = (bucket == bucket.iloc[-1]).to_numpy()
+            carry = df[is_last]
+            written += self._write_aggregated_klines(
+                timeframe,
+                self._group_linear_instruments_klines_frame(
+                    df[~is_last], timeframe, num_candles
+                ),
             )
-            self.dbClient.exec(stmt)
+        if carry is None:
+            print("No data to aggregate for symbol: ", symbol)
+            return 0
+        written += self._write_aggregated_klines(
+            timeframe,
+            self._group_linear_instruments_klines_frame(carry, timeframe, num_candles),
+        )
+        return written
+
+    def _write_aggregated_klines(self, timeframe: str, rows: list) -> int:
+        if not rows:
+            return 0
+        written = dbOperations.bulk_upsert(
+            self.dbClient,
+            self._get_klines_aggregation_params(timeframe).target_table,
+            rows,
+            index_elements=KLINE_INDEX_ELEMENTS,
+            computed_columns=Market.KLINE_COMPUTED_COLUMNS,
+            distinct_column="digest",
+        )
         self.dbClient.commit()
+        self._cache_linear_instruments_klines(timeframe, rows)
+        return written
+
+    def _load_linear_instruments_klines_slice(
+        self, start_time: datetime, end_time: datetime, symbols: Optional[list] = None
+    ) -> pd.DataFrame:
+        """
+        5m klines of every symbol in [start_time, end_time) as one frame sorted
+        by (symbol, period_start). Prices come back as int64 scaled by
+        KLINE_PRICE_SCALE so min/max/first/last are exact and vectorized.
+        """
+        tbl = Market.ByBitLinearInstrumentsKline5m
+        query = (
+            select(
+                tbl.symbol,
+                tbl.period_start,
+                *[
+                    cast(getattr(tbl, c) * KLINE_PRICE_SCALE, BigInteger).label(c)
+                    for c in KLINE_PRICE_COLUMNS
+                ],
+                tbl.volume,
+                tbl.turnover,
+            )
+            .where(tbl.period_start >= start_time, tbl.period_start < end_time)
+            .order_by(tbl.symbol, tbl.period_start)
+        )
+        if symbols is not None:
+            query = query.where(tbl.symbol.in_(symbols))
+        return pd.read_sql(query, self.dbClient.connection())
+
+    def _reduce_linear_instruments_klines_frame(
+        self, df: pd.DataFrame, timeframe: str
+    ) -> list:
+        """
+        Grouped OHLCV reduction of a slice frame into complete `timeframe` bars
+        for all symbols at once. The frame is sorted by (symbol, period_start),
+        so every (symbol, bucket) group is a contiguous run and reduceat over
+        the run starts does the whole grouping without a groupby.
+        """
+        params = self._get_klines_aggregation_params(timeframe)
+        n = len(df)
+        epoch = df["period_start"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        bucket = epoch // params.bucket_seconds * params.bucket_seconds
+        symbol_codes, _ = pd.factorize(df["symbol"])
+
+        is_start = np.ones(n, dtype=bool)
+        is_start[1:] = (symbol_codes[1:] != symbol_codes[:-1]) | (
+            bucket[1:] != bucket[:-1]
+        )
+        starts = np.flatnonzero(is_start)
+        counts = np.diff(np.append(starts, n))
+        ends = starts + counts - 1
+
+        complete = counts == params.num_candles
+        if not complete.all():
+            print(
+                f"Issues in Candle Count: {(~complete).sum()} incomplete "
+                f"{timeframe} buckets skipped"
+            )
+        if not complete.any():
+            return []
+
+        def prices(values):
+            return [
+                Decimal(int(v)).scaleb(-KLINE_PRICE_DECIMALS) for v in values[complete]
+            ]
+
+        # Reduce over every run, incomplete ones included, then drop those
+        bars = pd.DataFrame(
+            {
+                "symbol": df["symbol"].to_numpy()[starts][complete],
+                "period_start": bucket[starts][complete].astype("datetime64[s]"),
+                "open_price": prices(df["open_price"].to_numpy()[starts]),
+                "high_price": prices(
+                    np.maximum.reduceat(df["high_price"].to_numpy(), starts)
+                ),
+                "low_price": prices(
+                    np.minimum.reduceat(df["low_price"].to_numpy(), starts)
+                ),
+                "close_price": prices(df["close_price"].to_numpy()[ends]),
+                # Exact Decimal sums, reduceat falls back to Python + on objects
+                "volume": np.add.reduceat(df["volume"].to_numpy(dtype=object), starts)[
+                    complete
+                ],
+                "turnover": np.add.reduceat(
+                    df["turnover"].to_numpy(dtype=object), starts
+                )[complete],
+            }
+        )
+        return bars.to_dict("records")
+
+    def _aggregate_linear_instruments_klines_batch(
+        self,
+        timeframes: list,
+        start_time: datetime,
+        end_time: datetime,
+        symbols: Optional[list] = None,
+        slice_days: int = 7,
+    ) -> int:
+        """
+        Aggregate every timeframe for all symbols one time slice at a time: a
+        single query per slice, one vectorized reduction per timeframe and one
+        bulk write per timeframe table, committed together.
+        """
+        # Whole days, so no 1d (or smaller) bucket straddles two slices
+        slice_start = datetime.combine(start_time.date(), datetime.min.time())
+        end_time = datetime.combine(end_time.date(), datetime.min.time()) + timedelta(
+            days=1
+        )
+        written = 0
+        while slice_start < end_time:
+            slice_end = min(slice_start + timedelta(days=slice_days), end_time)
+            print(
+                f"Aggregating {timeframes} for all symbols({slice_start} -> {slice_end})"
+            )
+            df = self._load_linear_instruments_klines_slice(
+                slice_start, slice_end, symbols
+            )
+            if not df.empty:
+                aggregated = {}
+                for timeframe in timeframes:
+                    rows = self._reduce_linear_instruments_klines_frame(df, timeframe)
+                    written += dbOperations.bulk_upsert(
+                        self.dbClient,
+                        self._get_klines_aggregation_params(timeframe).target_table,
+                        rows,
+                        index_elements=KLINE_INDEX_ELEMENTS,
+                        computed_columns=Market.KLINE_COMPUTED_COLUMNS,
+                        distinct_column="digest",
+                    )
+                    aggregated[timeframe] = rows
+                self.dbClient.commit()
+                for timeframe, rows in aggregated.items():
+                    self._cache_linear_instruments_klines(timeframe, rows)
+            slice_start = slice_end
+        return written
 
     def aggregate_linear_instruments_klines(
         self,
@@ -331,10 +1262,22 @@ class ByBitDataIngestion:
         timeframe: Optional[str] = None,
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
+        cascade: bool = False,
+        batch: bool = False,
+        max_workers: int = 1,
     ):
+        """
+        With `cascade` each timeframe is built from the next lower one (1d from
+        4h, 4h from 1h, ...) instead of from 5m, lower timeframes first. With
+        `batch` all symbols and timeframes are aggregated together from 5m in
+        slices, see _aggregate_linear_instruments_klines_batch, and the number
+        of bars written is returned. Otherwise symbols are aggregated one by
+        one, sharded across a process pool with `max_workers` > 1, and a
+        ShardResult per shard is returned (see run_symbol_shards).
+        """
         if timeframe not in ("15m", "1h", "4h", "1d") and timeframe is not None:
             print(f"Invalid Timeframe({timeframe}) for Aggregation")
-            return
+            return []
 
         # Find Timeframes to Aggregate
         timeframes_to_aggregate = []
@@ -343,6 +1286,24 @@ class ByBitDataIngestion:
         else:
             timeframes_to_aggregate = ["15m", "1h", "4h", "1d"]
 
+        if batch:
+            if start_time is None:
+                start_time = self.bb_data_service.get_klines_aggregation_start(
+                    [
+                        self._get_klines_aggregation_params(tf).target_table
+                        for tf in timeframes_to_aggregate
+                    ]
+                )
+            if start_time is None:
+                print("No data to aggregate")
+                return 0
+            return self._aggregate_linear_instruments_klines_batch(
+                timeframes=timeframes_to_aggregate,
+                start_time=start_time,
+                end_time=end_time or datetime.now(),
+                symbols=[symbol] if symbol else None,
+            )
+
         # Find Symbols to Aggregate
         symbols_to_aggregate = []
         if symbol is not None:
@@ -351,85 +1312,287 @@ class ByBitDataIngestion:
             instruments = self.bb_data_service.get_linear_usdt_instruments()
             symbols_to_aggregate = [instrument.symbol for instrument in instruments]
 
-        for symbol in symbols_to_aggregate:
-            for timeframe in timeframes_to_aggregate:
-                params = self._get_klines_aggregation_params(timeframe)
-                latest_period_start = (
-                    self.bb_data_service.get_klines_latest_period_start(
-                        symbol=symbol,
-                        klines_table=params.target_table,
-                    )
-                    or datetime(1970, 1, 1)
-                )
-                start_time_final = start_time or latest_period_start
-                end_time_final = end_time or datetime.now()
+        return self.run_symbol_shards(
+            "aggregate",
+            symbols_to_aggregate,
+            max_workers,
+            timeframes=timeframes_to_aggregate,
+            start_time=start_time,
+            end_time=end_time,
+            cascade=cascade,
+        )
 
-                self._aggregate_linear_instruments_klines(
-                    symbol=symbol,
-                    timeframe=timeframe,
-                    start_time=start_time_final,
-                    end_time=end_time_final,
-                )
+    def aggregate_symbol_klines(
+        self,
+        symbol: str,
+        timeframes: list,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        cascade: bool = False,
+    ):
+        for timeframe in timeframes:
+            params = self._get_klines_aggregation_params(timeframe)
+            latest_period_start = self.bb_data_service.get_klines_latest_period_start(
+                symbol=symbol,
+                klines_table=params.target_table,
+            ) or datetime(1970, 1, 1)
+            start_time_final = start_time or latest_period_start
+            end_time_final = end_time or datetime.now()
 
-    def aggregate_klines_by_date(self, kline_date: date, symbol: str = None):
+            self._aggregate_linear_instruments_klines(
+                symbol=symbol,
+                timeframe=timeframe,
+                start_time=start_time_final,
+                end_time=end_time_final,
+                cascade=cascade,
+            )
+
+    def aggregate_klines_by_date(
+        self,
+        kline_date: date,
+        symbol: str = None,
+        cascade: bool = False,
+        batch: bool = False,
+        max_workers: int = 1,
+    ):
         start_time = datetime.combine(kline_date, datetime.min.time())
         end_time = start_time + timedelta(days=1) - timedelta(seconds=1)
-        self.aggregate_linear_instruments_klines(
+        return self.aggregate_linear_instruments_klines(
             symbol=symbol,
+            cascade=cascade,
+            batch=batch,
+            max_workers=max_workers,
             start_time=start_time,
             end_time=end_time,
         )
 
-    def process_pivot_levels(self, symbol: str):
-        for timeframe in self.pivots_timeframes:
-            result = self.bb_data_service.get_linear_instrument_klines(
-                symbol=symbol,
-                timeframe=timeframe,
-                data_source="db",
+    def run_symbol_shards(
+        self, job: str, symbols: list, max_workers: int, **kwargs
+    ) -> list:
+        """
+        Split `symbols` round robin into `max_workers` shards and run `job`
+        ("aggregate" or "pivots") on each in its own process, or on this
+        instance when there's a single shard. Returns a ShardResult per shard.
+        Failed symbols are reported there and never raised, a crashed worker
+        fails its whole shard.
+        """
+        max_workers = max(max_workers, 1)
+        shards = [symbols[i::max_workers] for i in range(max_workers)]
+        shards = [shard for shard in shards if shard]
+        results = []
+        if len(shards) == 1:
+            results.append(_run_symbol_job(self, job, 0, shards[0], kwargs))
+        elif shards:
+            # spawn, so workers never inherit this process' pooled DB connections
+            with ProcessPoolExecutor(
+                max_workers=len(shards),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                futures = {
+                    executor.submit(_run_symbol_shard, job, i, shard, kwargs): i
+                    for i, shard in enumerate(shards)
+                }
+                for future in as_completed(futures):
+                    shard = futures[future]
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(
+                            ShardResult(
+                                shard,
+                                shards[shard],
+                                [],
+                                {symbol: str(e) for symbol in shards[shard]},
+                                0.0,
+                            )
+                        )
+        results.sort(key=lambda result: result.shard)
+        for result in results:
+            print(
+                f"Shard {result.shard} {job}: {len(result.done)}/"
+                f"{len(result.symbols)} symbols in {result.elapsed:.1f}s, "
+                f"{len(result.failed)} failed"
+            )
+            for symbol, error in result.failed.items():
+                print(f"  {symbol}: {error}")
+        return results
+
+    def process_all_pivot_levels(
+        self, symbols: Optional[list] = None, max_workers: int = 1, full: bool = True
+    ):
+        """ShardResult per shard, see run_symbol_shards"""
+        if symbols is None:
+            instruments = self.bb_data_service.get_linear_usdt_instruments(
+                quote_coin=self.quote_coin
+            )
+            symbols = [instrument.symbol for instrument in instruments]
+        return self.run_symbol_shards("pivots", symbols, max_workers, full=full)
+
+    def _pivot_level_rows(
+        self,
+        symbol: str,
+        timeframe: str,
+        df: pd.DataFrame,
+        lookbacks: list,
+        confirmed_until: Optional[dict] = None,
+    ):
+        """
+        (PriceLevel rows, pivot state rows) for every lookback, all from one
+        multi_lookback_pivot_points pass over the float columns. A bar's pivot
+        is final once `lookback` bars follow it, so only final pivots are ever
+        emitted. With `confirmed_until` ({lookback: datetime}) bars at or
+        before it are skipped. Levels take the exact Decimal price, read back
+        for the pivot bars only.
+        """
+        rows, states = [], []
+        confirmed_until = confirmed_until or {}
+        period_starts = df["period_start"].to_numpy()
+        pivots_by_lookback = utils.multi_lookback_pivot_points(
+            df["low_price"], df["high_price"], lookbacks
+        )
+        detected = {}
+        for lookback, pivot in pivots_by_lookback.items():
+            # Bars that are both (3) are skipped, as before
+            is_pivot = np.isin(pivot, (1, 2))
+            if confirmed_until.get(lookback) is not None:
+                is_pivot &= period_starts > np.datetime64(confirmed_until[lookback])
+            detected[lookback] = (
+                pd.DatetimeIndex(period_starts[is_pivot]).to_pydatetime(),
+                pivot[is_pivot],
+            )
+        exact = self.bb_data_service.get_linear_instrument_kline_lows_highs(
+            symbol=symbol,
+            timeframe=timeframe,
+            period_starts=sorted(
+                {start for starts, _ in detected.values() for start in starts}
+            ),
+        )
+        for lookback in lookbacks:
+            starts, kinds = detected[lookback]
+            rows.extend(
+                {
+                    "exchange": "bybit",
+                    "symbol": symbol,
+                    "instrument_type": "perp",
+                    "timeframe": timeframe,
+                    "lookback_period": lookback,
+                    "period_start": start,
+                    "price_level": exact[start][0 if kind == 1 else 1],
+                    "is_support": bool(kind == 1),
+                    "is_resistance": bool(kind == 2),
+                }
+                for start, kind in zip(starts, kinds)
+                # Skips a bar deleted since the float read
+                if start in exact
             )
-            data = [row.to_dict() for row in result]
-            df = pd.DataFrame(data)
-            for lookback in self.pivots_lookbacks:
-                df["pivot"] = df.apply(
-                    lambda x: pivotid(df, x.name, lookback, lookback), axis=1
+            if len(df) > lookback:
+                states.append(
+                    {
+                        "exchange": "bybit",
+                        "symbol": symbol,
+                        "instrument_type": "perp",
+                        "timeframe": timeframe,
+                        "lookback_period": lookback,
+                        "confirmed_until": df["period_start"].iloc[-1 - lookback],
+                        "updated_at": datetime.now(),
+                    }
                 )
-                for _, row in df.iterrows():
-                    if row.pivot not in (1, 2):
-                        continue
-                    stmt = (
-                        pg_insert(PriceLevels.PriceLevel)
-                        .values(
-                            exchange="bybit",
-                            symbol=symbol,
-                            instrument_type="perp",
-                            timeframe=timeframe,
-                            lookback_period=lookback,
-                            period_start=row.period_start,
-                            price_level=(
-                                row.low_price if row.pivot == 1 else row.high_price
-                            ),
-                            is_support=row.pivot == 1,
-                            is_resistance=row.pivot == 2,
-                        )
-                        .on_conflict_do_update(
-                            index_elements=[  # unique index
-                                "exchange",
-                                "symbol",
-                                "instrument_type",
-                                "timeframe",
-                                "period_start",
-                                "lookback_period",
-                            ],
-                            set_={
-                                "price_level": (
-                                    row.low_price if row.pivot == 1 else row.high_price
-                                ),
-                                "is_support": row.pivot == 1,
-                                "is_resistance": row.pivot == 2,
-                            },
-                        )
-                    )
-                    self.dbClient.exec(stmt)
+        return rows, states
+
+    def _load_pivot_klines(
+        self,
+        symbol: str,
+        timeframe: str,
+        lookbacks: list,
+        full: bool,
+        chunk_size: int = 100_000,
+    ):
+        """
+        Kline chunks to detect pivots on and the {lookback: confirmed_until}
+        already stored. Incremental loads start 2 x max lookback bars before
+        the oldest watermark, enough context for every unconfirmed bar.
+        """
+        confirmed_until, start_time = {}, None
+        if not full:
+            confirmed_until = self.bb_data_service.get_pivot_states(
+                symbol=symbol, timeframe=timeframe, lookbacks=lookbacks
+            )
+            if all(confirmed_until.get(lookback) for lookback in lookbacks):
+                start_time = self.bb_data_service.get_klines_context_start(
+                    symbol=symbol,
+                    timeframe=timeframe,
+                    before=min(confirmed_until.values()),
+                    bars=2 * max(lookbacks),
+                )
+        chunks = self.bb_data_service.iter_linear_instrument_klines(
+            symbol=symbol,
+            timeframe=timeframe,
+            start_time=start_time,
+            chunk_size=chunk_size,
+            output="pandas",
+        )
+        return chunks, confirmed_until
+
+    def process_pivot_levels(
+        self,
+        symbol: str,
+        timeframes: Optional[list] = None,
+        lookbacks: Optional[list] = None,
+        full: bool = True,
+        chunk_size: int = 100_000,
+    ):
+        """
+        Streams each timeframe's klines once in chunks of `chunk_size`,
+        computes every lookback together and writes each chunk's levels and
+        watermarks with one bulk upsert and commit before the next chunk, so
+        memory stays flat whatever the history length. Each chunk is prefixed
+        with the previous chunk's last 2 x max lookback bars, the watermarks
+        keep the overlap from being emitted twice. Without `full` only bars
+        after each (timeframe, lookback) watermark are loaded (plus context)
+        and only newly confirmed pivots are inserted.
+        """
+        lookbacks = lookbacks or self.pivots_lookbacks
+        written = 0
+        for timeframe in timeframes or self.pivots_timeframes:
+            chunks, confirmed_until = self._load_pivot_klines(
+                symbol, timeframe, lookbacks, full, chunk_size
+            )
+            context = None
+            for chunk in chunks:
+                df = chunk
+                if context is not None:
+                    df = pd.concat([context, chunk], ignore_index=True)
+                rows, states = self._pivot_level_rows(
+                    symbol, timeframe, df, lookbacks, confirmed_until
+                )
+                self._store_pivot_levels(rows, states, full)
+                written += len(rows)
+                for state in states:
+                    confirmed_until = {
+                        **confirmed_until,
+                        state["lookback_period"]: state["confirmed_until"],
+                    }
+                context = df.iloc[-2 * max(lookbacks) :]
+        return written
+
+    def _store_pivot_levels(self, rows: list, states: list, full: bool):
+        """Levels and their watermarks, committed together"""
+        dbOperations.bulk_upsert(
+            self.dbClient,
+            PriceLevels.PriceLevel,
+            rows,
+            index_elements=PRICE_LEVEL_INDEX_ELEMENTS,
+            computed_columns=PriceLevels.PRICE_LEVEL_COMPUTED_COLUMNS,
+            # New pivots only append, a full run rewrites levels that changed
+            update_columns=None if full else [],
+            distinct_column="digest",
+        )
+        dbOperations.bulk_upsert(
+            self.dbClient,
+            PriceLevels.PriceLevelPivotState,
+            states,
+            index_elements=PRICE_PIVOT_STATE_INDEX_ELEMENTS,
+        )
         self.dbClient.commit()
 
 
@@ -437,6 +1600,10 @@ class ByBitDataService:
     def __init__(self, dbClient=None):
         self.dbClient = self._get_dbClient(dbClient)
         self.redis_client = Redis(connection_pool=self._redis_connection_pool())
+        # Cached klines are binary records, read and written without decoding
+        self.redis_bytes_client = Redis(
+            connection_pool=self._redis_connection_pool(decode_responses=False)
+        )
         self.default_client = "redis"
         self.exchange = "bybit"
 
@@ -445,12 +1612,12 @@ class ByBitDataService:
             return dbClient
         return dbOperations.get_session()
 
-    def _redis_connection_pool(self):
+    def _redis_connection_pool(self, decode_responses: bool = True):
         return ConnectionPool(
             host="localhost",
             port=6379,
             db=0,
-            decode_responses=True,
+            decode_responses=decode_responses,
             socket_timeout=10,
             socket_connect_timeout=10,
             retry_on_timeout=True,
@@ -476,6 +1643,138 @@ class ByBitDataService:
         stmt = select(tbl).where(tbl.quote_coin == quote_coin)
         return self.dbClient.exec(stmt).all()
 
+    def get_linear_instrument(self, symbol: str):
+        tbl = Market.ByBitLinearInstruments
+        stmt = select(tbl).where(tbl.symbol == symbol)
+        return self.dbClient.exec(stmt).first()
+
+    def _kline_redis_key(self, timeframe: str, symbol: str, period_start: int):
+        # Legacy one key per bar layout, only read by the migration
+        return f"{self.exchange}:kline:{timeframe}:{symbol}:{period_start}"
+
+    def _klines_redis_key(self, timeframe: str, symbol: str):
+        # One sorted set per (timeframe, symbol) scored by period_start
+        return f"{self.exchange}:klines:{timeframe}:{symbol}"
+
+    def _klines_version_key(self, timeframe: str, symbol: str):
+        # Bumped by every write-through, read-through fills WATCH it
+        return f"{self._klines_redis_key(timeframe, symbol)}:version"
+
+    def _serialize_kline(self, kline: Dict[str, Any]) -> bytes:
+        return KlineCodec.encode_kline(kline)
+
+    def cache_linear_instrument_klines(
+        self, timeframe: str, klines: list, batch_size: int = 1000
+    ):
+        """
+        Write klines (dicts) into their (timeframe, symbol) sorted set. A bar
+        that is already cached is replaced, each batch runs as one MULTI so
+        readers never see a bar missing in between. Each batch bumps the
+        version of the series it touches, so a KlineCache fill that read
+        Postgres before this write can't overwrite it.
+        """
+        pipeline = self.redis_bytes_client.pipeline(transaction=True)
+        series = set()
+        for i, kline in enumerate(klines, start=1):
+            key = self._klines_redis_key(timeframe, kline["symbol"])
+            score = utils.epoch_seconds(kline["period_start"])
+            pipeline.zremrangebyscore(key, score, score)
+            pipeline.zadd(key, {self._serialize_kline(kline): score})
+            series.add(kline["symbol"])
+            if i % batch_size == 0:
+                for symbol in series:
+                    pipeline.incr(self._klines_version_key(timeframe, symbol))
+                series.clear()
+                pipeline.execute()
+        for symbol in series:
+            pipeline.incr(self._klines_version_key(timeframe, symbol))
+        pipeline.execute()
+        return len(klines)
+
+    def publish_klines_changed(self, timeframe: str, klines: list):
+        """
+        One notice for all the klines (dicts) written: [symbol, timeframe,
+        first, last period_start epoch] per symbol.
+        """
+        ranges = {}
+        for kline in klines:
+            period_start = utils.epoch_seconds(kline["period_start"])
+            first, last = ranges.get(kline["symbol"], (period_start, period_start))
+            ranges[kline["symbol"]] = (
+                min(first, period_start),
+                max(last, period_start),
+            )
+        notice = [
+            [symbol, timeframe, first, last] for symbol, (first, last) in ranges.items()
+        ]
+        return self.redis_client.publish(KLINES_CHANGED_CHANNEL, json.dumps(notice))
+
+    def _migrate_kline_redis_keys(self, keys: list, delete_old: bool) -> int:
+        pipeline = self.redis_client.pipeline(transaction=False)
+        targets = []
+        for key in keys:
+            _, _, timeframe, symbol, period_start = key.split(":")
+            targets.append(
+                (self._klines_redis_key(timeframe, symbol), int(period_start))
+            )
+            pipeline.get(key)
+            pipeline.zcount(targets[-1][0], period_start, period_start)
+        replies = pipeline.execute()
+
+        migrated = 0
+        for (target, score), value, cached in zip(targets, replies[::2], replies[1::2]):
+            # Bars written through since the new layout went live are newer
+            if value is not None and not cached:
+                pipeline.zadd(target, {value: score})
+                migrated += 1
+        if delete_old:
+            pipeline.delete(*keys)
+        pipeline.execute()
+        return migrated
+
+    def migrate_linear_instrument_klines_cache(
+        self, delete_old: bool = True, batch_size: int = 10000
+    ):
+        """Move bars from one key per bar into the per (timeframe, symbol) sorted sets"""
+        pattern = f"{self.exchange}:kline:*"
+        migrated = scanned = 0
+        keys = []
+        for key in self.redis_client.scan_iter(pattern, batch_size):
+            keys.append(key)
+            if len(keys) == batch_size:
+                migrated += self._migrate_kline_redis_keys(keys, delete_old)
+                scanned += len(keys)
+                keys = []
+                print(f"Migrated {migrated} of {scanned} cached klines")
+        if keys:
+            migrated += self._migrate_kline_redis_keys(keys, delete_old)
+            scanned += len(keys)
+        print(f"Migrated {migrated} of {scanned} cached klines")
+        return migrated
+
+    def warm_linear_instrument_klines_cache(
+        self,
+        days: int,
+        timeframes: Optional[list] = None,
+        symbols: Optional[list] = None,
+    ):
+        """
+        Seed redis with the last `days` of klines, one query per (timeframe,
+        symbol). Whole chunks are loaded and marked, as KlineCache reads them.
+        """
+        start_time = datetime.now() - timedelta(days=days)
+        cache = KlineCache(self)
+        timeframes = timeframes or [timeframe.value for timeframe in Market.Timeframe]
+        symbols = symbols or [
+            instrument.symbol for instrument in self.get_linear_usdt_instruments()
+        ]
+        cached = 0
+        for timeframe in timeframes:
+            for symbol in symbols:
+                cached += cache.warm(symbol, timeframe, start_time)
+            print(f"Warmed {timeframe} klines cache for {len(symbols)} symbols")
+        return cached
+
     def _deserialize_kline(self, data: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "symbol": data["symbol"],
@@ -488,6 +1787,18 @@ class ByBitDataService:
             "turnover": Decimal(data["turnover"]),
         }
 
+    def _klines_columns_output(self, columns: Dict[str, np.ndarray], output: str):
+        """numpy columns as "numpy" (the dict itself), "pandas" or "arrow" """
+        if output == "numpy":
+            return columns
+        if output == "pandas":
+            return pd.DataFrame(columns)
+        if output == "arrow":
+            import pyarrow as pa
+
+            return pa.table(columns)
+        raise ValueError(f"Unknown klines output: {output}")
+
     def _retrive_linear_instrument_klines_from_redis(
         self,
         symbol: str,
@@ -496,30 +1807,51 @@ class ByBitDataService:
         end_time: datetime = None,
         output: str = "pandas",
     ):
-        if start_time is None:
-            start_time = datetime(1970, 1, 1)
-        if end_time is None:
-            end_time = datetime.now()
+        # Inclusive on both ends, like the db path
+        values = self.redis_bytes_client.zrangebyscore(
+            self._klines_redis_key(timeframe, symbol),
+            "-inf" if start_time is None else utils.epoch_seconds(start_time),
+            "+inf" if end_time is None else utils.epoch_seconds(end_time),
+        )
+        if output != "records":
+            columns = KlineCodec.decode_klines(values)
+            columns["period_start"] = utils.local_datetimes(columns["period_start"])
+            return self._klines_columns_output(columns, output)
 
-        start_time = int(start_time.timestamp())
-        end_time = int(end_time.timestamp())
-        pattern = f"bybit:kline:{timeframe}:{symbol}:*"
+        klines = KlineCodec.decode_klines_exact(values)
+        for kline in klines:
+            kline["symbol"] = symbol
+            kline["period_start"] = datetime.fromtimestamp(kline["period_start"])
+        return klines
 
-        keys = []
-        for key in self.redis_client.scan_iter(pattern, 10000):
-            current_time = int(key.split(":")[-1])
-            if current_time > start_time and current_time <= end_time:
-                keys.append(key)
+    def _klines_range_select(
+        self,
+        tbl: SQLModel,
+        columns: list,
+        symbol: str,
+        start_time: datetime = None,
+        end_time: datetime = None,
+    ):
+        stmt = select(*columns).where(tbl.symbol == symbol)
+        if start_time is not None:
+            stmt = stmt.where(tbl.period_start >= start_time)
+        if end_time is not None:
+            stmt = stmt.where(tbl.period_start <= end_time)
+        return stmt.order_by(tbl.period_start)
 
-        if keys:
-            pipeline = self.redis_client.pipeline()
-            for key in keys:
-                pipeline.get(key)
-            values = pipeline.execute()
-            return sorted(
-                [self._deserialize_kline(json.loads(v)) for v in values if v],
-                key=lambda x: x["period_start"],
-            )
+    def _klines_float_columns(self, tbl: SQLModel) -> list:
+        return [
+            tbl.period_start,
+            *[cast(getattr(tbl, c), Float).label(c) for c in KLINE_VALUE_COLUMNS],
+        ]
+
+    def _klines_columns(self, rows: list) -> Dict[str, np.ndarray]:
+        """(period_start, *values) tuples transposed into column arrays"""
+        values = list(zip(*rows)) or [()] * (len(KLINE_VALUE_COLUMNS) + 1)
+        columns = {"period_start": np.array(values[0], dtype="datetime64[us]")}
+        for column, column_values in zip(KLINE_VALUE_COLUMNS, values[1:]):
+            columns[column] = np.array(column_values, dtype=np.float64)
+        return columns
 
     def _retrive_linear_instrument_klines_from_db(
         self,
@@ -529,15 +1861,79 @@ class ByBitDataService:
         end_time: datetime = None,
         output: str = "pandas",
     ):
+        """
+        Core select of period_start and the value columns cast to float, the
+        column arrays are built from the cursor's tuples without ORM objects.
+        "records" keeps the exact Decimal values.
+        """
+        if output == "records":
+            return self.get_linear_instrument_klines_rows(
+                symbol, timeframe, start_time=start_time, end_time=end_time
+            )
+
         tbl = self._get_kline_table(timeframe)
-        stmt = select(tbl).where(tbl.symbol == symbol)
-        if start_time is not None:
-            stmt = stmt.where(tbl.period_start >= start_time)
-        if end_time is not None:
-            stmt = stmt.where(tbl.period_start <= end_time)
+        stmt = self._klines_range_select(
+            tbl, self._klines_float_columns(tbl), symbol, start_time, end_time
+        )
+        rows = self.dbClient.connection().execute(stmt).fetchall()
+        return self._klines_columns_output(self._klines_columns(rows), output)
 
-        stmt = stmt.order_by(tbl.period_start)
-        return self.dbClient.exec(stmt).all()
+    def get_linear_instrument_klines_rows(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: datetime = None,
+        end_time: datetime = None,
+    ):
+        """Klines as plain dicts ordered by period_start, read straight from the db"""
+        tbl = self._get_kline_table(timeframe)
+        columns = [getattr(tbl, c) for c in KLINE_INDEX_ELEMENTS + KLINE_VALUE_COLUMNS]
+        stmt = self._klines_range_select(tbl, columns, symbol, start_time, end_time)
+        return [dict(row._mapping) for row in self.dbClient.exec(stmt)]
+
+    def iter_linear_instrument_klines(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: datetime = None,
+        end_time: datetime = None,
+        chunk_size: int = 100_000,
+        output: str = "numpy",
+    ) -> Iterator:
+        """
+        Klines from the db in chunks of at most `chunk_size` bars, as `output`
+        (see get_linear_instrument_klines). Rows come through a server side
+        cursor on a connection of its own, so any length of history streams
+        in constant memory and the caller's session is free to commit between
+        chunks. Close the iterator, or exhaust it, to release the connection.
+        """
+        tbl = self._get_kline_table(timeframe)
+        if output == "records":
+            columns = [
+                getattr(tbl, c) for c in KLINE_INDEX_ELEMENTS + KLINE_VALUE_COLUMNS
+            ]
+        else:
+            columns = self._klines_float_columns(tbl)
+        stmt = self._klines_range_select(tbl, columns, symbol, start_time, end_time)
+
+        with self.dbClient.get_bind().connect() as connection:
+            # yield_per turns on stream_results, a named cursor with psycopg2
+            result = connection.execution_options(yield_per=chunk_size).execute(stmt)
+            for rows in result.partitions():
+                if output == "records":
+                    yield [dict(row._mapping) for row in rows]
+                else:
+                    yield self._klines_columns_output(
+                        self._klines_columns(rows), output
+                    )
+
+    def get_klines_first_period_start(self, symbol: str, timeframe: str):
+        tbl = self._get_kline_table(timeframe)
+        stmt = select(func.min(tbl.period_start)).where(tbl.symbol == symbol)
+        return self.dbClient.exec(stmt).one()
+
+    def get_kline_cache_stats(self):
+        return shared_stats.snapshot()
 
     def get_linear_instrument_klines(
         self,
@@ -545,9 +1941,23 @@ class ByBitDataService:
         timeframe: str,
         start_time: datetime = None,
         end_time: datetime = None,
-        data_source: str = "redis",
+        data_source: str = "cache",
         output: str = "pandas",
     ):
+        """
+        `data_source` "cache" reads through the LRU, redis and db tiers, "redis"
+        only reads the sorted set and "db" only Postgres. `output` is "numpy"
+        ({column: array}), "pandas", "arrow" (needs pyarrow) or "records"
+        (dicts with exact Decimal values). Columnar outputs hold period_start
+        as naive local datetime64 and the values as float64.
+        """
+        if data_source == "cache":
+            cache = KlineCache(self)
+            if output == "records":
+                return cache.get(symbol, timeframe, start_time, end_time)
+            columns = cache.get(symbol, timeframe, start_time, end_time, "numpy")
+            columns["period_start"] = utils.local_datetimes(columns["period_start"])
+            return self._klines_columns_output(columns, output)
         if data_source == "redis":
             return self._retrive_linear_instrument_klines_from_redis(
                 symbol=symbol,
@@ -565,6 +1975,191 @@ class ByBitDataService:
             output=output,
         )
 
+    def get_completed_kline_backfill_windows(
+        self,
+        symbols: list,
+        interval: str,
+        start_time: datetime,
+        end_time: datetime,
+    ):
+        tbl = Market.ByBitLinearInstrumentsKlineBackfill
+        stmt = select(tbl.symbol, tbl.window_start, tbl.window_end).where(
+            and_(
+                tbl.symbol.in_(symbols),
+                tbl.interval == interval,
+                tbl.window_end >= start_time,
+                tbl.window_start <= end_time,
+            )
+        )
+        return {tuple(row) for row in self.dbClient.exec(stmt).all()}
+
+    def get_linear_instruments_klines_gaps(
+        self,
+        end_time: datetime,
+        start_time: Optional[datetime] = None,
+        symbol: Optional[str] = None,
+        quote_coin: str = "USDT",
+    ):
+        """
+        Missing 5m slots per symbol, collapsed into (symbol, gap_start, gap_end,
+        n_missing) ranges. Each symbol is checked from the latest of start_time,
+        its listing and the end of its known complete history. Slots inside a
+        checkpointed window were already asked for and the exchange has
+        nothing there, they never count as missing again.
+        """
+        query = text("""
+            WITH symbols AS (
+                SELECT i.symbol,
+                       to_timestamp(
+                           floor(coalesce(i.launch_time, 0) / 300) * 300
+                       ) AT TIME ZONE :app_tz AS launched_at,
+                       s.complete_until
+                FROM bybit_linear_perp_instruments i
+                LEFT JOIN bybit_linear_perp_kline_sync_state s ON s.symbol = i.symbol
+                WHERE i.quote_coin = :quote_coin
+                AND (i.symbol = :symbol OR CAST(:symbol AS varchar) IS NULL)
+            ),
+            slots AS (
+                SELECT sy.symbol, slot
+                FROM symbols sy
+                CROSS JOIN LATERAL generate_series(
+                    greatest(
+                        CAST(:start_time AS timestamp),
+                        sy.complete_until + interval '5 minutes',
+                        sy.launched_at
+                    ),
+                    CAST(:end_time AS timestamp),
+                    interval '5 minutes'
+                ) AS slot
+            ),
+            missing AS (
+                SELECT s.symbol, s.slot
+                FROM slots s
+                LEFT JOIN bybit_linear_perp_kline_5m k
+                ON k.symbol = s.symbol AND k.period_start = s.slot
+                WHERE k.id IS NULL
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM bybit_linear_perp_kline_backfill_checkpoints c
+                    WHERE c.symbol = s.symbol
+                    AND c.interval = :interval
+                    AND s.slot BETWEEN c.window_start AND c.window_end
+                )
+            )
+            SELECT symbol,
+                   min(slot) AS gap_start,
+                   max(slot) AS gap_end,
+                   count(*) AS n_missing
+            FROM (
+                SELECT symbol,
+                       slot,
+                       slot - row_number() OVER (
+                           PARTITION BY symbol ORDER BY slot
+                       ) * interval '5 minutes' AS island
+                FROM missing
+            ) gaps
+            GROUP BY symbol, island
+            ORDER BY symbol, gap_start
+            """)
+        params = {
+            "quote_coin": quote_coin,
+            "symbol": symbol,
+            "start_time": utils.floor_time(start_time or datetime(1970, 1, 1), 5),
+            "end_time": end_time,
+            "interval": Interval._5_MIN.value,
+            "app_tz": utils.local_timezone_name(),
+        }
+        return self.dbClient.exec(query, params=params).all()
+
+    def get_kline_sync_bounds(self, symbols: list):
+        """{symbol: (launched_at, complete_until)} for the given symbols"""
+        query = text("""
+            SELECT i.symbol,
+                   to_timestamp(coalesce(i.launch_time, 0)) AT TIME ZONE :app_tz
+                       AS launched_at,
+                   s.complete_until
+            FROM bybit_linear_perp_instruments i
+            LEFT JOIN bybit_linear_perp_kline_sync_state s ON s.symbol = i.symbol
+            WHERE i.symbol = ANY(:symbols)
+            """)
+        params = {"symbols": symbols, "app_tz": utils.local_timezone_name()}
+        rows = self.dbClient.exec(query, params=params).all()
+        return {row.symbol: (row.launched_at, row.complete_until) for row in rows}
+
+    def get_latest_linear_instrument_kline_starts(self, symbols: list):
+        """{symbol: latest stored 5m period_start}, symbols without bars left out"""
+        # One index probe per symbol instead of a GROUP BY over the whole table
+        query = text("""
+            SELECT s.symbol, k.period_start
+            FROM unnest(CAST(:symbols AS text[])) AS s(symbol)
+            CROSS JOIN LATERAL (
+                SELECT max(period_start) AS period_start
+                FROM bybit_linear_perp_kline_5m
+                WHERE symbol = s.symbol
+            ) k
+            WHERE k.period_start IS NOT NULL
+            """)
+        rows = self.dbClient.exec(query, params={"symbols": symbols}).all()
+        return {row.symbol: row.period_start for row in rows}
+
+    def get_klines_aggregation_start(self, klines_tables: list):
+        """
+        Where a batch aggregation into `klines_tables` should resume: the
+        earliest of their latest bars, or the first 5m bar if one is empty.
+        """
+        latest = [
+            self.dbClient.exec(select(func.max(tbl.period_start))).first()
+            for tbl in klines_tables
+        ]
+        if all(latest):
+            return min(latest)
+        tbl = Market.ByBitLinearInstrumentsKline5m
+        return self.dbClient.exec(select(func.min(tbl.period_start))).first()
+
+    def get_linear_instrument_kline_lows_highs(
+        self, symbol: str, timeframe: str, period_starts: list
+    ):
+        """Exact Decimal {period_start: (low_price, high_price)} of the given bars"""
+        if not period_starts:
+            return {}
+        tbl = self._get_kline_table(timeframe)
+        # One array parameter, not a bind per bar
+        starts = bindparam("period_starts", period_starts, type_=ARRAY(DateTime))
+        stmt = select(tbl.period_start, tbl.low_price, tbl.high_price).where(
+            tbl.symbol == symbol, tbl.period_start == any_(starts)
+        )
+        return {row[0]: (row[1], row[2]) for row in self.dbClient.exec(stmt).all()}
+
+    def get_pivot_states(self, symbol: str, timeframe: str, lookbacks: list):
+        """{lookback: confirmed_until} of the stored pivot watermarks"""
+        tbl = PriceLevels.PriceLevelPivotState
+        stmt = select(tbl.lookback_period, tbl.confirmed_until).where(
+            tbl.exchange == self.exchange,
+            tbl.symbol == symbol,
+            tbl.timeframe == timeframe,
+            tbl.lookback_period.in_(lookbacks),
+        )
+        return {row[0]: row[1] for row in self.dbClient.exec(stmt).all()}
+
+    def get_klines_context_start(
+        self, symbol: str, timeframe: str, before: datetime, bars: int
+    ):
+        """period_start of the `bars`-th kline at or before `before`, None if fewer"""
+        tbl = self._get_kline_table(timeframe)
+        stmt = (
+            select(tbl.period_start)
+            .where(tbl.symbol == symbol, tbl.period_start <= before)
+            .order_by(tbl.period_start.desc())
+            .offset(bars - 1)
+            .limit(1)
+        )
+        return self.dbClient.exec(stmt).first()
+
+    def get_kline_rollup_state(self, timeframe: str):
+        tbl = Market.ByBitLinearInstrumentsKlineRollupState
+        stmt = select(tbl).where(tbl.timeframe == timeframe)
+        return self.dbClient.exec(stmt).first()
+
     def get_klines_latest_period_start(
         self,
         symbol: str,
@@ -593,4 +2188,23 @@ class ByBitDataService:
                 tbl.lookback_period == lookback_period,
             )
         )
+        stmt = stmt.order_by(tbl.price_level, tbl.period_start)
         return self.dbClient.exec(stmt).all()
+
+    def get_price_pivot_levels_updated_since(self, since: Optional[datetime] = None):
+        """
+        (id, symbol, timeframe, lookback_period, price, updated_at) rows updated
+        after `since` (all of them without), in updated_at order
+        """
+        tbl = PriceLevels.PriceLevel
+        stmt = select(
+            tbl.id,
+            tbl.symbol,
+            tbl.timeframe,
+            tbl.lookback_period,
+            cast(tbl.price_level, Float),
+            tbl.updated_at,
+        ).where(tbl.exchange == self.exchange)
+        if since is not None:
+            stmt = stmt.where(tbl.updated_at > since)
+        return self.dbClient.exec(stmt.order_by(tbl.updated_at)).all()
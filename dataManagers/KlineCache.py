@@ -0,0 +1,401 @@
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+import json
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+from redis.exceptions import WatchError
+import utils
+from database.models import Market
+from dataManagers import KlineCodec
+
+
+class ByteLRU:
+    """
+    Least recently used entries are evicted once the entries' sizes add up to
+    more than `max_bytes`. Entries put with a ttl expire on their next get.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        # key -> (value, nbytes, expires_at)
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _remove(self, key: Hashable):
+        _, nbytes, _ = self.entries.pop(key)
+        self.nbytes -= nbytes
+
+    def get(self, key: Hashable):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, _, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value, nbytes: int, ttl: Optional[float] = None):
+        if nbytes > self.max_bytes:
+            return
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, nbytes, expires_at)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted, _) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def pop(self, key: Hashable):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+class TierStats:
+    """Chunk hit/miss counters per cache tier, the db tier never misses"""
+
+    TIERS = ("lru", "redis", "db")
+
+    def __init__(self):
+        self.counts = {tier: {"hits": 0, "misses": 0} for tier in self.TIERS}
+        self.lock = threading.Lock()
+
+    def record(self, tier: str, hits: int = 0, misses: int = 0):
+        with self.lock:
+            self.counts[tier]["hits"] += hits
+            self.counts[tier]["misses"] += misses
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {tier: dict(counts) for tier, counts in self.counts.items()}
+
+
+# Ingestion publishes [[symbol, timeframe, first, last], ...] after each write
+KLINES_CHANGED_CHANNEL = "bybit:klines:changed"
+
+# Shared by every KlineCache in the process, services are created per request
+shared_lru = ByteLRU()
+shared_stats = TierStats()
+_first_period_starts: Dict[tuple, Optional[int]] = {}
+# Bumped by every eviction, per (timeframe, symbol) and "*" for a clear. A
+# read only puts chunks in the LRU if no eviction ran while it was reading.
+_generations: Dict[Hashable, int] = defaultdict(int)
+
+
+class KlineCache:
+    """
+    Read-through kline reads: the process wide LRU, then redis, then Postgres.
+    Each series is cut into epoch aligned chunks of `bars_per_chunk` bars, the
+    unit every tier stores and counts. A chunk is only served from redis once a
+    marker says it was loaded whole from Postgres, write-through keeps it
+    current from then on. Closed chunks are immutable and never expire, the
+    chunk holding the open bar expires after `open_ttl` seconds in the LRU and
+    its redis marker after `open_marker_ttl`.
+    """
+
+    def __init__(
+        self,
+        data_service,
+        lru: Optional[ByteLRU] = None,
+        stats: Optional[TierStats] = None,
+        bars_per_chunk: int = 1000,
+        open_ttl: float = 60,
+        open_marker_ttl: int = 60,
+    ):
+        self.data_service = data_service
+        self.lru = shared_lru if lru is None else lru
+        self.stats = shared_stats if stats is None else stats
+        self.bars_per_chunk = bars_per_chunk
+        self.open_ttl = open_ttl
+        self.open_marker_ttl = open_marker_ttl
+
+    def chunk_seconds(self, timeframe: str) -> int:
+        seconds = Market.timeframe_seconds_map[Market.Timeframe(timeframe)]
+        return seconds * self.bars_per_chunk
+
+    def evict(self, symbol: str, timeframe: str, start: int, end: int) -> int:
+        """
+        Drop the LRU chunks overlapping period_start epochs [start, end], and
+        the series' first period_start when bars were written before it
+        """
+        span = self.chunk_seconds(timeframe)
+        chunks = range(start // span, end // span + 1)
+        _generations[(timeframe, symbol)] += 1
+        for chunk in chunks:
+            self.lru.pop((timeframe, symbol, chunk))
+        first = _first_period_starts.get((symbol, timeframe))
+        if first is not None and start < first:
+            _first_period_starts.pop((symbol, timeframe), None)
+        return len(chunks)
+
+    def clear(self):
+        """Drop everything this process cached, redis is left as it is"""
+        _generations["*"] += 1
+        self.lru.clear()
+        _first_period_starts.clear()
+
+    def _chunk_marker_key(self, timeframe: str, symbol: str, chunk: int) -> str:
+        return f"{self.data_service._klines_redis_key(timeframe, symbol)}:chunk:{chunk}"
+
+    def _generation(self, symbol: str, timeframe: str) -> tuple:
+        return _generations["*"], _generations[(timeframe, symbol)]
+
+    def _read_redis(self, symbol: str, timeframe: str, chunks: list) -> tuple:
+        """({chunk: values} for the marked chunks, the series' version)"""
+        span = self.chunk_seconds(timeframe)
+        key = self.data_service._klines_redis_key(timeframe, symbol)
+        pipeline = self.data_service.redis_bytes_client.pipeline(transaction=False)
+        pipeline.get(self.data_service._klines_version_key(timeframe, symbol))
+        for chunk in chunks:
+            pipeline.exists(self._chunk_marker_key(timeframe, symbol, chunk))
+            pipeline.zrangebyscore(key, chunk * span, (chunk + 1) * span - 1)
+        version, *replies = pipeline.execute()
+        found = {
+            chunk: values
+            for chunk, marked, values in zip(chunks, replies[::2], replies[1::2])
+            if marked
+        }
+        return found, version
+
+    def _read_db(self, symbol: str, timeframe: str, chunks: list) -> dict:
+        """{chunk: [(period_start epoch, encoded kline)]}, one query for all chunks"""
+        span = self.chunk_seconds(timeframe)
+        rows = self.data_service.get_linear_instrument_klines_rows(
+            symbol,
+            timeframe,
+            start_time=datetime.fromtimestamp(min(chunks) * span),
+            end_time=datetime.fromtimestamp((max(chunks) + 1) * span - 1),
+        )
+        loaded = {chunk: [] for chunk in chunks}
+        for row in rows:
+            score = utils.epoch_seconds(row["period_start"])
+            if score // span in loaded:
+                loaded[score // span].append((score, KlineCodec.encode_kline(row)))
+        return loaded
+
+    def _fill_redis(
+        self,
+        symbol: str,
+        timeframe: str,
+        loaded: dict,
+        open_chunk: int,
+        version: Optional[bytes],
+    ) -> bool:
+        """
+        Replace the loaded chunks and mark them, unless a write-through bumped
+        the series' version since `version` was read (before Postgres was),
+        the loaded bars may predate it then. False when the fill was dropped.
+        """
+        span = self.chunk_seconds(timeframe)
+        key = self.data_service._klines_redis_key(timeframe, symbol)
+        version_key = self.data_service._klines_version_key(timeframe, symbol)
+        pipeline = self.data_service.redis_bytes_client.pipeline(transaction=True)
+        try:
+            pipeline.watch(version_key)
+            if pipeline.get(version_key) != version:
+                return False
+            pipeline.multi()
+            for chunk, bars in loaded.items():
+                # Replaces whatever write-through left of the chunk
+                pipeline.zremrangebyscore(key, chunk * span, (chunk + 1) * span - 1)
+                if bars:
+                    pipeline.zadd(key, {value: score for score, value in bars})
+                pipeline.set(
+                    self._chunk_marker_key(timeframe, symbol, chunk),
+                    1,
+                    ex=self.open_marker_ttl if chunk >= open_chunk else None,
+                )
+            pipeline.execute()
+            return True
+        except WatchError:
+            return False
+        finally:
+            pipeline.reset()
+
+    def warm(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: datetime,
+        end_time: Optional[datetime] = None,
+    ) -> int:
+        """
+        Load the whole chunks covering [start_time, end_time] from Postgres
+        into redis with their markers, so reads are served from redis. The
+        process local LRU is left alone.
+        """
+        span = self.chunk_seconds(timeframe)
+        end = utils.epoch_seconds(end_time or datetime.now())
+        chunks = list(range(utils.epoch_seconds(start_time) // span, end // span + 1))
+        if not chunks:
+            return 0
+        version_key = self.data_service._klines_version_key(timeframe, symbol)
+        version = self.data_service.redis_bytes_client.get(version_key)
+        loaded = self._read_db(symbol, timeframe, chunks)
+        if not self._fill_redis(
+            symbol, timeframe, loaded, int(time.time()) // span, version
+        ):
+            # Written through meanwhile, the next read fills it instead
+            return 0
+        return sum(map(len, loaded.values()))
+
+    def _first_period_start(self, symbol: str, timeframe: str) -> Optional[int]:
+        key = (symbol, timeframe)
+        if key not in _first_period_starts:
+            first = self.data_service.get_klines_first_period_start(symbol, timeframe)
+            if first is None:
+                return None
+            _first_period_starts[key] = utils.epoch_seconds(first)
+        return _first_period_starts[key]
+
+    def _read_chunks(self, symbol: str, timeframe: str, chunks: list) -> List[bytes]:
+        generation = self._generation(symbol, timeframe)
+        values = {}
+        for chunk in chunks:
+            cached = self.lru.get((timeframe, symbol, chunk))
+            if cached is not None:
+                values[chunk] = cached
+        missing = [chunk for chunk in chunks if chunk not in values]
+        self.stats.record("lru", hits=len(values), misses=len(missing))
+        if not missing:
+            return [value for chunk in chunks for value in values[chunk]]
+
+        try:
+            found, version = self._read_redis(symbol, timeframe, missing)
+        except Exception as e:
+            print(f"Redis error reading {timeframe} klines for {symbol}: {e}")
+            found, version = {}, None
+        self.stats.record("redis", hits=len(found), misses=len(missing) - len(found))
+
+        open_chunk = int(time.time()) // self.chunk_seconds(timeframe)
+        loaded, filled = {}, True
+        missing = [chunk for chunk in missing if chunk not in found]
+        if missing:
+            loaded = self._read_db(symbol, timeframe, missing)
+            self.stats.record("db", hits=len(loaded))
+            try:
+                filled = self._fill_redis(
+                    symbol, timeframe, loaded, open_chunk, version
+                )
+            except Exception as e:
+                print(f"Redis error caching {timeframe} klines for {symbol}: {e}")
+
+        fetched = dict(found)
+        for chunk, bars in loaded.items():
+            fetched[chunk] = [value for _, value in bars]
+        # Bars revised while reading are served once but never cached here
+        cacheable = filled and self._generation(symbol, timeframe) == generation
+        for chunk, chunk_values in fetched.items():
+            if cacheable:
+                self.lru.put(
+                    (timeframe, symbol, chunk),
+                    chunk_values,
+                    nbytes=sum(map(len, chunk_values)),
+                    ttl=self.open_ttl if chunk >= open_chunk else None,
+                )
+            values[chunk] = chunk_values
+        return [value for chunk in chunks for value in values[chunk]]
+
+    def get(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        output: str = "records",
+    ):
+        """Klines in [start_time, end_time], as Decimal dicts or numpy columns"""
+        end = utils.epoch_seconds(end_time or datetime.now())
+        start = (
+            self._first_period_start(symbol, timeframe)
+            if start_time is None
+            else utils.epoch_seconds(start_time)
+        )
+        if start is None:
+            # Nothing stored for the symbol yet
+            return KlineCodec.decode_klines([]) if output == "numpy" else []
+        span = self.chunk_seconds(timeframe)
+        chunks = list(range(start // span, end // span + 1))
+        values = self._read_chunks(symbol, timeframe, chunks) if chunks else []
+
+        if output == "numpy":
+            columns = KlineCodec.decode_klines(values)
+            keep = (columns["period_start"] >= start) & (columns["period_start"] <= end)
+            return {column: array[keep] for column, array in columns.items()}
+
+        klines = []
+        for kline in KlineCodec.decode_klines_exact(values):
+            if start <= kline["period_start"] <= end:
+                kline["symbol"] = symbol
+                kline["period_start"] = datetime.fromtimestamp(kline["period_start"])
+                klines.append(kline)
+        return klines
+
+
+class KlineCacheInvalidator:
+    """
+    Background thread evicting the LRU chunks named by "klines changed"
+    notices. Redis is kept current by the writers themselves, only process
+    local tiers go stale. Notices sent while disconnected are lost, so
+    everything cached in the process is dropped before subscribing again.
+    """
+
+    def __init__(self, redis_client, cache: KlineCache, max_backoff: float = 30):
+        self.redis_client = redis_client
+        self.cache = cache
+        self.max_backoff = max_backoff
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def handle(self, message: dict) -> int:
+        evicted = 0
+        for symbol, timeframe, first, last in json.loads(message["data"]):
+            evicted += self.cache.evict(symbol, timeframe, first, last)
+        return evicted
+
+    def _listen(self):
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(KLINES_CHANGED_CHANNEL)
+            while not self.stopped.is_set():
+                message = pubsub.get_message(timeout=1)
+                if message is not None:
+                    self.handle(message)
+        finally:
+            pubsub.close()
+
+    def run(self):
+        backoff = 1
+        while not self.stopped.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"Klines changed subscription lost: {e}")
+                self.cache.clear()
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
@@ -0,0 +1,142 @@
+"""
+Binary encoding of cached klines.
+
+v2 records are fixed width: a tag byte, the period_start epoch as int64 and
+every value as an int64 mantissa with an int8 decimal exponent, so prices
+round trip exactly and a whole series decodes with one np.frombuffer. Values
+that don't fit fall back to the JSON v1 layout, which starts with "{" and is
+told apart by its first byte, so both coexist in the same sorted set.
+"""
+
+from decimal import Decimal
+import json
+from typing import Dict, List
+import numpy as np
+import utils
+from database.models import Market
+
+KLINE_RECORD_V2 = 2
+# The db's value columns, in order, so the layout can't drift from the table
+KLINE_RECORD_COLUMNS = Market.KLINE_VALUE_COLUMNS
+KLINE_RECORD_DTYPE = np.dtype(
+    [("tag", "u1"), ("period_start", "<i8")]
+    + [
+        field
+        for column in KLINE_RECORD_COLUMNS
+        for field in ((f"{column}_m", "<i8"), (f"{column}_e", "i1"))
+    ]
+)
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+
+
+def _mantissa_exponent(value):
+    sign, digits, exponent = Decimal(str(value)).normalize().as_tuple()
+    if not isinstance(exponent, int):
+        return None
+    mantissa = int("".join(map(str, digits)) or "0") * (-1 if sign else 1)
+    if not (INT64_MIN <= mantissa <= INT64_MAX and -128 <= exponent <= 127):
+        return None
+    return mantissa, exponent
+
+
+def encode_v1(kline: dict) -> bytes:
+    return json.dumps(
+        {
+            "symbol": kline["symbol"],
+            "period_start": utils.epoch_seconds(kline["period_start"]),
+            **{column: str(kline[column]) for column in KLINE_RECORD_COLUMNS},
+        }
+    ).encode()
+
+
+def encode_kline(kline: dict) -> bytes:
+    """v2 record, or JSON v1 when a value needs more than int64/int8"""
+    record = np.zeros(1, dtype=KLINE_RECORD_DTYPE)
+    record["tag"] = KLINE_RECORD_V2
+    record["period_start"] = utils.epoch_seconds(kline["period_start"])
+    for column in KLINE_RECORD_COLUMNS:
+        packed = _mantissa_exponent(kline[column])
+        if packed is None:
+            return encode_v1(kline)
+        record[f"{column}_m"], record[f"{column}_e"] = packed
+    return record.tobytes()
+
+
+def _is_v2(value: bytes) -> bool:
+    return len(value) == KLINE_RECORD_DTYPE.itemsize and value[0] == KLINE_RECORD_V2
+
+
+def _scaled(mantissa: np.ndarray, exponent: np.ndarray) -> np.ndarray:
+    # Dividing by an exact power of ten rounds correctly, multiplying by 1e-k doesn't
+    exponent = exponent.astype(np.int64)
+    return np.where(
+        exponent < 0,
+        mantissa / np.power(10.0, -np.minimum(exponent, 0)),
+        mantissa * np.power(10.0, np.maximum(exponent, 0)),
+    )
+
+
+def decode_klines(values: List[bytes]) -> Dict[str, np.ndarray]:
+    """Columns of a series, period_start as int64 epoch seconds, values float64"""
+    columns = {"period_start": np.empty(len(values), dtype=np.int64)}
+    for column in KLINE_RECORD_COLUMNS:
+        columns[column] = np.empty(len(values), dtype=np.float64)
+
+    v2 = np.fromiter((_is_v2(value) for value in values), bool, len(values))
+    if v2.any():
+        records = np.frombuffer(
+            b"".join(value for value, is_v2 in zip(values, v2) if is_v2),
+            dtype=KLINE_RECORD_DTYPE,
+        )
+        columns["period_start"][v2] = records["period_start"]
+        for column in KLINE_RECORD_COLUMNS:
+            columns[column][v2] = _scaled(
+                records[f"{column}_m"], records[f"{column}_e"]
+            )
+    for i in np.flatnonzero(~v2):
+        data = json.loads(values[i])
+        columns["period_start"][i] = data["period_start"]
+        for column in KLINE_RECORD_COLUMNS:
+            columns[column][i] = float(data[column])
+    return columns
+
+
+def _decimal_kline(record: tuple) -> dict:
+    # (tag, period_start, m, e, m, e, ...) as plain Python ints
+    return {
+        "period_start": record[1],
+        **{
+            column: Decimal(record[2 + 2 * i]).scaleb(record[3 + 2 * i])
+            for i, column in enumerate(KLINE_RECORD_COLUMNS)
+        },
+    }
+
+
+def _decimal_kline_v1(value: bytes) -> dict:
+    data = json.loads(value)
+    return {
+        "period_start": data["period_start"],
+        **{column: Decimal(data[column]) for column in KLINE_RECORD_COLUMNS},
+    }
+
+
+def decode_kline(value: bytes) -> dict:
+    """One kline with exact Decimal values and period_start as epoch seconds"""
+    if not _is_v2(value):
+        return _decimal_kline_v1(value)
+    return _decimal_kline(np.frombuffer(value, dtype=KLINE_RECORD_DTYPE).tolist()[0])
+
+
+def decode_klines_exact(values: List[bytes]) -> List[dict]:
+    """decode_kline over a series, the v2 records are unpacked in one pass"""
+    v2 = [_is_v2(value) for value in values]
+    records = iter(
+        np.frombuffer(
+            b"".join(value for value, is_v2 in zip(values, v2) if is_v2),
+            dtype=KLINE_RECORD_DTYPE,
+        ).tolist()
+    )
+    return [
+        _decimal_kline(next(records)) if is_v2 else _decimal_kline_v1(value)
+        for value, is_v2 in zip(values, v2)
+    ]
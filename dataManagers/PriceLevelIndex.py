@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+class PriceLevelIndex:
+    """
+    Every pivot level in one sorted complex array. The real part is a group
+    id per (symbol, timeframe, lookback) and the imaginary part the price,
+    numpy orders complex numbers lexicographically so each group is a sorted
+    run and a single searchsorted answers queries across many symbols.
+
+    Levels are picked up by updated_at and merged in by id, so a level
+    rewritten in place replaces its old price. Each refresh re-reads the
+    last `refresh_overlap`, parallel pivot shards commit out of order and a
+    transaction's rows carry its start time, not its commit time.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 60,
+        refresh_overlap: timedelta = timedelta(minutes=10),
+    ):
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = refresh_overlap
+        self.groups: Dict[tuple, int] = {}
+        self.keys = np.empty(0, dtype=np.complex128)
+        # id -> key currently in self.keys
+        self.levels: Dict[int, complex] = {}
+        self.updated_until: Optional[datetime] = None
+        self.refreshed_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _group(self, key: tuple) -> int:
+        return self.groups.setdefault(key, len(self.groups))
+
+    def _remove(self, keys: np.ndarray) -> np.ndarray:
+        """self.keys without one occurrence of each of `keys`"""
+        keys = np.sort(keys)
+        # Equal keys take consecutive positions within their run
+        rank = np.arange(len(keys)) - np.searchsorted(keys, keys)
+        return np.delete(self.keys, np.searchsorted(self.keys, keys) + rank)
+
+    def add(self, rows: list) -> int:
+        """
+        Merge (id, symbol, timeframe, lookback_period, price, ...) rows, a row
+        replaces the level with the same id and a None price removes it
+        """
+        with self.lock:
+            changed = {}
+            for row in rows:
+                key = None
+                if row[4] is not None:
+                    key = self._group((row[1], row[2], row[3])) + 1j * row[4]
+                if self.levels.get(row[0]) != key:
+                    changed[row[0]] = key
+            if not changed:
+                return 0
+
+            replaced = [self.levels[i] for i in changed if i in self.levels]
+            new_keys = np.sort(
+                np.array([k for k in changed.values() if k is not None], dtype=complex)
+            )
+            keys = self._remove(np.array(replaced, dtype=complex))
+            positions = np.searchsorted(keys, new_keys)
+            # Readers hold on to the old array, the swap is atomic for them
+            self.keys = np.insert(keys, positions, new_keys)
+            for i, key in changed.items():
+                if key is None:
+                    self.levels.pop(i, None)
+                else:
+                    self.levels[i] = key
+        return len(changed)
+
+    def stale(self) -> bool:
+        return (
+            self.refreshed_at is None
+            or time.monotonic() - self.refreshed_at > self.refresh_interval
+        )
+
+    def refresh(self, data_service) -> int:
+        """Merge levels updated since the last refresh, everything on the first"""
+        since = None
+        if self.updated_until is not None:
+            since = self.updated_until - self.refresh_overlap
+        rows = data_service.get_price_pivot_levels_updated_since(since)
+        changed = self.add(rows)
+        latest = max((row[5] for row in rows if row[5] is not None), default=None)
+        if latest is not None and (
+            self.updated_until is None or latest > self.updated_until
+        ):
+            self.updated_until = latest
+        self.refreshed_at = time.monotonic()
+        return changed
+
+    def reload(self, data_service) -> int:
+        """Rebuild from scratch"""
+        with self.lock:
+            self.groups = {}
+            self.keys = np.empty(0, dtype=np.complex128)
+            self.levels = {}
+            self.updated_until = None
+        return self.refresh(data_service)
+
+    def nearest(
+        self,
+        symbols: List[str],
+        prices,
+        timeframe: str = "1h",
+        lookback: int = 10,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Closest level at or below (support) and at or above (resistance) each
+        price, NaN where a symbol has no level on that side.
+        """
+        keys = self.keys
+        prices = np.asarray(prices, dtype=float)
+        groups = np.array(
+            [self.groups.get((symbol, timeframe, lookback), -1) for symbol in symbols],
+            dtype=float,
+        )
+        support = np.full(len(prices), np.nan)
+        resistance = np.full(len(prices), np.nan)
+        if not len(keys) or not len(prices):
+            return support, resistance
+
+        queries = groups + 1j * prices
+        above = np.searchsorted(keys, queries)
+        candidates = keys[np.minimum(above, len(keys) - 1)]
+        found = (above < len(keys)) & (candidates.real == groups)
+        resistance[found] = candidates.imag[found]
+
+        # A level exactly at the price is both support and resistance
+        below = np.where(candidates == queries, above, above - 1)
+        candidates = keys[np.maximum(below, 0)]
+        found = (below >= 0) & (candidates.real == groups)
+        support[found] = candidates.imag[found]
+        return support, resistance
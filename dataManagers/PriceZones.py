@@ -0,0 +1,162 @@
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+PriceZone = namedtuple(
+    "PriceZone",
+    [
+        "low",
+        "high",
+        "price",
+        "touches",
+        "weight",
+        "supports",
+        "resistances",
+        "last_touch",
+    ],
+)
+
+
+def _snap(value: Decimal, tick_size: Decimal, rounding) -> Decimal:
+    return (value / tick_size).to_integral_value(rounding=rounding) * tick_size
+
+
+def build_price_zones(
+    levels: list,
+    tick_size: Decimal,
+    price_scale: Optional[int] = None,
+    zone_pct: float = 0.002,
+    half_life: timedelta = timedelta(days=30),
+    now: Optional[datetime] = None,
+) -> List[PriceZone]:
+    """
+    Cluster pivot levels (PriceLevel rows or dicts) into price bands sorted by
+    price. Consecutive pivots closer than `zone_pct` of the median pivot price,
+    rounded to whole ticks, share a band. Each pivot adds a recency weight
+    that halves every `half_life`. Band edges sit on the tick grid.
+    """
+    levels = [level if isinstance(level, dict) else level.to_dict() for level in levels]
+    if not levels:
+        return []
+    tick_size = Decimal(tick_size)
+    now = now or datetime.now()
+    levels.sort(key=lambda level: level["price_level"])
+
+    median = levels[len(levels) // 2]["price_level"]
+    width = max(1, round(float(median) * zone_pct / float(tick_size))) * tick_size
+
+    clusters = [[levels[0]]]
+    for level in levels[1:]:
+        if level["price_level"] - clusters[-1][-1]["price_level"] <= width:
+            clusters[-1].append(level)
+        else:
+            clusters.append([level])
+
+    quantum = Decimal(1).scaleb(-price_scale) if price_scale is not None else None
+    zones = []
+    for cluster in clusters:
+        weights = [
+            0.5 ** ((now - level["period_start"]) / half_life) for level in cluster
+        ]
+        total = sum(weights)
+        price = sum(
+            float(level["price_level"]) * weight
+            for level, weight in zip(cluster, weights)
+        )
+        price = _snap(Decimal(repr(price / total)), tick_size, ROUND_FLOOR)
+        low = _snap(cluster[0]["price_level"], tick_size, ROUND_FLOOR)
+        high = _snap(cluster[-1]["price_level"], tick_size, ROUND_CEILING)
+        if quantum is not None:
+            low, high, price = (v.quantize(quantum) for v in (low, high, price))
+        zones.append(
+            PriceZone(
+                low=low,
+                high=high,
+                price=min(max(price, low), high),
+                touches=len(cluster),
+                weight=total,
+                supports=sum(1 for level in cluster if level["is_support"]),
+                resistances=sum(1 for level in cluster if level["is_resistance"]),
+                last_touch=max(level["period_start"] for level in cluster),
+            )
+        )
+    return zones
+
+
+class PriceZoneIndex:
+    """
+    Non overlapping zones per key (symbol, timeframe, lookback) kept sorted
+    by price, with the lower edges in a parallel list so lookups bisect. A key
+    goes stale `refresh_interval` seconds after it was built, rebuilding picks
+    up new pivots and moves the recency weights to the current time.
+    """
+
+    def __init__(self, refresh_interval: float = 60):
+        self.refresh_interval = refresh_interval
+        self.zones: Dict[tuple, List[PriceZone]] = {}
+        self.lows: Dict[tuple, List[Decimal]] = {}
+        self.built_at: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.zones
+
+    def update(self, key: tuple, zones: List[PriceZone]):
+        zones = sorted(zones, key=lambda zone: zone.low)
+        with self.lock:
+            self.zones[key] = zones
+            self.lows[key] = [zone.low for zone in zones]
+            self.built_at[key] = time.monotonic()
+
+    def stale(self, key: tuple) -> bool:
+        built_at = self.built_at.get(key)
+        return built_at is None or time.monotonic() - built_at > self.refresh_interval
+
+    def nearest(
+        self, key: tuple, price: Decimal, k: int = 3
+    ) -> Tuple[List[PriceZone], Optional[PriceZone], List[PriceZone]]:
+        """
+        (up to k zones below, nearest first; the zone containing price, if
+        any; up to k zones above, nearest first) in O(log n + k).
+        """
+        with self.lock:
+            zones = self.zones.get(key, [])
+            lows = self.lows.get(key, [])
+        price = Decimal(price)
+        above_start = bisect_right(lows, price)
+        inside = None
+        below_end = above_start
+        if above_start and zones[above_start - 1].high >= price:
+            inside = zones[above_start - 1]
+            below_end -= 1
+        below = zones[max(0, below_end - k) : below_end][::-1]
+        above = zones[above_start : above_start + k]
+        return below, inside, above
+
+    def refresh(
+        self,
+        data_service,
+        symbol: str,
+        timeframe: str = "1h",
+        lookback: int = 10,
+        instrument=None,
+        **kwargs,
+    ) -> List[PriceZone]:
+        """Rebuild one key from the stored pivot levels and instrument ticks"""
+        if instrument is None:
+            instrument = data_service.get_linear_instrument(symbol)
+        levels = data_service.get_symbols_price_pivot_levels(
+            symbol=symbol, timeframe=timeframe, lookback_period=lookback
+        )
+        zones = build_price_zones(
+            levels,
+            tick_size=instrument.tick_size,
+            price_scale=instrument.price_scale,
+            **kwargs,
+        )
+        self.update((symbol, timeframe, lookback), zones)
+        return zones
@@ -1,4 +1,9 @@
+import io
+import uuid
+from decimal import Decimal
 from sqlmodel import create_engine, Session
+from sqlalchemy import column, literal_column, select, table
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import logging
 from Config import settings
 
@@ -18,3 +23,115 @@ def get_engine(connnection_str: str = None):
 def get_session(connection_str: str = None):
     db = Session(get_engine(connection_str))
     return db
+
+
+def _dedupe_rows(rows: list, index_elements: list) -> list:
+    # ON CONFLICT can't touch the same row twice in one statement, last one wins
+    deduped = {}
+    for row in rows:
+        deduped[tuple(row[c] for c in index_elements)] = row
+    return list(deduped.values())
+
+
+def _csv_field(value) -> str:
+    # COPY csv only reads an unquoted empty field as NULL, a quoted "" is an
+    # empty string, so None can't go through csv.QUOTE_NONNUMERIC
+    if value is None:
+        return ""
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_rows(connection, table_name: str, columns: list, rows: list):
+    """Stream rows into `table_name` with COPY FROM STDIN (csv)"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_csv_field(row[c]) for c in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "{table_name}" ({column_list}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_insert(session: Session, tbl, rows: list) -> int:
+    """Append rows to `tbl` with a single COPY, no conflict handling"""
+    if not rows:
+        return 0
+    copy_rows(session.connection(), tbl.__table__.name, list(rows[0].keys()), rows)
+    return len(rows)
+
+
+def bulk_upsert(
+    session: Session,
+    tbl,
+    rows: list,
+    index_elements: list,
+    update_columns: list = None,
+    computed_columns: dict = None,
+    distinct_column: str = None,
+) -> int:
+    """
+    Upsert `rows` (list of dicts with the same keys) into `tbl` in two round
+    trips: COPY into a temp staging table, then a single
+    INSERT ... SELECT ... ON CONFLICT merge. Runs inside the session's
+    transaction, committing is left to the caller.
+
+    `computed_columns` maps extra target columns to SQL expressions over the
+    staged columns. With `distinct_column` set, conflicting rows are only
+    updated when that column differs, and the returned count only includes
+    rows that were actually written.
+    """
+    if not rows:
+        return 0
+
+    target = tbl.__table__
+    columns = list(rows[0].keys())
+    computed_columns = computed_columns or {}
+    if update_columns is None:
+        update_columns = [
+            c for c in [*columns, *computed_columns] if c not in index_elements
+        ]
+    rows = _dedupe_rows(rows, index_elements)
+
+    connection = session.connection()
+    staging_name = f"{target.name}_staging_{uuid.uuid4().hex[:8]}"
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    connection.exec_driver_sql(
+        f'CREATE TEMP TABLE "{staging_name}" ON COMMIT DROP AS '
+        f'SELECT {column_list} FROM "{target.name}" WITH NO DATA'
+    )
+    copy_rows(connection, staging_name, columns, rows)
+
+    staging = table(staging_name, *[column(c) for c in columns])
+    stmt = pg_insert(target).from_select(
+        [*columns, *computed_columns],
+        select(
+            *staging.c,
+            *[literal_column(expr).label(c) for c, expr in computed_columns.items()],
+        ),
+    )
+    if update_columns:
+        where = None
+        if distinct_column is not None:
+            where = target.c[distinct_column].is_distinct_from(
+                stmt.excluded[distinct_column]
+            )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_columns},
+            where=where,
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    result = connection.execute(stmt)
+    connection.exec_driver_sql(f'DROP TABLE "{staging_name}"')
+    return result.rowcount
@@ -1,8 +1,31 @@
 from datetime import datetime
 from enum import Enum
 from typing import Optional
-from sqlmodel import SQLModel, Field, Numeric, UniqueConstraint
+from sqlmodel import SQLModel, Field, Numeric, UniqueConstraint, BigInteger, text
 from decimal import Decimal
+import utils
+
+KLINE_VALUE_COLUMNS = [
+    "open_price",
+    "high_price",
+    "low_price",
+    "close_price",
+    "volume",
+    "turnover",
+]
+
+# SQL twin of utils.row_digest over the normalized OHLCV of a kline row
+KLINE_DIGEST_SQL = (
+    "('x' || substr(md5(concat_ws('|', "
+    # concat_ws skips NULLs, row_digest keeps their place as an empty string
+    + ", ".join(
+        f"coalesce(CAST({c} AS numeric(38, 8))::text, '')" for c in KLINE_VALUE_COLUMNS
+    )
+    + ")), 1, 16))::bit(64)::bigint"
+)
+
+# Set on every kline merge, updated_at drives the incremental rollups
+KLINE_COMPUTED_COLUMNS = {"digest": KLINE_DIGEST_SQL, "updated_at": "now()"}
 
 
 class ByBitLinearInstruments(SQLModel, table=True):
@@ -34,6 +57,8 @@ class ByBitLinearInstruments(SQLModel, table=True):
     max_price: Decimal
     tick_size: Decimal
 
+    digest: Optional[int] = Field(default=None, sa_type=BigInteger)
+
     def set_symbol(self, value: str):
         self.symbol = value
 
@@ -50,6 +75,27 @@ class ByBitLinearInstruments(SQLModel, table=True):
             print(f"Error converting launch time: {value}")
             self.launch_time = None
 
+    def set_digest(self):
+        self.digest = utils.row_digest(
+            [
+                self.symbol,
+                self.base_coin,
+                self.quote_coin,
+                self.launch_time,
+                self.price_scale,
+                self.funding_interval,
+                self.min_leverage,
+                self.max_leverage,
+                self.leverage_step,
+                self.max_trading_qty,
+                self.min_trading_qty,
+                self.qty_step,
+                self.min_price,
+                self.max_price,
+                self.tick_size,
+            ]
+        )
+
     def set_price_scale(self, value: str):
         try:
             self.price_scale = int(value)
@@ -128,6 +174,8 @@ class ByBitLinearInstruments(SQLModel, table=True):
             self.tick_size = None
 
     def is_equal(self, other):
+        if self.digest is not None and other.digest is not None:
+            return self.digest == other.digest
         return (
             self.symbol == other.symbol
             and self.base_coin == other.base_coin
@@ -372,6 +420,12 @@ class ByBitLinearInstrumentsKline5m(SQLModel, table=True):
     close_price: Decimal = Field(sa_column=Numeric(38, 8))
     volume: Decimal = Field(sa_column=Numeric(38, 8))
     turnover: Decimal = Field(sa_column=Numeric(38, 8))
+    digest: Optional[int] = Field(default=None, sa_type=BigInteger)
+    updated_at: Optional[datetime] = Field(
+        default=None, index=True, sa_column_kwargs={"server_default": text("now()")}
+    )
+    # Raw landing row id the bar was last merged from, NULL for direct writes
+    source_id: Optional[int] = Field(default=None, sa_type=BigInteger)
 
     __table_args__ = (
         UniqueConstraint("symbol", "period_start", name="uix_symbol_period_start"),
@@ -480,6 +534,10 @@ class ByBitLinearInstrumentsKline15m(SQLModel, table=True):
     close_price: Decimal = Field(sa_column=Numeric(38, 8))
     volume: Decimal = Field(sa_column=Numeric(38, 8))
     turnover: Decimal = Field(sa_column=Numeric(38, 8))
+    digest: Optional[int] = Field(default=None, sa_type=BigInteger)
+    updated_at: Optional[datetime] = Field(
+        default=None, index=True, sa_column_kwargs={"server_default": text("now()")}
+    )
 
     __table_args__ = (
         UniqueConstraint("symbol", "period_start", name="uix_symbol_period_start_15m"),
@@ -499,6 +557,10 @@ class ByBitLinearInstrumentsKline1h(SQLModel, table=True):
     close_price: Decimal = Field(sa_column=Numeric(38, 8))
     volume: Decimal = Field(sa_column=Numeric(38, 8))
     turnover: Decimal = Field(sa_column=Numeric(38, 8))
+    digest: Optional[int] = Field(default=None, sa_type=BigInteger)
+    updated_at: Optional[datetime] = Field(
+        default=None, index=True, sa_column_kwargs={"server_default": text("now()")}
+    )
 
     __table_args__ = (
         UniqueConstraint("symbol", "period_start", name="uix_symbol_period_start_1h"),
@@ -530,6 +592,10 @@ class ByBitLinearInstrumentsKline4h(SQLModel, table=True):
     close_price: Decimal = Field(sa_column=Numeric(38, 8))
     volume: Decimal = Field(sa_column=Numeric(38, 8))
     turnover: Decimal = Field(sa_column=Numeric(38, 8))
+    digest: Optional[int] = Field(default=None, sa_type=BigInteger)
+    updated_at: Optional[datetime] = Field(
+        default=None, index=True, sa_column_kwargs={"server_default": text("now()")}
+    )
 
     __table_args__ = (
         UniqueConstraint("symbol", "period_start", name="uix_symbol_period_start_4h"),
@@ -561,6 +627,10 @@ class ByBitLinearInstrumentsKline1d(SQLModel, table=True):
     close_price: Decimal = Field(sa_column=Numeric(38, 8))
     volume: Decimal = Field(sa_column=Numeric(38, 8))
     turnover: Decimal = Field(sa_column=Numeric(38, 8))
+    digest: Optional[int] = Field(default=None, sa_type=BigInteger)
+    updated_at: Optional[datetime] = Field(
+        default=None, index=True, sa_column_kwargs={"server_default": text("now()")}
+    )
 
     __table_args__ = (
         UniqueConstraint("symbol", "period_start", name="uix_symbol_period_start_1d"),
@@ -579,6 +649,49 @@ class ByBitLinearInstrumentsKline1d(SQLModel, table=True):
         }
 
 
+class ByBitLinearInstrumentsKlineBackfill(SQLModel, table=True):
+    __tablename__ = "bybit_linear_perp_kline_backfill_checkpoints"
+
+    # Primary key and tracking fields
+    id: Optional[int] = Field(default=None, primary_key=True)
+    symbol: str = Field(index=True)
+    interval: str
+    window_start: datetime
+    window_end: datetime
+    num_klines: int
+    completed_at: datetime
+
+    __table_args__ = (
+        UniqueConstraint(
+            "symbol",
+            "interval",
+            "window_start",
+            "window_end",
+            name="uix_backfill_symbol_interval_window",
+        ),
+    )
+
+
+class ByBitLinearInstrumentsKlineSyncState(SQLModel, table=True):
+    __tablename__ = "bybit_linear_perp_kline_sync_state"
+
+    # Every 5m slot from listing up to complete_until is in the kline table
+    id: Optional[int] = Field(default=None, primary_key=True)
+    symbol: str = Field(unique=True)
+    complete_until: datetime
+    updated_at: datetime
+
+
+class ByBitLinearInstrumentsKlineRollupState(SQLModel, table=True):
+    __tablename__ = "bybit_linear_perp_kline_rollup_state"
+
+    # Source rows changed up to changed_until are rolled into this timeframe
+    id: Optional[int] = Field(default=None, primary_key=True)
+    timeframe: str = Field(unique=True)
+    changed_until: datetime
+    updated_at: datetime
+
+
 class Timeframe(Enum):
     FIVE_MINUTES = "5m"
     FIFTEEN_MINUTES = "15m"
@@ -594,3 +707,11 @@ timeframe_table_map = {
     Timeframe.FOUR_HOUR: ByBitLinearInstrumentsKline4h,
     Timeframe.ONE_DAY: ByBitLinearInstrumentsKline1d,
 }
+
+timeframe_seconds_map = {
+    Timeframe.FIVE_MINUTES: 300,
+    Timeframe.FIFTEEN_MINUTES: 900,
+    Timeframe.ONE_HOUR: 3600,
+    Timeframe.FOUR_HOUR: 14400,
+    Timeframe.ONE_DAY: 86400,
+}
@@ -1,8 +1,19 @@
 from datetime import datetime
 from typing import Optional
-from sqlmodel import SQLModel, Field, Numeric, UniqueConstraint
+from sqlmodel import SQLModel, Field, Numeric, UniqueConstraint, BigInteger, text
 from decimal import Decimal
 
+# Digest of what a full run can change, unchanged levels are left alone
+PRICE_LEVEL_DIGEST_SQL = (
+    "('x' || substr(md5(concat_ws('|', "
+    "CAST(price_level AS numeric(38, 8)), is_support, is_resistance"
+    ")), 1, 16))::bit(64)::bigint"
+)
+PRICE_LEVEL_COMPUTED_COLUMNS = {
+    "digest": PRICE_LEVEL_DIGEST_SQL,
+    "updated_at": "now()",
+}
+
 
 class PriceLevel(SQLModel, table=True):
     __tablename__ = "crypto_symbols_price_pivot_levels"
@@ -24,6 +35,12 @@ class PriceLevel(SQLModel, table=True):
     # Level characteristics
     is_support: bool = Field(default=False)
     is_resistance: bool = Field(default=False)
+    digest: Optional[int] = Field(default=None, sa_type=BigInteger)
+
+    # Set on every write, API workers refresh their level index from it
+    updated_at: Optional[datetime] = Field(
+        default=None, index=True, sa_column_kwargs={"server_default": text("now()")}
+    )
 
     __table_args__ = (
         UniqueConstraint(
@@ -49,3 +66,28 @@ class PriceLevel(SQLModel, table=True):
             "is_support": self.is_support,
             "is_resistance": self.is_resistance,
         }
+
+
+class PriceLevelPivotState(SQLModel, table=True):
+    __tablename__ = "crypto_symbols_price_pivot_state"
+
+    # Pivots of bars up to confirmed_until can no longer change
+    id: Optional[int] = Field(default=None, primary_key=True)
+    exchange: str = Field(default="bybit")
+    symbol: str
+    instrument_type: str = Field(default="perp")
+    timeframe: str
+    lookback_period: int
+    confirmed_until: datetime
+    updated_at: datetime
+
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange",
+            "symbol",
+            "instrument_type",
+            "timeframe",
+            "lookback_period",
+            name="uix_price_pivot_state_symbol_timeframe_lookback",
+        ),
+    )
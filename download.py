@@ -1,21 +1,76 @@
 import argparse
+from datetime import datetime
 from dataManagers.ByBitMarketDataManager import ByBitDataIngestion
 import utils
 
 
-def main(symbol=None, start_date=None, end_date=None):
+def main(
+    symbol=None,
+    start_date=None,
+    end_date=None,
+    workers=1,
+    backfill=False,
+    sync=False,
+    land=False,
+    cascade=False,
+    batch=False,
+    processes=1,
+):
     bb = ByBitDataIngestion()
-    if start_date or end_date:
+    if sync:
+        start_time = None
+        if start_date:
+            start_date, _ = utils.parse_dates(start_date, None)
+            start_time = datetime.combine(start_date, datetime.min.time())
+        bb.download_linear_usdt_instruments()
+        bb.sync_linear_instrument_klines(
+            symbol=symbol, start_time=start_time, max_workers=workers
+        )
+        bb.rollup_linear_instruments_klines(symbol=symbol, cascade=cascade)
+
+    elif backfill:
+        start_date, end_date = utils.parse_dates(start_date, end_date)
+        start_time = datetime.combine(start_date, datetime.min.time())
+        end_time = datetime.combine(end_date, datetime.max.time())
+        bb.backfill_linear_instrument_klines(
+            start_time=start_time,
+            end_time=end_time,
+            symbol=symbol,
+            max_workers=max(workers, 1),
+        )
+        bb.aggregate_linear_instruments_klines(
+            symbol=symbol,
+            start_time=start_time,
+            end_time=end_time,
+            cascade=cascade,
+            batch=batch,
+            max_workers=processes,
+        )
+
+    elif start_date or end_date:
         start_date, end_date = utils.parse_dates(start_date, end_date)
         for single_date in utils.daterange(start_date, end_date):
             print(f"running for {single_date}")
-            bb.download_klines_by_date(kline_date=single_date, symbol=symbol)
-            bb.aggregate_klines_by_date(kline_date=single_date, symbol=symbol)
+            bb.download_klines_by_date(
+                kline_date=single_date, symbol=symbol, max_workers=workers
+            )
+            bb.aggregate_klines_by_date(
+                kline_date=single_date,
+                symbol=symbol,
+                cascade=cascade,
+                batch=batch,
+                max_workers=processes,
+            )
 
     else:
         bb.download_linear_usdt_instruments()
-        bb.download_linear_instrument_klines(symbol=symbol)
-        bb.aggregate_linear_instruments_klines(symbol=symbol)
+        bb.download_linear_instrument_klines(
+            symbol=symbol, max_workers=workers, landing=land
+        )
+        if land:
+            # Normalization runs separately, see process_raw_klines.py
+            return
+        bb.rollup_linear_instruments_klines(symbol=symbol, cascade=cascade)
 
 
 if __name__ == "__main__":
@@ -25,7 +80,58 @@ if __name__ == "__main__":
     parser.add_argument("--start_date", type=str, help="Start date in YYYY-MM-DD")
     parser.add_argument("--end_date", type=str, help="End date in YYYY-MM-DD")
     parser.add_argument("--symbol", type=str, help="Symbol to download")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of symbols to download concurrently",
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Resumable backfill of start_date -> end_date in 1000 candle windows",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Download only missing 5m candles (since start_date if given)",
+    )
+    parser.add_argument(
+        "--land",
+        action="store_true",
+        help="Only append raw klines to the landing table",
+    )
+
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="Build each timeframe from the next lower one instead of from 5m",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Aggregate all symbols and timeframes together in vectorized slices",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Worker processes for per-symbol aggregation of date ranges",
+    )
 
     args = parser.parse_args()
+    if args.backfill and not args.start_date:
+        parser.error("--backfill requires --start_date")
 
-    main(symbol=args.symbol, start_date=args.start_date, end_date=args.end_date)
+    main(
+        symbol=args.symbol,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        workers=args.workers,
+        backfill=args.backfill,
+        sync=args.sync,
+        land=args.land,
+        cascade=args.cascade,
+        batch=args.batch,
+        processes=args.processes,
+    )
@@ -0,0 +1,60 @@
+import argparse
+import csv
+from datetime import datetime
+from dataManagers.ByBitMarketDataManager import (
+    ByBitDataService,
+    KLINE_INDEX_ELEMENTS,
+    KLINE_VALUE_COLUMNS,
+)
+import utils
+
+
+def main(symbol, timeframe="5m", output=None, start_date=None, end_date=None):
+    bb = ByBitDataService()
+    start_time, end_time = None, None
+    if start_date or end_date:
+        start_date, end_date = utils.parse_dates(start_date, end_date)
+        start_time = datetime.combine(start_date, datetime.min.time())
+        end_time = datetime.combine(end_date, datetime.max.time())
+
+    output = output or f"{symbol}_{timeframe}.csv"
+    exported = 0
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=KLINE_INDEX_ELEMENTS + KLINE_VALUE_COLUMNS
+        )
+        writer.writeheader()
+        # Streamed in chunks, the whole history is never held in memory
+        for chunk in bb.iter_linear_instrument_klines(
+            symbol,
+            timeframe,
+            start_time=start_time,
+            end_time=end_time,
+            output="records",
+        ):
+            writer.writerows(chunk)
+            exported += len(chunk)
+    print(f"done : exported {exported} klines to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export klines to a CSV file.")
+    parser.add_argument("--symbol", type=str, required=True, help="Symbol to export")
+    parser.add_argument(
+        "--timeframe", type=str, default="5m", help="Timeframe to export"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="CSV path, <symbol>_<timeframe>.csv"
+    )
+    parser.add_argument("--start_date", type=str, help="Start date in YYYY-MM-DD")
+    parser.add_argument("--end_date", type=str, help="End date in YYYY-MM-DD")
+
+    args = parser.parse_args()
+
+    main(
+        symbol=args.symbol,
+        timeframe=args.timeframe,
+        output=args.output,
+        start_date=args.start_date,
+        end_date=args.end_date,
+    )
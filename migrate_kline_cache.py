@@ -0,0 +1,31 @@
+import argparse
+from dataManagers.ByBitMarketDataManager import ByBitDataService
+
+
+def main(keep_old=False, batch_size=10000):
+    bb = ByBitDataService()
+    migrated = bb.migrate_linear_instrument_klines_cache(
+        delete_old=not keep_old, batch_size=batch_size
+    )
+    print(f"done : migrated {migrated} klines")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move cached klines from one Redis key per bar into sorted sets."
+    )
+    parser.add_argument(
+        "--keep_old",
+        action="store_true",
+        help="Leave the per bar keys in place after copying them",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=10000,
+        help="Keys scanned and moved per round trip",
+    )
+
+    args = parser.parse_args()
+
+    main(keep_old=args.keep_old, batch_size=args.batch_size)
@@ -1,12 +1,30 @@
 import argparse
-from dataManagers.ByBitMarketDataManager import ByBitDataIngestion, ByBitDataService
-import utils
+from dataManagers.ByBitMarketDataManager import ByBitDataIngestion
 
-bbDi = ByBitDataIngestion()
-bbDs = ByBitDataService()
 
-instruments = bbDs.get_linear_usdt_instruments(quote_coin="USDT", data_source="db")
-for instrument in instruments:
-    print(f"Processing pivot levels for {instrument.symbol}")
-    bbDi.process_pivot_levels(symbol=instrument.symbol)
-print("done")
+def main(symbol=None, workers=1, full=False):
+    bbDi = ByBitDataIngestion()
+    bbDi.process_all_pivot_levels(
+        symbols=[symbol] if symbol else None, max_workers=workers, full=full
+    )
+    print("done")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect ByBit pivot price levels.")
+    parser.add_argument("--symbol", type=str, help="Symbol to process")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes, symbols are sharded across them",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Recompute pivots over the whole history instead of since the watermark",
+    )
+
+    args = parser.parse_args()
+
+    main(symbol=args.symbol, workers=args.workers, full=args.full)
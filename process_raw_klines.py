@@ -0,0 +1,54 @@
+import argparse
+import time
+from multiprocessing import Process
+from dataManagers.ByBitMarketDataManager import ByBitDataIngestion
+
+
+def worker(batch_size: int, follow: bool, poll_seconds: float):
+    # Every process gets its own engine and session
+    bb = ByBitDataIngestion()
+    while True:
+        claimed = bb.process_raw_linear_instruments_klines(batch_size=batch_size)
+        if claimed:
+            continue
+        if not follow:
+            return
+        time.sleep(poll_seconds)
+
+
+def main(workers=1, batch_size=5000, follow=False, poll_seconds=5.0):
+    processes = [
+        Process(target=worker, args=(batch_size, follow, poll_seconds))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Normalize landed ByBit raw klines into the 5m kline table."
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument(
+        "--batch_size", type=int, default=5000, help="Raw rows claimed per batch"
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep polling for new raw rows instead of exiting when drained",
+    )
+    parser.add_argument(
+        "--poll_seconds", type=float, default=5.0, help="Idle poll interval"
+    )
+
+    args = parser.parse_args()
+
+    main(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        follow=args.follow,
+        poll_seconds=args.poll_seconds,
+    )
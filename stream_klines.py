@@ -0,0 +1,46 @@
+import argparse
+import signal
+from dataManagers.ByBitKlineStream import ByBitKlineStreamIngestion
+
+
+def main(symbols=None, flush_interval_ms=500, backfill_workers=8):
+    stream = ByBitKlineStreamIngestion(
+        symbols=symbols,
+        flush_interval_ms=flush_interval_ms,
+        backfill_workers=backfill_workers,
+    )
+    signal.signal(signal.SIGINT, lambda *_: stream.stop())
+    signal.signal(signal.SIGTERM, lambda *_: stream.stop())
+    stream.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream ByBit 5m klines into Postgres and Redis."
+    )
+    parser.add_argument(
+        "--symbols",
+        nargs="*",
+        default=None,
+        help="Symbols to subscribe to, all USDT linear instruments by default",
+    )
+    parser.add_argument(
+        "--flush_interval_ms",
+        type=int,
+        default=500,
+        help="How often confirmed bars are written",
+    )
+    parser.add_argument(
+        "--backfill_workers",
+        type=int,
+        default=8,
+        help="Concurrent fetches when backfilling after a reconnect",
+    )
+
+    args = parser.parse_args()
+
+    main(
+        symbols=args.symbols,
+        flush_interval_ms=args.flush_interval_ms,
+        backfill_workers=args.backfill_workers,
+    )
@@ -1,12 +1,57 @@
-from dataManagers.ByBitMarketDataManager import ByBitDataIngestion, ByBitDataService
+from concurrent.futures import ThreadPoolExecutor
+from dataManagers.ByBitMarketDataManager import (
+    ByBitDataIngestion,
+    ByBitDataService,
+    KLINE_VALUE_COLUMNS,
+    ShardResult,
+    _run_symbol_shard,
+)
+import numpy as np
+import pandas as pd
 import pytest
-from datetime import datetime
+import utils
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from unittest.mock import Mock, patch
-from database.models import Market
+from unittest.mock import MagicMock, Mock, patch
+from sqlalchemy.dialects import postgresql
+from database.models import Market, PriceLevels
 from xchanges.ByBit import Category
 
 
+def merged_row(symbol=None, **counts):
+    """A row of a merge statement's counts LEFT JOINed with its RETURNING"""
+    return Mock(
+        symbol=symbol,
+        period_start=datetime(2024, 1, 1),
+        open_price=Decimal("1"),
+        high_price=Decimal("2"),
+        low_price=Decimal("0.5"),
+        close_price=Decimal("1.5"),
+        volume=Decimal("10"),
+        turnover=Decimal("15"),
+        **counts,
+    )
+
+
+def serve_exact_prices(service, klines):
+    """Float frame to stream from Decimal kline dicts, and their exact lookup"""
+    prices = {k["period_start"]: (k["low_price"], k["high_price"]) for k in klines}
+    service.get_linear_instrument_kline_lows_highs.side_effect = (
+        lambda symbol, timeframe, period_starts: {s: prices[s] for s in period_starts}
+    )
+    return pd.DataFrame(klines).astype({"low_price": float, "high_price": float})
+
+
+def upserted(bulk_upsert, tbl):
+    """Rows written to `tbl` across every bulk_upsert call, in call order"""
+    return [
+        row
+        for call in bulk_upsert.call_args_list
+        if call[0][1] == tbl
+        for row in call[0][2]
+    ]
+
+
 class TestByBitDataIngestion:
     @pytest.fixture
     def data_ingestion(self, mock_market_data, mock_db_operations):
@@ -61,6 +106,10 @@ class TestByBitDataIngestion:
 
         # Verify the mock was called correctly
         data_ingestion.client.fetch_instruments.assert_called_once()
+        stmt, rows = data_ingestion.dbClient.execute.call_args[0]
+        assert stmt.is_insert
+        assert [row["symbol"] for row in rows] == ["BTCUSDT"]
+        assert "id" not in rows[0]
         data_ingestion.bb_data_service.get_linear_usdt_instruments.assert_called_once_with(
             quote_coin=data_ingestion.quote_coin
         )
@@ -116,10 +165,724 @@ class TestByBitDataIngestion:
         assert updates == 1, "Should have one update"
         assert deletes == 0, "Should have no deletes"
 
-        # Verify mock calls
-        data_ingestion.dbClient.add.assert_called_once()
+        # Verify mock calls, changed rows are written by primary key in one statement
+        data_ingestion.dbClient.add.assert_not_called()
+        data_ingestion.dbClient.execute.assert_called_once()
+        stmt, rows = data_ingestion.dbClient.execute.call_args[0]
+        assert stmt.is_update
+        assert rows[0]["id"] == existing_instrument.id
+        assert rows[0]["symbol"] == "BTCUSDT"
+        data_ingestion.dbClient.commit.assert_called_once()
+
+    def test_download_linear_usdt_instruments_deletes_delisted(self, data_ingestion):
+        """Test delisted instruments are removed with a single IN delete"""
+        data_ingestion.client.fetch_instruments.return_value = [
+            {"symbol": "ETHUSDT", "quoteCoin": "USDC"}
+        ]
+        data_ingestion._convert_xchange_instruments_dict = Mock(
+            return_value=Mock(quote_coin="USDC")
+        )
+        data_ingestion.bb_data_service.get_linear_usdt_instruments.return_value = [
+            Mock(symbol="BTCUSDT"),
+            Mock(symbol="SOLUSDT"),
+        ]
+
+        inserts, updates, deletes = data_ingestion.download_linear_usdt_instruments()
+
+        assert (inserts, updates, deletes) == (0, 0, 2)
+        stmt = data_ingestion.dbClient.execute.call_args[0][0]
+        assert stmt.is_delete
+        assert stmt.compile().params["symbol_1"] == ["BTCUSDT", "SOLUSDT"]
+
+    def test_download_linear_usdt_instruments_keeps_rows_on_empty_fetch(
+        self, data_ingestion
+    ):
+        """Test a failed fetch doesn't wipe the instruments table"""
+        data_ingestion.client.fetch_instruments.return_value = []
+        data_ingestion.bb_data_service.get_linear_usdt_instruments.return_value = [
+            Mock(symbol="BTCUSDT")
+        ]
+
+        assert data_ingestion.download_linear_usdt_instruments() == (0, 0, 0)
+        data_ingestion.dbClient.execute.assert_not_called()
+
+    def test_download_linear_instrument_klines_concurrently(self, data_ingestion):
+        """Test fetches fan out per symbol and writes are committed in one batch"""
+        symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+        data_ingestion.bb_data_service.get_linear_usdt_instruments.return_value = [
+            Mock(symbol=symbol) for symbol in symbols
+        ]
+        data_ingestion.client.fetch_kline.return_value = [
+            ["1633046400000", "1", "2", "0.5", "1.5", "10", "15"]
+        ]
+        data_ingestion._store_linear_instruments_klines = Mock(return_value=1)
+
+        latencies, wall_clock = data_ingestion.download_linear_instrument_klines(
+            start_time=datetime(2021, 10, 1),
+            end_time=datetime(2021, 10, 2),
+            max_workers=3,
+        )
+
+        assert set(latencies) == set(symbols)
+        assert wall_clock >= 0
+        assert data_ingestion.client.fetch_kline.call_count == 3
+        assert data_ingestion._store_linear_instruments_klines.call_count == 3
+        data_ingestion.dbClient.commit.assert_called_once()
+
+    def test_downloaded_klines_are_written_through_after_commit(self, data_ingestion):
+        """Test committed 5m klines reach redis and a redis error doesn't fail"""
+        data_ingestion.client.fetch_kline.return_value = [
+            ["1633046400000", "1", "2", "0.5", "1.5", "10", "15"]
+        ]
+        data_ingestion._store_linear_instruments_klines_frame = Mock(return_value=1)
+        cache = data_ingestion.bb_data_service.cache_linear_instrument_klines
+        cache.side_effect = ConnectionError("redis down")
+
+        data_ingestion._download_linear_instruments_klines_concurrently(
+            jobs=[
+                ("BTCUSDT", datetime(2021, 10, 1), datetime(2021, 10, 2)),
+                ("ETHUSDT", datetime(2021, 10, 1), datetime(2021, 10, 2)),
+            ],
+            max_workers=2,
+        )
+
+        data_ingestion.dbClient.commit.assert_called_once()
+        timeframe, klines = cache.call_args[0]
+        assert timeframe == "5m"
+        assert sorted(kline["symbol"] for kline in klines) == ["BTCUSDT", "ETHUSDT"]
+
+    def test_plan_linear_instruments_klines_backfill_skips_completed(
+        self, data_ingestion
+    ):
+        """Test windows already checkpointed are not planned again"""
+        start_time = datetime(2024, 1, 1)
+        end_time = datetime(2024, 1, 10)
+        data_ingestion.bb_data_service.get_completed_kline_backfill_windows.return_value = (
+            set()
+        )
+        first_plan = data_ingestion._plan_linear_instruments_klines_backfill(
+            symbols=["BTCUSDT"], start_time=start_time, end_time=end_time
+        )
+        data_ingestion.bb_data_service.get_completed_kline_backfill_windows.return_value = {
+            first_plan[0]
+        }
+
+        plan = data_ingestion._plan_linear_instruments_klines_backfill(
+            symbols=["BTCUSDT"], start_time=start_time, end_time=end_time
+        )
+
+        assert plan == first_plan[1:]
+
+    def test_sync_linear_instrument_klines_downloads_only_gaps(self, data_ingestion):
+        """Test each gap is requested in windows of at most 1000 candles"""
+        gap_start = datetime(2024, 1, 1)
+        data_ingestion.bb_data_service.get_linear_instruments_klines_gaps.return_value = [
+            Mock(
+                symbol="BTCUSDT",
+                gap_start=gap_start,
+                gap_end=gap_start + timedelta(minutes=5 * 1199),
+                n_missing=1200,
+            )
+        ]
+        data_ingestion._download_linear_instruments_klines_concurrently = Mock()
+        data_ingestion._update_kline_sync_state = Mock()
+
+        data_ingestion.sync_linear_instrument_klines(
+            symbol="BTCUSDT", end_time=datetime(2024, 1, 10)
+        )
+
+        download = data_ingestion._download_linear_instruments_klines_concurrently
+        jobs = download.call_args[1]["jobs"]
+        # Windows are checkpointed so bars the exchange never returns aren't retried
+        assert (
+            download.call_args[1]["on_stored"]
+            == data_ingestion._record_kline_backfill_window
+        )
+        assert jobs == [
+            (
+                "BTCUSDT",
+                gap_start,
+                gap_start + timedelta(minutes=5 * 1000, seconds=-1),
+            ),
+            (
+                "BTCUSDT",
+                gap_start + timedelta(minutes=5 * 1000),
+                gap_start + timedelta(minutes=5 * 1200, seconds=-1),
+            ),
+        ]
+        data_ingestion._update_kline_sync_state.assert_called_once()
+
+    def test_update_kline_sync_state_stops_at_first_remaining_gap(self, data_ingestion):
+        """Test complete_until only advances up to the first unfilled slot"""
+        last_closed = datetime(2024, 1, 3)
+        data_ingestion.bb_data_service.get_kline_sync_bounds.return_value = {
+            "BTCUSDT": (datetime(2023, 12, 31), None),
+            "ETHUSDT": (datetime(2023, 12, 31), datetime(2024, 1, 1, 10)),
+        }
+        data_ingestion.bb_data_service.get_linear_instruments_klines_gaps.return_value = [
+            Mock(symbol="ETHUSDT", gap_start=datetime(2024, 1, 2)),
+        ]
+
+        with patch(
+            "dataManagers.ByBitMarketDataManager.dbOperations.bulk_upsert"
+        ) as bulk_upsert:
+            updated = data_ingestion._update_kline_sync_state(
+                ["BTCUSDT", "ETHUSDT"], None, last_closed
+            )
+
+        states = {
+            row["symbol"]: row["complete_until"] for row in bulk_upsert.call_args[0][2]
+        }
+        assert updated == 2
+        assert states == {
+            "BTCUSDT": last_closed,
+            "ETHUSDT": datetime(2024, 1, 1, 23, 55),
+        }
+
+    def test_convert_xchange_klines_frame_matches_orm_conversion(self, data_ingestion):
+        """Test columnar decode agrees with process_xchange_info and drops bad rows"""
+        klines = [
+            [
+                "1633046700000",
+                "50010.5",
+                "51000",
+                "49000.25",
+                "50500",
+                "100.5",
+                "5025000",
+            ],
+            ["1633046400000", "50000", "51000", "49000", "50010.5", "12", "600000"],
+            ["1633046100000", "oops", "51000", "49000", "50000", "12", "600000"],
+        ]
+
+        df = data_ingestion._convert_xchange_klines_frame("BTCUSDT", klines)
+
+        assert len(df) == 2
+        for row, kline in zip(df.to_dict("records"), klines):
+            expected = Market.ByBitLinearInstrumentsKline5m()
+            expected.set_symbol("BTCUSDT")
+            expected.process_xchange_info(kline)
+            assert row["period_start"] == expected.period_start
+            for key, value in expected.to_dict().items():
+                if key not in ("symbol", "period_start"):
+                    assert Decimal(row[key]) == value
+
+    def test_land_linear_instruments_klines_appends_raw_rows(self, data_ingestion):
+        """Test landing writes raw exchange strings with a plain bulk insert"""
+        klines = [["1633046400000", "1", "2", "0.5", "1.5", "10", "15"]]
+
+        with patch(
+            "dataManagers.ByBitMarketDataManager.dbOperations.bulk_insert",
+            return_value=1,
+        ) as bulk_insert:
+            landed = data_ingestion._land_linear_instruments_klines("BTCUSDT", klines)
+
+        assert landed == 1
+        tbl, rows = bulk_insert.call_args[0][1:]
+        assert tbl == Market.ByBitLinearInstrumentsKline5mRaw
+        assert rows[0]["symbol"] == "BTCUSDT"
+        assert rows[0]["startTime"] == "1633046400000"
+        assert rows[0]["turnover"] == "15"
+
+    def test_process_raw_linear_instruments_klines_claims_with_skip_locked(
+        self, data_ingestion
+    ):
+        """Test a batch is claimed, merged and flagged in one committed statement"""
+        data_ingestion.dbClient.exec.return_value.all.return_value = [
+            merged_row(claimed=3, valid=3, symbol="BTCUSDT"),
+            merged_row(claimed=3, valid=3, symbol="ETHUSDT"),
+        ]
+
+        claimed = data_ingestion.process_raw_linear_instruments_klines(batch_size=3)
+
+        assert claimed == 3
+        query = data_ingestion.dbClient.exec.call_args[0][0].text
+        assert "FOR UPDATE SKIP LOCKED" in query
+        assert "SET is_processed = true" in query
+        assert "LEFT JOIN merged ON true" in query
+        # Converted in the app's zone, not the db session's
+        assert "AT TIME ZONE :app_tz" in query
+        params = data_ingestion.dbClient.exec.call_args[1]["params"]
+        assert params["app_tz"] == utils.local_timezone_name()
+        data_ingestion.dbClient.commit.assert_called_once()
+        timeframe, klines = (
+            data_ingestion.bb_data_service.cache_linear_instrument_klines.call_args[0]
+        )
+        assert timeframe == "5m"
+        assert [kline["symbol"] for kline in klines] == ["BTCUSDT", "ETHUSDT"]
+
+    def test_process_raw_linear_instruments_klines_interleaved_batches(
+        self, data_ingestion
+    ):
+        """Test an older claim committed after a newer one leaves the bar alone"""
+        cache = data_ingestion.bb_data_service.cache_linear_instrument_klines
+        # Worker B merges the newer revision first, worker A's older one then
+        # conflicts on source_id and returns nothing
+        data_ingestion.dbClient.exec.return_value.all.side_effect = [
+            [merged_row(claimed=1, valid=1, symbol="BTCUSDT")],
+            [merged_row(claimed=1, valid=1)],
+        ]
+
+        assert data_ingestion.process_raw_linear_instruments_klines() == 1
+        assert data_ingestion.process_raw_linear_instruments_klines() == 1
+
+        for call in data_ingestion.dbClient.exec.call_args_list:
+            query = call[0][0].text
+            assert "id AS source_id" in query
+            assert "source_id = EXCLUDED.source_id" in query
+            assert (
+                "AND coalesce(bybit_linear_perp_kline_5m.source_id, 0)\n"
+                "                    < EXCLUDED.source_id" in query
+            )
+        assert cache.call_count == 1
+        assert [kline["symbol"] for kline in cache.call_args[0][1]] == ["BTCUSDT"]
+
+    def test_rollup_linear_instruments_klines_incremental(self, data_ingestion):
+        """Test one statement per timeframe over changed buckets, then the watermark"""
+        run_started = datetime(2024, 1, 2)
+        data_ingestion.bb_data_service.get_kline_rollup_state.return_value = Mock(
+            changed_until=datetime(2024, 1, 1, 12, 0)
+        )
+        data_ingestion.dbClient.exec.return_value.one.return_value = (run_started,)
+        data_ingestion.dbClient.exec.return_value.all.return_value = [
+            merged_row(buckets=4, complete=3, symbol="BTCUSDT"),
+            merged_row(buckets=4, complete=3, symbol="ETHUSDT"),
+        ]
+
+        with patch("database.Operations.bulk_upsert") as bulk_upsert:
+            written = data_ingestion.rollup_linear_instruments_klines(timeframe="1h")
+
+        assert written == 2
+        (query,) = data_ingestion.dbClient.exec.call_args[0]
+        params = data_ingestion.dbClient.exec.call_args[1]["params"]
+        assert "HAVING count(*) = :num_candles" in query.text
+        assert "INSERT INTO bybit_linear_perp_kline_1h" in query.text
+        assert "IS DISTINCT FROM EXCLUDED.digest" in query.text
+        assert "RETURNING symbol, period_start, open_price" in query.text
+        assert params["num_candles"] == 12 and params["bucket_seconds"] == 3600
+        assert params["changed_since"] == datetime(2024, 1, 1, 11, 50)
+        state = bulk_upsert.call_args[0][2][0]
+        assert state["timeframe"] == "1h" and state["changed_until"] == run_started
+        data_ingestion.dbClient.commit.assert_called_once()
+        timeframe, klines = (
+            data_ingestion.bb_data_service.cache_linear_instrument_klines.call_args[0]
+        )
+        assert timeframe == "1h" and len(klines) == 2
+
+    def test_rollup_linear_instruments_klines_range_keeps_watermark(
+        self, data_ingestion
+    ):
+        """Test a ranged or single symbol rollup doesn't move the watermark"""
+        data_ingestion.dbClient.exec.return_value.one.return_value = (
+            datetime(2024, 1, 2),
+        )
+        data_ingestion.dbClient.exec.return_value.all.return_value = [
+            merged_row(buckets=1, complete=1, symbol="BTCUSDT")
+        ]
+
+        with patch("database.Operations.bulk_upsert") as bulk_upsert:
+            written = data_ingestion.rollup_linear_instruments_klines(
+                symbol="BTCUSDT", start_time=datetime(2024, 1, 1)
+            )
+
+        assert written == 4
+        data_ingestion.bb_data_service.get_kline_rollup_state.assert_not_called()
+        bulk_upsert.assert_not_called()
+        params = data_ingestion.dbClient.exec.call_args[1]["params"]
+        assert "changed_since" not in params
+        assert params["symbol"] == "BTCUSDT"
+        assert params["start_time"] == datetime(2024, 1, 1)
+
+    def test_rollup_linear_instruments_klines_cascade(self, data_ingestion):
+        """Test cascading builds every timeframe from the next lower one"""
+        data_ingestion.bb_data_service.get_kline_rollup_state.return_value = None
+        data_ingestion.dbClient.exec.return_value.one.return_value = (
+            datetime(2024, 1, 2),
+        )
+        data_ingestion.dbClient.exec.return_value.all.return_value = [
+            merged_row(buckets=1, complete=1, symbol="BTCUSDT")
+        ]
+
+        with patch("database.Operations.bulk_upsert"):
+            data_ingestion.rollup_linear_instruments_klines(cascade=True)
+
+        rollups = [
+            call for call in data_ingestion.dbClient.exec.call_args_list if call[1]
+        ]
+        sources = [
+            (call[0][0].text.split("JOIN ")[1].split()[0], call[1]["params"])
+            for call in rollups
+        ]
+        assert [(source, p["num_candles"]) for source, p in sources] == [
+            ("bybit_linear_perp_kline_5m", 3),
+            ("bybit_linear_perp_kline_15m", 4),
+            ("bybit_linear_perp_kline_1h", 4),
+            ("bybit_linear_perp_kline_4h", 6),
+        ]
+
+    def test_aggregate_linear_instruments_klines_cascade_reads_lower_timeframe(
+        self, data_ingestion
+    ):
+        """Test the pandas path builds 1d from six complete 4h bars"""
+        start = datetime(2024, 1, 1)
+        df = pd.DataFrame(
+            {
+                "symbol": "BTCUSDT",
+                "period_start": [start + timedelta(hours=4 * i) for i in range(6)],
+                "open_price": [Decimal(i + 1) for i in range(6)],
+                "high_price": [Decimal(10 + i) for i in range(6)],
+                "low_price": [Decimal(1) for _ in range(6)],
+                "close_price": [Decimal(i + 2) for i in range(6)],
+                "volume": [Decimal("1.5") for _ in range(6)],
+                "turnover": [Decimal(2) for _ in range(6)],
+            }
+        )
+
+        stream = data_ingestion.bb_data_service.iter_linear_instrument_klines
+        stream.return_value = iter([df.to_dict("records")])
+
+        with patch("database.Operations.bulk_upsert") as bulk_upsert:
+            data_ingestion._aggregate_linear_instruments_klines(
+                "BTCUSDT", "1d", start, start + timedelta(days=1), cascade=True
+            )
+
+        assert stream.call_args[1]["timeframe"] == "4h"
+        tbl, rows = bulk_upsert.call_args[0][1:3]
+        assert tbl == Market.ByBitLinearInstrumentsKline1d
+        assert len(rows) == 1
+        assert rows[0]["open_price"] == 1 and rows[0]["close_price"] == 7
+        assert rows[0]["high_price"] == 15 and rows[0]["volume"] == Decimal("9.0")
+
+    def test_aggregate_linear_instruments_klines_streams_chunks(self, data_ingestion):
+        """Test a bucket split across chunks is carried over, each chunk commits"""
+        start = datetime(2024, 1, 1)
+        klines = [
+            {
+                "symbol": "BTCUSDT",
+                "period_start": start + timedelta(minutes=5 * i),
+                "open_price": Decimal(i),
+                "high_price": Decimal(i + 1),
+                "low_price": Decimal(i - 1),
+                "close_price": Decimal(i),
+                "volume": Decimal("0.5"),
+                "turnover": Decimal(1),
+            }
+            for i in range(9)
+        ]
+        stream = data_ingestion.bb_data_service.iter_linear_instrument_klines
+        stream.return_value = iter([klines[:4], klines[4:8], klines[8:]])
+
+        with patch("database.Operations.bulk_upsert", return_value=1) as bulk_upsert:
+            written = data_ingestion._aggregate_linear_instruments_klines(
+                "BTCUSDT", "15m", start, start + timedelta(minutes=40), chunk_size=4
+            )
+
+        assert stream.call_args[1]["timeframe"] == "5m"
+        rows = [row for call in bulk_upsert.call_args_list for row in call[0][2]]
+        assert written == len(rows) == 3
+        assert [(r["open_price"], r["close_price"]) for r in rows] == [
+            (0, 2),
+            (3, 5),
+            (6, 8),
+        ]
+        assert rows[1]["volume"] == Decimal("1.5")
+        assert data_ingestion.dbClient.commit.call_count == 3
+
+    def test_reduce_linear_instruments_klines_frame_across_symbols(
+        self, data_ingestion
+    ):
+        """Test one vectorized pass matches per-symbol OHLCV and drops partial bars"""
+        start = datetime(2024, 1, 1)
+        frames = []
+        for symbol, n in [("BTCUSDT", 12), ("ETHUSDT", 11), ("SOLUSDT", 24)]:
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "symbol": symbol,
+                        "period_start": [
+                            start + timedelta(minutes=5 * i) for i in range(n)
+                        ],
+                        "open_price": [(100 + i) * 10**8 for i in range(n)],
+                        "high_price": [(110 + i % 5) * 10**8 for i in range(n)],
+                        "low_price": [(90 - i % 3) * 10**8 for i in range(n)],
+                        "close_price": [(101 + i) * 10**8 + 5 for i in range(n)],
+                        "volume": [Decimal("0.1") for _ in range(n)],
+                        "turnover": [Decimal("1.00000001") for _ in range(n)],
+                    }
+                )
+            )
+        df = pd.concat(frames, ignore_index=True)
+
+        rows = data_ingestion._reduce_linear_instruments_klines_frame(df, "1h")
+
+        assert [(r["symbol"], r["period_start"]) for r in rows] == [
+            ("BTCUSDT", start),
+            ("SOLUSDT", start),
+            ("SOLUSDT", start + timedelta(hours=1)),
+        ]
+        assert rows[0]["open_price"] == Decimal("100")
+        assert rows[0]["high_price"] == Decimal("114")
+        assert rows[0]["low_price"] == Decimal("88")
+        assert rows[0]["close_price"] == Decimal("112.00000005")
+        assert rows[0]["volume"] == Decimal("1.2")
+        assert rows[0]["turnover"] == Decimal("12.00000012")
+        assert rows[2]["open_price"] == Decimal("112")
+
+    def test_aggregate_linear_instruments_klines_batch_writes_per_table(
+        self, data_ingestion
+    ):
+        """Test a batch run loads each slice once and writes every timeframe"""
+        start = datetime(2024, 1, 1)
+        df = pd.DataFrame(
+            {
+                "symbol": "BTCUSDT",
+                "period_start": [start + timedelta(minutes=5 * i) for i in range(288)],
+                "open_price": 10**8,
+                "high_price": 2 * 10**8,
+                "low_price": 10**8,
+                "close_price": 10**8,
+                "volume": Decimal("1"),
+                "turnover": Decimal("1"),
+            }
+        )
+        data_ingestion._load_linear_instruments_klines_slice = Mock(
+            side_effect=[df, df.iloc[:0]]
+        )
+
+        with patch("database.Operations.bulk_upsert", return_value=1) as bulk_upsert:
+            data_ingestion.aggregate_linear_instruments_klines(
+                start_time=start,
+                end_time=start + timedelta(days=8, hours=3),
+                batch=True,
+            )
+
+        slices = data_ingestion._load_linear_instruments_klines_slice.call_args_list
+        assert [call[0][:2] for call in slices] == [
+            (start, start + timedelta(days=7)),
+            (start + timedelta(days=7), start + timedelta(days=9)),
+        ]
+        written = {
+            call[0][1].__tablename__: len(call[0][2])
+            for call in bulk_upsert.call_args_list
+        }
+        assert written == {
+            "bybit_linear_perp_kline_15m": 96,
+            "bybit_linear_perp_kline_1h": 24,
+            "bybit_linear_perp_kline_4h": 6,
+            "bybit_linear_perp_kline_1d": 1,
+        }
         data_ingestion.dbClient.commit.assert_called_once()
 
+    def test_run_symbol_shards_reports_per_shard(self, data_ingestion, capsys):
+        """Test symbols are sharded round robin and a crashed shard is reported"""
+
+        def run_shard(job, shard, symbols, kwargs):
+            if shard == 1:
+                raise RuntimeError("worker died")
+            return ShardResult(shard, symbols, symbols[:-1], {symbols[-1]: "bad"}, 1)
+
+        with patch(
+            "dataManagers.ByBitMarketDataManager.ProcessPoolExecutor",
+            lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+        ), patch("dataManagers.ByBitMarketDataManager._run_symbol_shard", run_shard):
+            results = data_ingestion.run_symbol_shards(
+                "aggregate", ["A", "B", "C", "D", "E"], 2, timeframe="1h"
+            )
+
+        assert [r.symbols for r in results] == [["A", "C", "E"], ["B", "D"]]
+        assert results[0].done == ["A", "C"] and results[0].failed == {"E": "bad"}
+        assert results[1].failed == {"B": "worker died", "D": "worker died"}
+        output = capsys.readouterr().out
+        assert "Shard 0 aggregate: 2/3 symbols" in output
+        assert "Shard 1 aggregate: 0/2 symbols" in output
+
+    def test_serial_runs_report_like_shards(self, data_ingestion):
+        """Test a single shard runs in process and reports failures, not raises"""
+        data_ingestion.process_pivot_levels = Mock(
+            side_effect=[None, Exception("boom")]
+        )
+        data_ingestion.aggregate_symbol_klines = Mock()
+
+        with patch("dataManagers.ByBitMarketDataManager.ProcessPoolExecutor") as pool:
+            pivots = data_ingestion.process_all_pivot_levels(
+                symbols=["BTCUSDT", "ETHUSDT"], full=False
+            )
+            aggregated = data_ingestion.aggregate_klines_by_date(
+                date(2024, 1, 1), symbol="BTCUSDT", max_workers=4
+            )
+
+        pool.assert_not_called()
+        (result,) = pivots
+        assert result.shard == 0
+        assert result.done == ["BTCUSDT"] and result.failed == {"ETHUSDT": "boom"}
+        data_ingestion.dbClient.rollback.assert_called_once()
+        assert [r.done for r in aggregated] == [["BTCUSDT"]]
+        kwargs = data_ingestion.aggregate_symbol_klines.call_args[1]
+        assert kwargs["timeframes"] == ["15m", "1h", "4h", "1d"]
+        assert kwargs["start_time"] == datetime(2024, 1, 1)
+
+    def test_run_symbol_shard_uses_own_session(self, mock_db_operations):
+        """Test a worker builds its own ingestion and isolates symbol failures"""
+        with patch(
+            "dataManagers.ByBitMarketDataManager.ByBitDataIngestion"
+        ) as ingestion:
+            bb = ingestion.return_value
+            bb.process_pivot_levels.side_effect = [None, Exception("boom")]
+
+            result = _run_symbol_shard("pivots", 3, ["BTCUSDT", "ETHUSDT"], {})
+
+        assert result.shard == 3
+        assert result.done == ["BTCUSDT"]
+        assert result.failed == {"ETHUSDT": "boom"}
+        bb.dbClient.rollback.assert_called_once()
+        bb.dbClient.close.assert_called_once()
+
+    def test_process_pivot_levels_loads_each_timeframe_once(self, data_ingestion):
+        """Test all lookbacks come from one load and go out in one upsert each"""
+        start = datetime(2024, 1, 1)
+        lows = [5, 4, 3, 2, 1, 2, 3, 4, 5, 6, 7]
+        klines = [
+            {
+                "period_start": start + timedelta(hours=i),
+                "low_price": Decimal(low) + Decimal("0.123456789"),
+                "high_price": Decimal(low + 1),
+            }
+            for i, low in enumerate(lows)
+        ]
+        df = serve_exact_prices(data_ingestion.bb_data_service, klines)
+        stream = data_ingestion.bb_data_service.iter_linear_instrument_klines
+        stream.side_effect = lambda **kwargs: iter([df])
+
+        with patch("database.Operations.bulk_upsert") as bulk_upsert:
+            written = data_ingestion.process_pivot_levels(
+                "BTCUSDT", timeframes=["1h", "4h"], lookbacks=[2, 4, 5]
+            )
+
+        assert stream.call_count == 2
+        # One levels and one watermarks upsert per timeframe's single chunk
+        assert [call[0][1] for call in bulk_upsert.call_args_list] == [
+            PriceLevels.PriceLevel,
+            PriceLevels.PriceLevelPivotState,
+        ] * 2
+        assert data_ingestion.dbClient.commit.call_count == 2
+        levels = bulk_upsert.call_args_list[0][1]
+        # A full run only rewrites levels whose price or flags changed
+        assert levels["update_columns"] is None
+        assert levels["distinct_column"] == "digest"
+        assert "digest" in levels["computed_columns"]
+        rows = upserted(bulk_upsert, PriceLevels.PriceLevel)
+        assert written == len(rows) == 4
+        assert {(r["timeframe"], r["lookback_period"]) for r in rows} == {
+            ("1h", 2),
+            ("1h", 4),
+            ("4h", 2),
+            ("4h", 4),
+        }
+        # Stored exactly as read, not through a float
+        assert all(
+            r["is_support"] and r["price_level"] == Decimal("1.123456789") for r in rows
+        )
+        # Only the pivot bar's exact prices are read, once per timeframe
+        lookup = data_ingestion.bb_data_service.get_linear_instrument_kline_lows_highs
+        assert [call[1]["period_starts"] for call in lookup.call_args_list] == [
+            [start + timedelta(hours=4)]
+        ] * 2
+        assert {
+            (r["timeframe"], r["lookback_period"], r["confirmed_until"])
+            for r in upserted(bulk_upsert, PriceLevels.PriceLevelPivotState)
+        } == {
+            (tf, k, start + timedelta(hours=10 - k))
+            for tf in ("1h", "4h")
+            for k in (2, 4, 5)
+        }
+
+    def test_process_pivot_levels_chunks_match_one_load(self, data_ingestion):
+        """Test streamed chunks with carried context give the same levels"""
+        start = datetime(2024, 1, 1)
+        rng = np.random.default_rng(7)
+        lows = rng.integers(1, 50, 60)
+        highs = lows + rng.integers(0, 5, 60)
+        klines = serve_exact_prices(
+            data_ingestion.bb_data_service,
+            [
+                {
+                    "period_start": start + timedelta(hours=i),
+                    "low_price": Decimal(int(lows[i])),
+                    "high_price": Decimal(int(highs[i])),
+                }
+                for i in range(60)
+            ],
+        )
+        stream = data_ingestion.bb_data_service.iter_linear_instrument_klines
+
+        results = []
+        for size in (60, 7):
+            stream.return_value = iter(
+                [klines.iloc[i : i + size] for i in range(0, 60, size)]
+            )
+            with patch("database.Operations.bulk_upsert") as bulk_upsert:
+                data_ingestion.process_pivot_levels(
+                    "BTCUSDT", timeframes=["1h"], lookbacks=[2, 3]
+                )
+            # Each chunk is written before the next one is read
+            assert bulk_upsert.call_count == 2 * len(range(0, 60, size))
+            states = upserted(bulk_upsert, PriceLevels.PriceLevelPivotState)
+            results.append(
+                (
+                    sorted(
+                        (r["lookback_period"], r["period_start"], r["price_level"])
+                        for r in upserted(bulk_upsert, PriceLevels.PriceLevel)
+                    ),
+                    # The last chunk's watermarks are the final ones
+                    {(r["lookback_period"], r["confirmed_until"]) for r in states[-2:]},
+                )
+            )
+
+        assert results[0][0] and results[0] == results[1]
+
+    def test_process_pivot_levels_incremental_from_watermark(self, data_ingestion):
+        """Test only bars after the watermark plus context load, new pivots append"""
+        start = datetime(2024, 1, 1)
+        lows = [1, 3, 2, 4, 5, 0, 6, 7, 2, 8, 9]
+        data_ingestion.bb_data_service.get_pivot_states.return_value = {
+            2: start + timedelta(hours=4)
+        }
+        data_ingestion.bb_data_service.get_klines_context_start.return_value = (
+            start + timedelta(hours=1)
+        )
+        klines = [
+            {
+                "period_start": start + timedelta(hours=i),
+                "low_price": Decimal(lows[i]),
+                "high_price": Decimal(lows[i]),
+            }
+            for i in range(1, 11)
+        ]
+        df = serve_exact_prices(data_ingestion.bb_data_service, klines)
+        stream = data_ingestion.bb_data_service.iter_linear_instrument_klines
+        stream.return_value = iter([df])
+
+        with patch("database.Operations.bulk_upsert") as bulk_upsert:
+            written = data_ingestion.process_pivot_levels(
+                "BTCUSDT", timeframes=["1h"], lookbacks=[2], full=False
+            )
+
+        context = data_ingestion.bb_data_service.get_klines_context_start.call_args
+        assert context[1]["bars"] == 4
+        assert context[1]["before"] == start + timedelta(hours=4)
+        load = stream.call_args
+        assert load[1]["start_time"] == start + timedelta(hours=1)
+        assert load[1]["output"] == "pandas"
+
+        levels, states = bulk_upsert.call_args_list
+        assert levels[1]["update_columns"] == []
+        assert written == 2
+        assert [(r["period_start"], r["is_support"]) for r in levels[0][2]] == [
+            (start + timedelta(hours=5), True),
+            (start + timedelta(hours=8), True),
+        ]
+        assert states[0][2][0]["confirmed_until"] == start + timedelta(hours=8)
+
 
 class TestByBitDataService:
     @pytest.fixture
@@ -164,6 +927,130 @@ class TestByBitDataService:
         assert isinstance(result["volume"], Decimal)
         assert result["open_price"] == Decimal("50000.00")
 
+    def test_warm_linear_instrument_klines_cache(self, data_service):
+        data_service.redis_bytes_client = Mock()
+        data_service.redis_bytes_client.get.return_value = None
+        data_service.redis_bytes_client.pipeline.return_value.get.return_value = None
+        row = Mock(
+            _mapping={
+                "symbol": "BTCUSDT",
+                "period_start": utils.floor_time(datetime.now(), 60)
+                - timedelta(days=1),
+                "open_price": Decimal("1"),
+                "high_price": Decimal("2"),
+                "low_price": Decimal("0.5"),
+                "close_price": Decimal("1.5"),
+                "volume": Decimal("10"),
+                "turnover": Decimal("15"),
+            }
+        )
+        data_service.dbClient.exec.return_value = [row]
+
+        cached = data_service.warm_linear_instrument_klines_cache(
+            days=3, timeframes=["5m", "1h"], symbols=["BTCUSDT", "ETHUSDT"]
+        )
+
+        assert cached == 4
+        assert data_service.dbClient.exec.call_count == 4
+        pipeline = data_service.redis_bytes_client.pipeline.return_value
+        keys = [call[0][0] for call in pipeline.zadd.call_args_list]
+        assert keys[0] == "bybit:klines:5m:BTCUSDT"
+        assert keys[-1] == "bybit:klines:1h:ETHUSDT"
+        # Marked whole, so KlineCache serves the warmed chunks from redis
+        markers = [call[0][0] for call in pipeline.set.call_args_list]
+        assert markers[-1].startswith("bybit:klines:1h:ETHUSDT:chunk:")
+
+    def test_kline_lows_highs_read_in_one_array_query(self, data_service):
+        start = datetime(2024, 1, 1)
+        data_service.dbClient.exec.return_value.all.return_value = [
+            (start, Decimal("0.12345678"), Decimal("1.5"))
+        ]
+
+        prices = data_service.get_linear_instrument_kline_lows_highs(
+            "BTCUSDT", "1h", [start, start + timedelta(hours=3)]
+        )
+
+        assert prices == {start: (Decimal("0.12345678"), Decimal("1.5"))}
+        stmt = data_service.dbClient.exec.call_args[0][0]
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "FROM bybit_linear_perp_kline_1h" in sql
+        assert "period_start = ANY (%(period_starts)s" in sql
+        data_service.dbClient.exec.reset_mock()
+        assert (
+            data_service.get_linear_instrument_kline_lows_highs("BTCUSDT", "1h", [])
+            == {}
+        )
+        data_service.dbClient.exec.assert_not_called()
+
+    def test_db_klines_read_as_columns(self, data_service):
+        rows = [
+            (datetime(2024, 1, 1, 0, 5 * i), 1.0 + i, 2.0, 0.5, 1.5, 10.0, 15.0)
+            for i in range(3)
+        ]
+        execute = data_service.dbClient.connection.return_value.execute
+        execute.return_value.fetchall.return_value = rows
+
+        columns = data_service.get_linear_instrument_klines(
+            "BTCUSDT", "5m", data_source="db", output="numpy"
+        )
+        df = data_service.get_linear_instrument_klines(
+            "BTCUSDT", "5m", data_source="db", output="pandas"
+        )
+
+        assert columns["period_start"].dtype == np.dtype("datetime64[us]")
+        assert columns["period_start"][1] == np.datetime64("2024-01-01T00:05")
+        assert list(columns["open_price"]) == [1.0, 2.0, 3.0]
+        assert list(df.columns) == ["period_start", *KLINE_VALUE_COLUMNS]
+        assert df["turnover"].dtype == np.float64
+        # Only the needed columns are selected, symbol isn't
+        stmt = execute.call_args[0][0]
+        assert [c.name for c in stmt.selected_columns] == list(df.columns)
+        data_service.dbClient.exec.assert_not_called()
+
+    def test_klines_output_modes(self, data_service):
+        execute = data_service.dbClient.connection.return_value.execute
+        execute.return_value.fetchall.return_value = []
+
+        df = data_service.get_linear_instrument_klines(
+            "BTCUSDT", "5m", data_source="db"
+        )
+        assert df.empty and list(df.columns) == ["period_start", *KLINE_VALUE_COLUMNS]
+
+        data_service.dbClient.exec.return_value = [
+            Mock(_mapping={"symbol": "BTCUSDT", "close_price": Decimal("1.5")})
+        ]
+        records = data_service.get_linear_instrument_klines(
+            "BTCUSDT", "5m", data_source="db", output="records"
+        )
+        assert records == [{"symbol": "BTCUSDT", "close_price": Decimal("1.5")}]
+
+        with pytest.raises(ValueError):
+            data_service.get_linear_instrument_klines(
+                "BTCUSDT", "5m", data_source="db", output="polars"
+            )
+
+    def test_iter_klines_streams_chunks_on_own_connection(self, data_service):
+        rows = [
+            (datetime(2024, 1, 1, 0, 5 * i), 1.0, 2.0, 0.5, float(i), 10.0, 15.0)
+            for i in range(5)
+        ]
+        data_service.dbClient.get_bind.return_value = MagicMock()
+        connect = data_service.dbClient.get_bind.return_value.connect
+        connection = connect.return_value.__enter__.return_value
+        result = connection.execution_options.return_value.execute.return_value
+        result.partitions.return_value = iter([rows[:3], rows[3:]])
+
+        chunks = list(
+            data_service.iter_linear_instrument_klines(
+                "BTCUSDT", "5m", chunk_size=3, output="pandas"
+            )
+        )
+
+        connection.execution_options.assert_called_once_with(yield_per=3)
+        assert [list(chunk["close_price"]) for chunk in chunks] == [[0, 1, 2], [3, 4]]
+        connect.return_value.__exit__.assert_called_once()
+        data_service.dbClient.connection.assert_not_called()
+
     def test_get_kline_table(self, data_service):
         assert (
             data_service._get_kline_table("5m") == Market.ByBitLinearInstrumentsKline5m
@@ -0,0 +1,60 @@
+from unittest.mock import Mock
+from xchanges.ByBit import Category, MarketData, TokenBucket
+
+
+class TestTokenBucket:
+    def test_acquire_within_capacity_does_not_wait(self):
+        bucket = TokenBucket(rate=10, capacity=5)
+        waits = [bucket.acquire() for _ in range(5)]
+        assert waits == [0.0] * 5
+
+    def test_acquire_beyond_capacity_waits_for_refill(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() > 0
+
+
+class TestMarketDataInstruments:
+    def market_data(self, pages):
+        client = MarketData(testnet=True, rate_limiter=TokenBucket(rate=1000))
+        client.session = Mock()
+        client.session.get_instruments_info.side_effect = pages
+        return client
+
+    def test_fetch_instruments_follows_cursor(self):
+        client = self.market_data(
+            [
+                {"result": {"list": [{"symbol": "A"}], "nextPageCursor": "c1"}},
+                {"result": {"list": [{"symbol": "B"}], "nextPageCursor": ""}},
+            ]
+        )
+
+        instruments = client.fetch_instruments(Category.LINEAR, limit=1)
+
+        assert [i["symbol"] for i in instruments] == ["A", "B"]
+        calls = client.session.get_instruments_info.call_args_list
+        assert "cursor" not in calls[0].kwargs
+        assert calls[1].kwargs == {"category": "linear", "limit": 1, "cursor": "c1"}
+
+    def test_fetch_instruments_error_mid_pagination_returns_nothing(self):
+        client = self.market_data(
+            [
+                {"result": {"list": [{"symbol": "A"}], "nextPageCursor": "c1"}},
+                Exception("timeout"),
+            ]
+        )
+        assert client.fetch_instruments(Category.LINEAR) == []
+
+    def test_fetch_all_instruments_covers_every_category(self):
+        client = self.market_data(
+            lambda **params: {"result": {"list": [{"symbol": params["category"]}]}}
+        )
+
+        results = client.fetch_all_instruments(limit=500)
+
+        assert {k: v[0]["symbol"] for k, v in results.items()} == {
+            c.value: c.value for c in Category
+        }
+        for call in client.session.get_instruments_info.call_args_list:
+            assert call.kwargs["limit"] == 500
+            assert "status" not in call.kwargs
@@ -0,0 +1,252 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+import json
+import time
+from unittest.mock import Mock
+import pytest
+from dataManagers import KlineCodec
+from dataManagers.KlineCache import (
+    KLINES_CHANGED_CHANNEL,
+    ByteLRU,
+    KlineCache,
+    KlineCacheInvalidator,
+    TierStats,
+    _first_period_starts,
+)
+
+START = datetime(2024, 1, 1)
+
+
+def kline(i):
+    return {
+        "symbol": "BTCUSDT",
+        "period_start": START + timedelta(minutes=5 * i),
+        "open_price": Decimal("1"),
+        "high_price": Decimal("2"),
+        "low_price": Decimal("0.5"),
+        "close_price": Decimal(i),
+        "volume": Decimal("10"),
+        "turnover": Decimal("15"),
+    }
+
+
+@pytest.fixture
+def data_service():
+    service = Mock()
+    service._klines_redis_key.side_effect = (
+        lambda timeframe, symbol: f"bybit:klines:{timeframe}:{symbol}"
+    )
+    service._klines_version_key.side_effect = (
+        lambda timeframe, symbol: f"bybit:klines:{timeframe}:{symbol}:version"
+    )
+    # No write-through has touched the series yet
+    service.redis_bytes_client.get.return_value = None
+    service.redis_bytes_client.pipeline.return_value.get.return_value = None
+    service.get_linear_instrument_klines_rows.side_effect = (
+        lambda symbol, timeframe, start_time, end_time: [
+            kline(i)
+            for i in range(12)
+            if start_time <= kline(i)["period_start"] <= end_time
+        ]
+    )
+    return service
+
+
+def cache_for(data_service):
+    # Chunks of 4 bars, START is aligned to 20 minutes
+    return KlineCache(data_service, lru=ByteLRU(), stats=TierStats(), bars_per_chunk=4)
+
+
+class TestByteLRU:
+    def test_evicts_least_recently_used_by_bytes(self):
+        lru = ByteLRU(max_bytes=10)
+        lru.put("a", "A", nbytes=4)
+        lru.put("b", "B", nbytes=4)
+        assert lru.get("a") == "A"
+        lru.put("c", "C", nbytes=4)
+
+        assert lru.get("b") is None
+        assert (lru.get("a"), lru.get("c")) == ("A", "C")
+        assert lru.nbytes == 8
+        lru.put("huge", "H", nbytes=11)
+        assert lru.get("huge") is None
+
+    def test_entries_with_ttl_expire(self):
+        lru = ByteLRU()
+        lru.put("open", "O", nbytes=1, ttl=0)
+        lru.put("closed", "C", nbytes=1)
+        time.sleep(0.001)
+
+        assert lru.get("open") is None
+        assert lru.get("closed") == "C"
+        assert lru.nbytes == 1
+
+
+class TestKlineCache:
+    def test_miss_falls_through_to_db_and_fills_upper_tiers(self, data_service):
+        pipeline = data_service.redis_bytes_client.pipeline.return_value
+        pipeline.execute.side_effect = [[None, 0, [], 0, []], []]
+        cache = cache_for(data_service)
+
+        klines = cache.get(
+            "BTCUSDT",
+            "5m",
+            START + timedelta(minutes=10),
+            START + timedelta(minutes=25),
+        )
+
+        assert [kline["close_price"] for kline in klines] == [2, 3, 4, 5]
+        assert klines[0]["symbol"] == "BTCUSDT"
+        assert klines[0]["period_start"] == START + timedelta(minutes=10)
+        data_service.get_linear_instrument_klines_rows.assert_called_once()
+        # Both chunks replaced in redis, closed chunks' markers never expire
+        assert pipeline.zadd.call_count == 2
+        assert [call[1]["ex"] for call in pipeline.set.call_args_list] == [None, None]
+        assert cache.stats.snapshot() == {
+            "lru": {"hits": 0, "misses": 2},
+            "redis": {"hits": 0, "misses": 2},
+            "db": {"hits": 2, "misses": 0},
+        }
+
+        again = cache.get(
+            "BTCUSDT",
+            "5m",
+            START + timedelta(minutes=10),
+            START + timedelta(minutes=25),
+        )
+        assert again == klines
+        assert data_service.get_linear_instrument_klines_rows.call_count == 1
+        assert cache.stats.snapshot()["lru"] == {"hits": 2, "misses": 2}
+
+    def test_marked_redis_chunk_is_served_without_db(self, data_service):
+        pipeline = data_service.redis_bytes_client.pipeline.return_value
+        chunk = [KlineCodec.encode_kline(kline(i)) for i in range(4)]
+        pipeline.execute.return_value = [None, 1, chunk]
+        cache = cache_for(data_service)
+
+        columns = cache.get(
+            "BTCUSDT", "5m", START, START + timedelta(minutes=15), output="numpy"
+        )
+
+        assert list(columns["close_price"]) == [0, 1, 2, 3]
+        data_service.get_linear_instrument_klines_rows.assert_not_called()
+        assert cache.stats.snapshot()["redis"] == {"hits": 1, "misses": 0}
+        assert len(cache.lru) == 1
+
+    def test_open_chunk_expires(self, data_service):
+        pipeline = data_service.redis_bytes_client.pipeline.return_value
+        pipeline.execute.side_effect = [[None, 0, []], []] * 2
+        data_service.get_linear_instrument_klines_rows.side_effect = None
+        data_service.get_linear_instrument_klines_rows.return_value = []
+        cache = cache_for(data_service)
+        cache.open_ttl = 0
+        now = datetime.now()
+
+        assert cache.get("BTCUSDT", "5m", now, now) == []
+        assert pipeline.set.call_args[1]["ex"] == cache.open_marker_ttl
+        cache.get("BTCUSDT", "5m", now, now)
+        assert data_service.get_linear_instrument_klines_rows.call_count == 2
+
+    def test_warm_marks_whole_chunks_without_filling_the_lru(self, data_service):
+        pipeline = data_service.redis_bytes_client.pipeline.return_value
+        cache = cache_for(data_service)
+
+        warmed = cache.warm("BTCUSDT", "5m", START, START + timedelta(minutes=25))
+
+        assert warmed == 8
+        assert pipeline.zadd.call_count == 2
+        assert [call[1]["ex"] for call in pipeline.set.call_args_list] == [None, None]
+        assert len(cache.lru) == 0
+
+    def test_fill_racing_a_write_through_is_dropped(self, data_service):
+        pipeline = data_service.redis_bytes_client.pipeline.return_value
+        pipeline.execute.return_value = [b"1", 0, []]
+        # Written through after the version was read, before the fill
+        pipeline.get.return_value = b"2"
+        cache = cache_for(data_service)
+
+        klines = cache.get("BTCUSDT", "5m", START, START + timedelta(minutes=15))
+
+        assert [kline["close_price"] for kline in klines] == [0, 1, 2, 3]
+        pipeline.watch.assert_called_once_with("bybit:klines:5m:BTCUSDT:version")
+        pipeline.zadd.assert_not_called()
+        pipeline.set.assert_not_called()
+        assert len(cache.lru) == 0
+
+    def test_eviction_during_a_read_skips_the_lru(self, data_service):
+        pipeline = data_service.redis_bytes_client.pipeline.return_value
+        pipeline.execute.side_effect = [[None, 0, []], []]
+        cache = cache_for(data_service)
+        rows = data_service.get_linear_instrument_klines_rows.side_effect
+
+        def evicted_while_reading(*args, **kwargs):
+            cache.evict("BTCUSDT", "5m", 0, 0)
+            return rows(*args, **kwargs)
+
+        data_service.get_linear_instrument_klines_rows.side_effect = (
+            evicted_while_reading
+        )
+
+        assert len(cache.get("BTCUSDT", "5m", START, START)) == 1
+        assert len(cache.lru) == 0
+
+    def test_redis_errors_fall_through_to_db(self, data_service):
+        data_service.redis_bytes_client.pipeline.side_effect = ConnectionError("down")
+        cache = cache_for(data_service)
+
+        klines = cache.get("BTCUSDT", "5m", START, START + timedelta(minutes=5))
+
+        assert [kline["close_price"] for kline in klines] == [0, 1]
+        assert len(cache.lru) == 1
+
+
+class TestKlineCacheInvalidator:
+    def filled_cache(self):
+        cache = cache_for(Mock())
+        span = cache.chunk_seconds("5m")
+        for chunk in range(3):
+            cache.lru.put(("5m", "BTCUSDT", chunk), [b"bar"], nbytes=3)
+        cache.lru.put(("1h", "BTCUSDT", 1), [b"bar"], nbytes=3)
+        return cache, span
+
+    def test_notice_evicts_only_overlapping_chunks(self):
+        cache, span = self.filled_cache()
+        invalidator = KlineCacheInvalidator(Mock(), cache)
+
+        notice = json.dumps([["BTCUSDT", "5m", span + 300, 2 * span - 300]])
+        assert invalidator.handle({"data": notice}) == 1
+
+        assert cache.lru.get(("5m", "BTCUSDT", 1)) is None
+        assert cache.lru.get(("5m", "BTCUSDT", 0)) is not None
+        assert cache.lru.get(("5m", "BTCUSDT", 2)) is not None
+        assert cache.lru.get(("1h", "BTCUSDT", 1)) is not None
+
+    def test_backfilled_history_drops_first_period_start(self, data_service):
+        data_service.get_klines_first_period_start.return_value = START
+        cache = cache_for(data_service)
+        first = int(START.timestamp())
+        _first_period_starts.clear()
+        assert cache._first_period_start("BTCUSDT", "5m") == first
+
+        cache.evict("BTCUSDT", "5m", first + 300, first + 600)
+        assert ("BTCUSDT", "5m") in _first_period_starts
+        cache.evict("BTCUSDT", "5m", first - 300, first)
+        assert ("BTCUSDT", "5m") not in _first_period_starts
+
+    def test_lost_subscription_drops_the_lru(self):
+        cache, span = self.filled_cache()
+        redis_client = Mock()
+        pubsub = redis_client.pubsub.return_value
+        notice = json.dumps([["BTCUSDT", "5m", 0, 0]])
+        pubsub.get_message.side_effect = [
+            {"data": notice},
+            ConnectionError("gone"),
+        ]
+        invalidator = KlineCacheInvalidator(redis_client, cache)
+        invalidator.stopped.wait = lambda timeout: invalidator.stopped.set()
+
+        invalidator.run()
+
+        pubsub.subscribe.assert_called_once_with(KLINES_CHANGED_CHANNEL)
+        pubsub.close.assert_called_once()
+        assert len(cache.lru) == 0
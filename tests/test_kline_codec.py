@@ -0,0 +1,54 @@
+from datetime import datetime
+from decimal import Decimal
+import json
+import numpy as np
+from dataManagers import KlineCodec
+
+PERIOD_START = datetime(2024, 1, 1)
+
+
+def kline(**values):
+    return {
+        "symbol": "BTCUSDT",
+        "period_start": PERIOD_START,
+        "open_price": Decimal("42000.10000000"),
+        "high_price": "42100.5",
+        "low_price": Decimal("41999.99"),
+        "close_price": 42050.25,
+        "volume": Decimal("12.345"),
+        "turnover": Decimal("519123.12345678"),
+        **values,
+    }
+
+
+class TestKlineCodec:
+    def test_v2_round_trips_exact_values(self):
+        value = KlineCodec.encode_kline(kline())
+
+        assert len(value) == KlineCodec.KLINE_RECORD_DTYPE.itemsize == 63
+        assert value[0] == KlineCodec.KLINE_RECORD_V2
+        decoded = KlineCodec.decode_kline(value)
+        assert decoded["period_start"] == int(PERIOD_START.timestamp())
+        assert decoded["open_price"] == Decimal("42000.1")
+        assert decoded["close_price"] == Decimal("42050.25")
+        assert decoded["turnover"] == Decimal("519123.12345678")
+
+    def test_values_too_wide_fall_back_to_json(self):
+        value = KlineCodec.encode_kline(kline(turnover=Decimal("1" * 25)))
+
+        assert json.loads(value)["turnover"] == "1" * 25
+        assert KlineCodec.decode_kline(value)["turnover"] == Decimal("1" * 25)
+
+    def test_decode_klines_mixes_versions_in_order(self):
+        values = [
+            KlineCodec.encode_kline(kline()),
+            KlineCodec.encode_v1(kline(close_price="7.5")),
+            KlineCodec.encode_kline(kline(close_price=Decimal("0.00000001"))),
+        ]
+
+        columns = KlineCodec.decode_klines(values)
+
+        assert columns["period_start"].dtype == np.int64
+        np.testing.assert_array_equal(columns["close_price"], [42050.25, 7.5, 1e-8])
+        assert columns["open_price"][0] == 42000.1
+        assert KlineCodec.decode_klines([])["close_price"].shape == (0,)
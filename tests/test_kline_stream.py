@@ -0,0 +1,291 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import Mock
+import pytest
+from dataManagers import KlineCodec
+from dataManagers.ByBitKlineStream import ByBitKlineStreamIngestion
+from dataManagers.ByBitMarketDataManager import ByBitDataIngestion, ByBitDataService
+from xchanges.ByBitReplay import KlineReplayServer
+
+START_MS = 1704067200000
+
+
+def kline_message(symbol, start, close, confirm):
+    return {
+        "topic": f"kline.5.{symbol}",
+        "type": "snapshot",
+        "data": [
+            {
+                "start": start,
+                "end": start + 299999,
+                "interval": "5",
+                "open": "1.0",
+                "high": "2.0",
+                "low": "0.5",
+                "close": close,
+                "volume": "10",
+                "turnover": "15",
+                "confirm": confirm,
+                "timestamp": start + 1000,
+            }
+        ],
+    }
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def ingestion(mock_market_data):
+    instance = ByBitDataIngestion(testnet=True)
+    instance.client = mock_market_data.return_value
+    instance.dbClient = Mock()
+    instance.bb_data_service = Mock()
+    instance.bb_data_service.get_latest_linear_instrument_kline_starts.return_value = {}
+    instance._store_linear_instruments_klines_frame = Mock(
+        side_effect=lambda df: len(df)
+    )
+    instance._download_linear_instruments_klines_concurrently = Mock(
+        return_value=({}, 0)
+    )
+    return instance
+
+
+class TestByBitKlineStreamIngestion:
+    def test_updates_are_coalesced_and_confirmed_bars_flushed(self, ingestion):
+        server = KlineReplayServer(
+            [
+                kline_message("BTCUSDT", START_MS, "1.1", False),
+                kline_message("BTCUSDT", START_MS, "1.2", False),
+                kline_message("BTCUSDT", START_MS, "1.3", True),
+                kline_message("BTCUSDT", START_MS + 300000, "1.4", False),
+                kline_message("ETHUSDT", START_MS, "3.0", True),
+            ]
+        ).start()
+        stream = ByBitKlineStreamIngestion(
+            symbols=["BTCUSDT", "ETHUSDT"], url=server.url, ingestion=ingestion
+        )
+        try:
+            stream.stream.start()
+            assert wait_for(lambda: len(stream.confirmed_bars) == 2)
+        finally:
+            stream.stream.stop()
+            server.stop()
+
+        assert server.subscriptions == [["kline.5.BTCUSDT", "kline.5.ETHUSDT"]]
+        # The open BTCUSDT bar after the confirmed one is not written
+        assert ("BTCUSDT", START_MS + 300000) not in stream.confirmed_bars
+        assert stream.flush() == 2
+        df = ingestion._store_linear_instruments_klines_frame.call_args[0][0]
+        assert sorted(df["symbol"]) == ["BTCUSDT", "ETHUSDT"]
+        assert df[df["symbol"] == "BTCUSDT"]["close_price"].iloc[0] == "1.3"
+        ingestion.dbClient.commit.assert_called_once()
+        timeframe, records = (
+            ingestion.bb_data_service.cache_linear_instrument_klines.call_args[0]
+        )
+        assert timeframe == "5m" and len(records) == 2
+        assert stream.last_confirmed == {"BTCUSDT": START_MS, "ETHUSDT": START_MS}
+        assert stream.confirmed_bars == {}
+        assert stream.flush() == 0
+
+    def test_failed_flush_requeues_bars(self, ingestion):
+        ingestion._store_linear_instruments_klines_frame.side_effect = Exception("boom")
+        stream = ByBitKlineStreamIngestion(
+            symbols=["BTCUSDT"], url="ws://unused", ingestion=ingestion
+        )
+        stream._on_kline(
+            "BTCUSDT", kline_message("BTCUSDT", START_MS, "1", True)["data"][0]
+        )
+
+        assert stream.flush() == 0
+        ingestion.dbClient.rollback.assert_called_once()
+        ingestion.bb_data_service.cache_linear_instrument_klines.assert_not_called()
+        assert ("BTCUSDT", START_MS) in stream.confirmed_bars
+
+    def test_reconnect_resubscribes_and_backfills_gap(self, ingestion):
+        server = KlineReplayServer(
+            [kline_message("BTCUSDT", START_MS, "1.3", True)], disconnect_after=1
+        ).start()
+        stream = ByBitKlineStreamIngestion(
+            symbols=["BTCUSDT"],
+            flush_interval_ms=20,
+            url=server.url,
+            ingestion=ingestion,
+        )
+        stream.stream.max_backoff = 0.1
+        runner = threading.Thread(target=stream.run, daemon=True)
+        try:
+            runner.start()
+            assert wait_for(
+                lambda: ingestion._download_linear_instruments_klines_concurrently.called
+            )
+        finally:
+            stream.stop()
+            runner.join(timeout=5)
+            server.stop()
+
+        assert server.connections >= 2
+        assert len(server.subscriptions) >= 2
+        jobs = ingestion._download_linear_instruments_klines_concurrently.call_args[1][
+            "jobs"
+        ]
+        symbol, start_time, _ = jobs[0]
+        assert symbol == "BTCUSDT"
+        assert start_time == datetime.fromtimestamp((START_MS + 300000) / 1000)
+
+    def test_startup_backfills_from_latest_stored_bars(self, ingestion):
+        latest = datetime.fromtimestamp(START_MS / 1000)
+        service = ingestion.bb_data_service
+        service.get_latest_linear_instrument_kline_starts.return_value = {
+            "BTCUSDT": latest
+        }
+        stream = ByBitKlineStreamIngestion(
+            symbols=["BTCUSDT", "NEWUSDT"],
+            flush_interval_ms=20,
+            url="ws://127.0.0.1:9",
+            ingestion=ingestion,
+        )
+        runner = threading.Thread(target=stream.run, daemon=True)
+        try:
+            runner.start()
+            assert wait_for(
+                lambda: ingestion._download_linear_instruments_klines_concurrently.called
+            )
+        finally:
+            stream.stop()
+            runner.join(timeout=5)
+
+        service.get_latest_linear_instrument_kline_starts.assert_called_once_with(
+            ["BTCUSDT", "NEWUSDT"]
+        )
+        jobs = ingestion._download_linear_instruments_klines_concurrently.call_args[1][
+            "jobs"
+        ]
+        assert [(symbol, start) for symbol, start, _ in jobs] == [
+            ("BTCUSDT", latest + timedelta(minutes=5))
+        ]
+
+
+class TestKlineCache:
+    def test_cache_linear_instrument_klines_pipelines_sets(self):
+        service = ByBitDataService(dbClient=Mock())
+        service.redis_bytes_client = Mock()
+        pipeline = service.redis_bytes_client.pipeline.return_value
+        klines = [
+            {
+                "symbol": "BTCUSDT",
+                "period_start": datetime.fromtimestamp(START_MS / 1000),
+                "open_price": "1",
+                "high_price": "2",
+                "low_price": "0.5",
+                "close_price": "1.5",
+                "volume": "10",
+                "turnover": "15",
+            }
+        ]
+
+        assert service.cache_linear_instrument_klines("5m", klines) == 1
+        score = START_MS // 1000
+        pipeline.zremrangebyscore.assert_called_once_with(
+            "bybit:klines:5m:BTCUSDT", score, score
+        )
+        key, mapping = pipeline.zadd.call_args[0]
+        assert key == "bybit:klines:5m:BTCUSDT"
+        ((value, member_score),) = mapping.items()
+        assert member_score == score
+        assert KlineCodec.decode_kline(value)["close_price"] == Decimal("1.5")
+        pipeline.incr.assert_called_once_with("bybit:klines:5m:BTCUSDT:version")
+        pipeline.execute.assert_called_once()
+
+    def test_publish_klines_changed_sends_one_range_per_symbol(self):
+        service = ByBitDataService(dbClient=Mock())
+        service.redis_client = Mock()
+        start = datetime.fromtimestamp(START_MS / 1000)
+        klines = [
+            {"symbol": "BTCUSDT", "period_start": start + timedelta(minutes=10)},
+            {"symbol": "ETHUSDT", "period_start": start},
+            {"symbol": "BTCUSDT", "period_start": start},
+        ]
+
+        service.publish_klines_changed("5m", klines)
+
+        channel, message = service.redis_client.publish.call_args[0]
+        assert channel == "bybit:klines:changed"
+        first = START_MS // 1000
+        assert json.loads(message) == [
+            ["BTCUSDT", "5m", first, first + 600],
+            ["ETHUSDT", "5m", first, first],
+        ]
+
+    def test_range_read_is_one_zrangebyscore(self):
+        service = ByBitDataService(dbClient=Mock())
+        service.redis_bytes_client = Mock()
+        kline = {
+            "symbol": "BTCUSDT",
+            "period_start": START_MS // 1000,
+            "open_price": "1",
+            "high_price": "2",
+            "low_price": "0.5",
+            "close_price": "1.5",
+            "volume": "10",
+            "turnover": "15",
+        }
+        # A v1 entry cached before the binary rollout next to a v2 record
+        service.redis_bytes_client.zrangebyscore.return_value = [
+            json.dumps(kline).encode(),
+            KlineCodec.encode_kline(
+                {**kline, "period_start": datetime.fromtimestamp(START_MS / 1000 + 300)}
+            ),
+        ]
+        start_time = datetime.fromtimestamp(START_MS / 1000)
+
+        klines = service.get_linear_instrument_klines(
+            "BTCUSDT",
+            "5m",
+            start_time=start_time,
+            data_source="redis",
+            output="records",
+        )
+
+        service.redis_bytes_client.zrangebyscore.assert_called_once_with(
+            "bybit:klines:5m:BTCUSDT", START_MS // 1000, "+inf"
+        )
+        assert klines[0]["period_start"] == start_time
+        assert [kline["close_price"] for kline in klines] == [Decimal("1.5")] * 2
+        assert klines[1]["symbol"] == "BTCUSDT"
+
+        df = service.get_linear_instrument_klines(
+            "BTCUSDT", "5m", start_time=start_time, data_source="redis"
+        )
+        assert list(df["period_start"]) == [
+            start_time,
+            start_time + timedelta(minutes=5),
+        ]
+        assert list(df["close_price"]) == [1.5, 1.5]
+
+    def test_migrate_keeps_newer_sorted_set_bars(self):
+        service = ByBitDataService(dbClient=Mock())
+        service.redis_client = Mock()
+        old_keys = [
+            f"bybit:kline:5m:BTCUSDT:{START_MS // 1000}",
+            f"bybit:kline:5m:BTCUSDT:{START_MS // 1000 + 300}",
+        ]
+        service.redis_client.scan_iter.return_value = iter(old_keys)
+        pipeline = service.redis_client.pipeline.return_value
+        # GET and ZCOUNT per key, the second bar is already in the sorted set
+        pipeline.execute.side_effect = [["old-1", 0, "old-2", 1], []]
+
+        assert service.migrate_linear_instrument_klines_cache() == 1
+        pipeline.zadd.assert_called_once_with(
+            "bybit:klines:5m:BTCUSDT", {"old-1": START_MS // 1000}
+        )
+        pipeline.delete.assert_called_once_with(*old_keys)
@@ -0,0 +1,150 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import Mock
+from sqlalchemy.dialects import postgresql
+from database import Operations as dbOperations
+from database.models import Market, PriceLevels
+
+
+def kline_row(period_start, close_price):
+    return {
+        "symbol": "BTCUSDT",
+        "period_start": period_start,
+        "open_price": Decimal("1.5"),
+        "high_price": Decimal("2"),
+        "low_price": Decimal("1"),
+        "close_price": Decimal(close_price),
+        "volume": Decimal("10"),
+        "turnover": Decimal("15.25"),
+    }
+
+
+class TestBulkUpsert:
+    def test_bulk_upsert_copies_rows_and_merges_once(self):
+        session = Mock()
+        connection = session.connection.return_value
+        connection.execute.return_value.rowcount = 2
+        copied = {}
+
+        def copy_expert(sql, buffer):
+            copied["sql"] = sql
+            copied["data"] = buffer.read()
+
+        connection.connection.cursor.return_value.copy_expert.side_effect = copy_expert
+        rows = [
+            kline_row(datetime(2024, 1, 1, 0, 0), "1.6"),
+            kline_row(datetime(2024, 1, 1, 0, 5), "1.7"),
+            kline_row(datetime(2024, 1, 1, 0, 0), "1.8"),
+        ]
+
+        result = dbOperations.bulk_upsert(
+            session,
+            Market.ByBitLinearInstrumentsKline5m,
+            rows,
+            index_elements=["symbol", "period_start"],
+        )
+
+        assert result == 2
+        assert copied["sql"].startswith('COPY "bybit_linear_perp_kline_5m_staging_')
+        lines = copied["data"].splitlines()
+        assert len(lines) == 2
+        assert '"2024-01-01 00:00:00"' in lines[0] and ",1.8," in lines[0]
+
+        connection.execute.assert_called_once()
+        merge = str(
+            connection.execute.call_args[0][0].compile(dialect=postgresql.dialect())
+        )
+        assert "INSERT INTO bybit_linear_perp_kline_5m" in merge
+        assert "ON CONFLICT (symbol, period_start) DO UPDATE" in merge
+
+    def test_bulk_upsert_without_rows_is_a_noop(self):
+        session = Mock()
+        result = dbOperations.bulk_upsert(
+            session, Market.ByBitLinearInstrumentsKline5m, [], ["symbol"]
+        )
+        assert result == 0
+        session.connection.assert_not_called()
+
+    def test_bulk_upsert_skips_unchanged_rows_in_sql(self):
+        session = Mock()
+        connection = session.connection.return_value
+
+        dbOperations.bulk_upsert(
+            session,
+            Market.ByBitLinearInstrumentsKline5m,
+            [kline_row(datetime(2024, 1, 1), "1.6")],
+            index_elements=["symbol", "period_start"],
+            computed_columns={"digest": Market.KLINE_DIGEST_SQL},
+            distinct_column="digest",
+        )
+
+        merge = str(
+            connection.execute.call_args[0][0].compile(dialect=postgresql.dialect())
+        )
+        assert "md5(concat_ws(" in merge
+        assert "digest = excluded.digest" in merge
+        assert (
+            "WHERE bybit_linear_perp_kline_5m.digest IS DISTINCT FROM excluded.digest"
+            in merge
+        )
+
+    def test_bulk_upsert_price_levels_skip_unchanged_levels(self):
+        session = Mock()
+        connection = session.connection.return_value
+
+        dbOperations.bulk_upsert(
+            session,
+            PriceLevels.PriceLevel,
+            [
+                {
+                    "exchange": "bybit",
+                    "symbol": "BTCUSDT",
+                    "instrument_type": "perp",
+                    "timeframe": "1h",
+                    "lookback_period": 5,
+                    "period_start": datetime(2024, 1, 1),
+                    "price_level": Decimal("1.5"),
+                    "is_support": True,
+                    "is_resistance": False,
+                }
+            ],
+            index_elements=["exchange", "symbol", "instrument_type", "timeframe"],
+            computed_columns=PriceLevels.PRICE_LEVEL_COMPUTED_COLUMNS,
+            distinct_column="digest",
+        )
+
+        merge = str(
+            connection.execute.call_args[0][0].compile(dialect=postgresql.dialect())
+        )
+        assert "md5(concat_ws('|', CAST(price_level AS numeric(38, 8))" in merge
+        assert "updated_at = excluded.updated_at" in merge
+        assert (
+            "WHERE crypto_symbols_price_pivot_levels.digest "
+            "IS DISTINCT FROM excluded.digest" in merge
+        )
+
+
+class TestCopyRows:
+    def test_copy_rows_writes_none_as_unquoted_null(self):
+        connection = Mock()
+        copied = {}
+
+        def copy_expert(sql, buffer):
+            copied["data"] = buffer.read()
+
+        connection.connection.cursor.return_value.copy_expert.side_effect = copy_expert
+
+        dbOperations.copy_rows(
+            connection,
+            "t",
+            ["symbol", "note", "price", "size"],
+            [
+                {"symbol": "BTC", "note": None, "price": Decimal("1.5"), "size": 2},
+                {"symbol": 'say "hi"', "note": "", "price": None, "size": 3},
+            ],
+        )
+
+        assert copied["data"].splitlines() == [
+            '"BTC",,1.5,2',
+            '"say ""hi""","",,3',
+        ]
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+import numpy as np
+from dataManagers.PriceLevelIndex import PriceLevelIndex
+
+ROWS = [
+    (1, "BTCUSDT", "1h", 10, 100.0),
+    (2, "BTCUSDT", "1h", 10, 90.0),
+    (3, "ETHUSDT", "1h", 10, 5.0),
+    (4, "BTCUSDT", "4h", 10, 101.0),
+    (5, "BTCUSDT", "1h", 10, 110.0),
+]
+
+
+def build_index(rows=ROWS):
+    index = PriceLevelIndex()
+    index.add(rows)
+    return index
+
+
+class TestPriceLevelIndex:
+    def test_nearest_across_symbols_in_one_call(self):
+        index = build_index()
+
+        support, resistance = index.nearest(
+            ["BTCUSDT", "ETHUSDT", "ETHUSDT", "SOLUSDT", "BTCUSDT"],
+            [95.0, 4.0, 6.0, 1.0, 100.0],
+        )
+        np.testing.assert_array_equal(support, [90.0, np.nan, 5.0, np.nan, 100.0])
+        np.testing.assert_array_equal(resistance, [100.0, 5.0, np.nan, np.nan, 100.0])
+
+    def test_groups_do_not_leak_into_each_other(self):
+        index = build_index()
+
+        support, resistance = index.nearest(["BTCUSDT"], [200.0], timeframe="4h")
+        assert support[0] == 101.0 and np.isnan(resistance[0])
+
+    def test_refresh_merges_levels_by_updated_at(self):
+        at = datetime(2024, 1, 1)
+        service = Mock()
+        service.get_price_pivot_levels_updated_since.side_effect = [
+            [row + (at,) for row in ROWS[:3]],
+            [
+                (6, "BTCUSDT", "1h", 10, 96.0, at + timedelta(minutes=5)),
+                (7, "ETHUSDT", "1h", 10, None, at + timedelta(minutes=5)),
+            ],
+        ]
+        index = PriceLevelIndex(refresh_overlap=timedelta(minutes=1))
+        assert index.stale()
+
+        assert index.refresh(service) == 3
+        assert not index.stale()
+        assert index.refresh(service) == 1
+        calls = service.get_price_pivot_levels_updated_since.call_args_list
+        assert calls[0][0] == (None,)
+        # The overlap catches rows committed after later ones
+        assert calls[1][0] == (at - timedelta(minutes=1),)
+        assert index.updated_until == at + timedelta(minutes=5)
+        assert np.all(np.diff(index.keys.real) >= 0)
+
+        support, resistance = index.nearest(["BTCUSDT"], [97.0])
+        assert (support[0], resistance[0]) == (96.0, 100.0)
+
+    def test_rewritten_levels_replace_their_old_price(self):
+        index = build_index()
+
+        # Unchanged re-reads are no-ops, a moved level leaves its old price
+        assert index.add([ROWS[0], (2, "BTCUSDT", "1h", 10, 95.0)]) == 1
+        assert index.add([(5, "BTCUSDT", "1h", 10, None)]) == 1
+
+        assert len(index) == 4
+        support, resistance = index.nearest(["BTCUSDT"], [92.0])
+        assert np.isnan(support[0]) and resistance[0] == 95.0
+        support, resistance = index.nearest(["BTCUSDT"], [105.0])
+        assert support[0] == 100.0 and np.isnan(resistance[0])
+
+    def test_duplicate_prices_are_removed_one_at_a_time(self):
+        index = build_index(
+            [(1, "BTCUSDT", "1h", 10, 100.0), (2, "BTCUSDT", "1h", 10, 100.0)]
+        )
+
+        index.add([(1, "BTCUSDT", "1h", 10, 90.0)])
+
+        assert sorted(index.keys.imag) == [90.0, 100.0]
+
+    def test_empty_index(self):
+        support, resistance = PriceLevelIndex().nearest(["BTCUSDT"], [1.0])
+        assert np.isnan(support[0]) and np.isnan(resistance[0])
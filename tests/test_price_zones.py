@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import Mock, patch
+from dataManagers.PriceZones import PriceZoneIndex, build_price_zones
+
+NOW = datetime(2024, 1, 31)
+
+
+def level(price, days_ago=0, support=True):
+    return {
+        "price_level": Decimal(price),
+        "period_start": NOW - timedelta(days=days_ago),
+        "is_support": support,
+        "is_resistance": not support,
+    }
+
+
+class TestBuildPriceZones:
+    def test_nearby_pivots_cluster_on_tick_grid(self):
+        levels = [
+            level("100.03", days_ago=30),
+            level("100.11", days_ago=0, support=False),
+            level("100.05", days_ago=0),
+            level("101.50", days_ago=0),
+            level("98.00", days_ago=60, support=False),
+        ]
+        zones = build_price_zones(
+            levels, tick_size=Decimal("0.05"), price_scale=2, now=NOW
+        )
+
+        assert [(zone.low, zone.high) for zone in zones] == [
+            (Decimal("98.00"), Decimal("98.00")),
+            (Decimal("100.00"), Decimal("100.15")),
+            (Decimal("101.50"), Decimal("101.50")),
+        ]
+        zone = zones[1]
+        assert (zone.touches, zone.supports, zone.resistances) == (3, 2, 1)
+        assert zone.weight == 2.5
+        assert zone.last_touch == NOW
+        assert zone.low <= zone.price <= zone.high
+        assert zones[0].weight == 0.25
+
+    def test_no_levels(self):
+        assert build_price_zones([], tick_size=Decimal("0.1")) == []
+
+
+class TestPriceZoneIndex:
+    def build_index(self):
+        index = PriceZoneIndex()
+        prices = ["90", "95", "100", "105", "110"]
+        zones = build_price_zones(
+            [level(p) for p in prices], tick_size=Decimal("1"), now=NOW
+        )
+        index.update(("BTCUSDT", "1h", 10), zones)
+        return index
+
+    def test_nearest_zones_on_each_side(self):
+        index = self.build_index()
+
+        below, inside, above = index.nearest(("BTCUSDT", "1h", 10), "101", k=2)
+        assert [zone.low for zone in below] == [Decimal("100"), Decimal("95")]
+        assert inside is None
+        assert [zone.low for zone in above] == [Decimal("105"), Decimal("110")]
+
+    def test_zone_containing_price_is_split_out(self):
+        index = self.build_index()
+
+        below, inside, above = index.nearest(("BTCUSDT", "1h", 10), "100", k=5)
+        assert inside.low == Decimal("100")
+        assert [zone.low for zone in below] == [Decimal("95"), Decimal("90")]
+        assert [zone.low for zone in above] == [Decimal("105"), Decimal("110")]
+
+    def test_unknown_key_is_empty(self):
+        assert PriceZoneIndex().nearest(("ETHUSDT", "1h", 10), "1") == ([], None, [])
+
+    def test_refresh_uses_instrument_ticks(self):
+        service = Mock()
+        service.get_linear_instrument.return_value = Mock(
+            tick_size=Decimal("0.5"), price_scale=1
+        )
+        service.get_symbols_price_pivot_levels.return_value = [level("10.2")]
+        index = PriceZoneIndex()
+
+        zones = index.refresh(service, "BTCUSDT", now=NOW)
+        assert (zones[0].low, zones[0].high) == (Decimal("10.0"), Decimal("10.5"))
+        assert ("BTCUSDT", "1h", 10) in index
+        service.get_symbols_price_pivot_levels.assert_called_once_with(
+            symbol="BTCUSDT", timeframe="1h", lookback_period=10
+        )
+
+    def test_keys_go_stale_after_the_refresh_interval(self):
+        index = PriceZoneIndex(refresh_interval=60)
+        key = ("BTCUSDT", "1h", 10)
+        assert index.stale(key)
+
+        with patch("dataManagers.PriceZones.time.monotonic", return_value=1000.0):
+            index.update(key, [])
+        with patch("dataManagers.PriceZones.time.monotonic", return_value=1059.0):
+            assert not index.stale(key)
+        with patch("dataManagers.PriceZones.time.monotonic", return_value=1061.0):
+            assert index.stale(key)
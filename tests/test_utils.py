@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import hashlib
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import utils
+from database.models import Market
+
+
+class TestKlineWindows:
+    def test_windows_cover_range_with_limit_candles(self):
+        start_time = datetime(2024, 1, 1)
+        end_time = datetime(2024, 2, 1)
+        windows = list(utils.kline_windows(start_time, end_time, 5, 1000))
+
+        assert windows[0][0] <= start_time
+        assert windows[-1][1] >= end_time
+        for window_start, window_end in windows:
+            assert window_end - window_start == timedelta(minutes=5 * 1000, seconds=-1)
+        for previous, current in zip(windows, windows[1:]):
+            assert current[0] - previous[1] == timedelta(seconds=1)
+
+    def test_windows_are_aligned_independent_of_start(self):
+        end_time = datetime(2024, 2, 1)
+        windows = list(utils.kline_windows(datetime(2024, 1, 1), end_time, 5))
+        later = list(utils.kline_windows(datetime(2024, 1, 15, 7, 35), end_time, 5))
+
+        assert later == windows[-len(later) :]
+
+
+class TestRowDigest:
+    def test_digest_ignores_decimal_formatting(self):
+        assert utils.row_digest([Decimal("1.5"), Decimal("10")]) == utils.row_digest(
+            [Decimal("1.50000000"), Decimal("10.0")]
+        )
+
+    def test_digest_changes_with_values(self):
+        digest = utils.row_digest([Decimal("1.5"), Decimal("10")])
+        assert digest != utils.row_digest([Decimal("1.5"), Decimal("10.00000001")])
+        assert -(2**63) <= digest < 2**63
+
+    def test_digest_keeps_the_place_of_null_values(self):
+        # What KLINE_DIGEST_SQL hashes: every column coalesced to '' and joined
+        normalized = "1.50000000||10.00000000"
+        expected = int.from_bytes(
+            hashlib.md5(normalized.encode()).digest()[:8], "big", signed=True
+        )
+
+        assert utils.row_digest([Decimal("1.5"), None, Decimal("10")]) == expected
+        assert expected != utils.row_digest([Decimal("1.5"), Decimal("10")])
+        assert Market.KLINE_DIGEST_SQL.count("coalesce(") == len(
+            Market.KLINE_VALUE_COLUMNS
+        )
+
+
+class TestPivotPoints:
+    def test_matches_pivotid_with_ties_and_missing_values(self):
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            n = int(rng.integers(0, 60))
+            n1, n2 = int(rng.integers(0, 6)), int(rng.integers(0, 6))
+            low = rng.integers(0, 8, n).astype(float)
+            high = low + rng.integers(0, 3, n)
+            low[rng.random(n) < 0.1] = np.nan
+            high[rng.random(n) < 0.1] = np.nan
+            df = pd.DataFrame({"low_price": low, "high_price": high})
+
+            expected = [utils.pivotid(df, i, n1, n2) for i in range(n)]
+            result = utils.pivot_points(df["low_price"], df["high_price"], n1, n2)
+
+            assert result.tolist() == expected
+
+    def test_accepts_decimal_prices(self):
+        low = [Decimal("3"), Decimal("1.00000001"), Decimal("1"), Decimal("2")]
+        high = [Decimal("4"), Decimal("5"), Decimal("2"), Decimal("3")]
+
+        assert utils.pivot_points(low, high, 1, 1).tolist() == [0, 2, 1, 0]
+
+
+class TestMultiLookbackPivotPoints:
+    def test_matches_pivot_points_for_every_lookback(self):
+        rng = np.random.default_rng(1)
+        for _ in range(200):
+            n = int(rng.integers(0, 60))
+            low = rng.integers(0, 8, n).astype(float)
+            high = low + rng.integers(0, 3, n)
+            low[rng.random(n) < 0.1] = np.nan
+            high[rng.random(n) < 0.1] = np.nan
+
+            result = utils.multi_lookback_pivot_points(low, high, [1, 2, 3, 5, 10])
+
+            for lookback, pivots in result.items():
+                expected = utils.pivot_points(low, high, lookback, lookback)
+                assert pivots.tolist() == expected.tolist()
+
+
+class TestLocalTimezoneName:
+    def test_tz_environment_variable_wins(self, monkeypatch):
+        monkeypatch.setenv("TZ", ":Europe/Berlin")
+        assert utils.local_timezone_name() == "Europe/Berlin"
+
+    def test_falls_back_to_the_system_zone(self, monkeypatch):
+        monkeypatch.delenv("TZ", raising=False)
+        assert utils.local_timezone_name()
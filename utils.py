@@ -1,13 +1,99 @@
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from decimal import Decimal, ROUND_HALF_UP
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+from dateutil.tz import tzlocal
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 
+DIGEST_QUANTUM = Decimal("0.00000001")
+
 
 def daterange(start_date, end_date):
     for n in range(int((end_date - start_date).days) + 1):
         yield start_date + timedelta(n)
 
 
+def epoch_seconds(dt: datetime) -> int:
+    # Naive timestamps are local time, pd.Timestamp.timestamp() would assume UTC
+    if isinstance(dt, pd.Timestamp):
+        dt = dt.to_pydatetime()
+    return int(dt.timestamp())
+
+
+def local_timezone_name() -> str:
+    """
+    Name of the process's local zone, the zone every naive datetime here is
+    in, for SQL that converts epochs itself (`AT TIME ZONE`) instead of
+    relying on the session's TimeZone. Falls back to UTC when it can't tell.
+    """
+    if os.environ.get("TZ"):
+        return os.environ["TZ"].lstrip(":")
+    localtime = os.path.realpath("/etc/localtime")
+    if "zoneinfo/" in localtime:
+        return localtime.split("zoneinfo/", 1)[1]
+    try:
+        with open("/etc/timezone") as f:
+            return f.read().strip() or "UTC"
+    except OSError:
+        return "UTC"
+
+
+def local_datetimes(epochs) -> np.ndarray:
+    """Inverse of epoch_seconds over an array, naive local datetime64s"""
+    return (
+        pd.to_datetime(np.asarray(epochs, dtype=np.int64), unit="s", utc=True)
+        .tz_convert(tzlocal())
+        .tz_localize(None)
+        .to_numpy()
+    )
+
+
+def floor_time(dt: datetime, minutes: int) -> datetime:
+    span = minutes * 60
+    return datetime.fromtimestamp(int(dt.timestamp()) // span * span)
+
+
+def kline_windows(
+    start_time: datetime,
+    end_time: datetime,
+    interval_minutes: int,
+    limit: int = 1000,
+):
+    """
+    Split [start_time, end_time] into windows of `limit` candles each. Windows
+    sit on a fixed epoch-aligned grid so the same window is produced whatever
+    range it is planned from.
+    """
+    span = interval_minutes * 60 * limit
+    window_start = int(start_time.timestamp()) // span * span
+    while window_start <= end_time.timestamp():
+        yield (
+            datetime.fromtimestamp(window_start),
+            datetime.fromtimestamp(window_start + span - 1),
+        )
+        window_start += span
+
+
+def row_digest(values) -> int:
+    """
+    Signed 64-bit digest of a row. Decimals are normalized to 8 places the way
+    Postgres renders numeric(38, 8), so it matches Market.KLINE_DIGEST_SQL.
+    """
+    normalized = "|".join(
+        (
+            format(value.quantize(DIGEST_QUANTUM, rounding=ROUND_HALF_UP), "f")
+            if isinstance(value, Decimal)
+            else "" if value is None else str(value)
+        )
+        for value in values
+    )
+    digest = hashlib.md5(normalized.encode()).digest()[:8]
+    return int.from_bytes(digest, "big", signed=True)
+
+
 def parse_dates(
     start_date: Optional[str],
     end_date: Optional[str],
@@ -50,3 +136,77 @@ def pivotid(df: pd.DataFrame, l: int, n1: int, n2: int) -> int:
         return 2
     else:
         return 0
+
+
+def pivot_points(low, high, n1: int, n2: int) -> np.ndarray:
+    """
+    Vectorized pivotid over a whole series, same 0/1/2/3 encoding. A bar is a
+    pivot low (high) when no low (high) within n1 bars before and n2 after is
+    strictly lower (higher). Bars without a full window are 0. Like pivotid,
+    NaNs never disqualify a bar and a NaN bar is a pivot.
+    """
+    low = pd.to_numeric(pd.Series(low), errors="coerce").to_numpy(dtype=float)
+    high = pd.to_numeric(pd.Series(high), errors="coerce").to_numpy(dtype=float)
+    pivots = np.zeros(len(low), dtype=np.int8)
+    window = n1 + n2 + 1
+    if len(low) < window:
+        return pivots
+
+    # Window extremes with NaNs pushed out of the way, one row per centre bar
+    window_low = sliding_window_view(np.nan_to_num(low, nan=np.inf), window).min(1)
+    window_high = sliding_window_view(np.nan_to_num(high, nan=-np.inf), window).max(1)
+    centre = slice(n1, len(low) - n2)
+    is_low = ~(low[centre] > window_low)
+    is_high = ~(high[centre] < window_high)
+    pivots[centre] = is_low + 2 * is_high
+    return pivots
+
+
+def _sparse_extremes(values: np.ndarray, ufunc, max_width: int) -> list:
+    """
+    levels[j][i] = ufunc.reduce(values[i : i + 2**j]) for every 2**j <= max_width,
+    each level is one vectorized ufunc over the previous one.
+    """
+    levels = [values]
+    width = 1
+    while width * 2 <= max_width:
+        previous = levels[-1]
+        levels.append(ufunc(previous[:-width], previous[width:]))
+        width *= 2
+    return levels
+
+
+def _window_extremes(levels: list, ufunc, n: int, window: int) -> np.ndarray:
+    """ufunc over every full `window` of the series, from two overlapping levels"""
+    j = window.bit_length() - 1
+    offset = window - 2**j
+    count = n - window + 1
+    return ufunc(levels[j][:count], levels[j][offset : offset + count])
+
+
+def multi_lookback_pivot_points(
+    low, high, lookbacks: List[int]
+) -> Dict[int, np.ndarray]:
+    """
+    pivot_points(low, high, k, k) for every k in `lookbacks`. The power of two
+    window extremes are built once and shared, so each extra lookback costs
+    two lookups and a comparison per bar.
+    """
+    low = pd.to_numeric(pd.Series(low), errors="coerce").to_numpy(dtype=float)
+    high = pd.to_numeric(pd.Series(high), errors="coerce").to_numpy(dtype=float)
+    n = len(low)
+    max_window = 2 * max(lookbacks, default=0) + 1
+    lows = _sparse_extremes(np.nan_to_num(low, nan=np.inf), np.minimum, max_window)
+    highs = _sparse_extremes(np.nan_to_num(high, nan=-np.inf), np.maximum, max_window)
+
+    result = {}
+    for lookback in lookbacks:
+        pivots = np.zeros(n, dtype=np.int8)
+        window = 2 * lookback + 1
+        if n >= window:
+            centre = slice(lookback, n - lookback)
+            is_low = ~(low[centre] > _window_extremes(lows, np.minimum, n, window))
+            is_high = ~(high[centre] < _window_extremes(highs, np.maximum, n, window))
+            pivots[centre] = is_low + 2 * is_high
+        result[lookback] = pivots
+    return result
@@ -0,0 +1,35 @@
+import argparse
+from dataManagers.ByBitMarketDataManager import ByBitDataService
+
+
+def main(days=7, timeframes=None, symbols=None):
+    bb = ByBitDataService()
+    cached = bb.warm_linear_instrument_klines_cache(
+        days=days, timeframes=timeframes, symbols=symbols
+    )
+    print(f"done : cached {cached} klines")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Seed the Redis kline cache from Postgres."
+    )
+    parser.add_argument(
+        "--days", type=int, default=7, help="How many days back to cache"
+    )
+    parser.add_argument(
+        "--timeframes",
+        nargs="*",
+        default=None,
+        help="Timeframes to cache, all of them by default",
+    )
+    parser.add_argument(
+        "--symbols",
+        nargs="*",
+        default=None,
+        help="Symbols to cache, all USDT linear instruments by default",
+    )
+
+    args = parser.parse_args()
+
+    main(days=args.days, timeframes=args.timeframes, symbols=args.symbols)
@@ -1,7 +1,18 @@
 from pybit.unified_trading import HTTP
-from typing import Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
 from enum import Enum
 from datetime import datetime, timedelta, date
+import json
+import threading
+import time
+import websocket
+
+# ByBit allows 600 requests per 5 second window per IP
+BYBIT_IP_REQUESTS_PER_SECOND = 120
+
+BYBIT_PUBLIC_LINEAR_STREAM = "wss://stream.bybit.com/v5/public/linear"
+BYBIT_PUBLIC_LINEAR_STREAM_TESTNET = "wss://stream-testnet.bybit.com/v5/public/linear"
 
 
 class Category(Enum):
@@ -34,11 +45,48 @@ class Interval(Enum):
     _1_MONTH = "M"
 
 
+class TokenBucket:
+    """Thread-safe token bucket, one token per REST request"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Block until `tokens` are available, returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+# Shared by every MarketData instance in the process, the quota is per IP
+ip_rate_limiter = TokenBucket(rate=BYBIT_IP_REQUESTS_PER_SECOND)
+
+
 class MarketData:
     def __init__(
-        self, testnet: bool = False, api_key: str = None, api_secret: str = None
+        self,
+        testnet: bool = False,
+        api_key: str = None,
+        api_secret: str = None,
+        rate_limiter: Optional[TokenBucket] = None,
     ):
         self.session = HTTP(testnet=testnet, api_key=api_key, api_secret=api_secret)
+        self.rate_limiter = rate_limiter or ip_rate_limiter
 
     def fetch_instruments(
         self,
@@ -47,30 +95,46 @@ class MarketData:
         baseCoin: Optional[str] = None,
         limit: Optional[int] = None,
     ) -> List[Dict]:
-        """Fetch instruments for a specific category"""
+        """
+        Fetch instruments for a specific category, following nextPageCursor
+        until every page is read. `limit` is the page size. Returns an empty
+        list on error rather than a truncated catalogue.
+        """
         params = {"category": category.value}
         if limit:
             params["limit"] = limit
         if status:
             params["status"] = status
         if baseCoin:
-            params["base"] = baseCoin
+            params["baseCoin"] = baseCoin
 
+        instruments = []
         try:
-            response = self.session.get_instruments_info(**params)
-            return response.get("result", {}).get("list", [])
+            while True:
+                self.rate_limiter.acquire()
+                response = self.session.get_instruments_info(**params)
+                result = response.get("result", {})
+                instruments.extend(result.get("list", []))
+                cursor = result.get("nextPageCursor")
+                if not cursor:
+                    return instruments
+                params["cursor"] = cursor
         except Exception as e:
             print(f"Error fetching instruments for {category.value}: {str(e)}")
             return []
 
     def fetch_all_instruments(
-        self, limit: Optional[int] = None
+        self, limit: Optional[int] = None, status: Optional[str] = None
     ) -> Dict[str, List[Dict]]:
-        """Fetch instruments for all categories"""
-        results = {}
-        for category in Category:
-            results[category.value] = self.fetch_instruments(category, limit)
-        return results
+        """Fetch instruments for all categories concurrently"""
+        with ThreadPoolExecutor(max_workers=len(Category)) as executor:
+            futures = {
+                category.value: executor.submit(
+                    self.fetch_instruments, category, status=status, limit=limit
+                )
+                for category in Category
+            }
+        return {category: future.result() for category, future in futures.items()}
 
     def fetch_kline(
         self,
@@ -111,6 +175,7 @@ class MarketData:
             params["end"] = end_time
 
         try:
+            self.rate_limiter.acquire()
             response = self.session.get_kline(**params)
             return response.get("result", {}).get("list", [])
         except Exception as e:
@@ -128,3 +193,96 @@ class MarketData:
         start_time = datetime.combine(kline_date, datetime.min.time())
         end_time = start_time + timedelta(days=1) - timedelta(seconds=1)
         return self.fetch_kline(category, symbol, interval, start_time, end_time, limit)
+
+
+class KlineStream:
+    """
+    Public linear kline WebSocket for a set of symbols. Runs in a background
+    thread, reconnects with exponential backoff and resubscribes every topic
+    on each new connection.
+    """
+
+    # Topics per subscribe request
+    subscribe_batch_size = 10
+
+    def __init__(
+        self,
+        symbols: List[str],
+        interval: Interval,
+        on_kline: Callable[[str, Dict], None],
+        on_reconnect: Optional[Callable[[], None]] = None,
+        testnet: bool = False,
+        url: Optional[str] = None,
+        ping_interval: float = 20,
+        max_backoff: float = 30,
+    ):
+        self.url = url or (
+            BYBIT_PUBLIC_LINEAR_STREAM_TESTNET
+            if testnet
+            else BYBIT_PUBLIC_LINEAR_STREAM
+        )
+        self.topics = [f"kline.{interval.value}.{symbol}" for symbol in symbols]
+        self.on_kline = on_kline
+        self.on_reconnect = on_reconnect
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.connections = 0
+        self.ws = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _on_open(self, ws):
+        for i in range(0, len(self.topics), self.subscribe_batch_size):
+            args = self.topics[i : i + self.subscribe_batch_size]
+            ws.send(json.dumps({"op": "subscribe", "args": args}))
+        self.connections += 1
+        self.backoff = 1
+        if self.connections > 1 and self.on_reconnect is not None:
+            self.on_reconnect()
+
+    def _on_message(self, ws, message):
+        message = json.loads(message)
+        topic = message.get("topic", "")
+        if not topic.startswith("kline."):
+            return
+        symbol = topic.rsplit(".", 1)[-1]
+        for kline in message.get("data", []):
+            self.on_kline(symbol, kline)
+
+    def _on_error(self, ws, error):
+        print(f"Kline stream error: {error}")
+
+    def _heartbeat(self):
+        while not self.stopped.wait(self.ping_interval):
+            try:
+                if self.ws is not None and self.ws.sock and self.ws.sock.connected:
+                    self.ws.send(json.dumps({"op": "ping"}))
+            except Exception as e:
+                print(f"Kline stream ping failed: {e}")
+
+    def _run(self):
+        self.backoff = 1
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+        while not self.stopped.is_set():
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+            )
+            self.ws.run_forever()
+            if self.stopped.wait(self.backoff):
+                break
+            print(f"Kline stream disconnected, reconnecting to {self.url}")
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.ws is not None:
+            self.ws.close()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class KlineReplayServer:
+    """
+    Local stand-in for ByBit's public WebSocket. Answers subscribe and ping
+    requests the way the exchange does, then replays recorded messages for the
+    subscribed topics. With `disconnect_after` set, each connection is closed
+    once that many messages were sent, to exercise reconnects.
+    """
+
+    def __init__(
+        self,
+        messages: List[Dict],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        disconnect_after: Optional[int] = None,
+    ):
+        self.messages = messages
+        self.disconnect_after = disconnect_after
+        self.subscriptions = []
+        self.connections = 0
+        self.server = socket.create_server((host, port))
+        self.host, self.port = self.server.getsockname()[:2]
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/v5/public/linear"
+
+    def _handshake(self, conn: socket.socket):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("Client closed during handshake")
+            request += chunk
+        headers = {}
+        for line in request.decode().split("\r\n")[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(
+            hashlib.sha1(
+                (headers["sec-websocket-key"] + WEBSOCKET_GUID).encode()
+            ).digest()
+        ).decode()
+        conn.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+
+    def _recv_exact(self, conn: socket.socket, n: int) -> bytes:
+        data = b""
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("Client closed the connection")
+            data += chunk
+        return data
+
+    def _recv_frame(self, conn: socket.socket):
+        first, second = self._recv_exact(conn, 2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self._recv_exact(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self._recv_exact(conn, 8))[0]
+        mask = self._recv_exact(conn, 4) if second & 0x80 else b"\x00" * 4
+        payload = self._recv_exact(conn, length)
+        return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+    def _send_frame(self, conn: socket.socket, payload: bytes, opcode: int = 0x1):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 2**16:
+            header += bytes([126]) + struct.pack(">H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack(">Q", len(payload))
+        conn.sendall(header + payload)
+
+    def _send_json(self, conn: socket.socket, message: Dict):
+        self._send_frame(conn, json.dumps(message).encode())
+
+    def _serve(self, conn: socket.socket):
+        sent = 0
+        with conn:
+            self._handshake(conn)
+            self.connections += 1
+            while not self.stopped.is_set():
+                opcode, payload = self._recv_frame(conn)
+                if opcode == 0x8:
+                    return
+                if opcode == 0x9:
+                    self._send_frame(conn, payload, opcode=0xA)
+                    continue
+                if opcode != 0x1:
+                    continue
+                request = json.loads(payload)
+                if request.get("op") == "ping":
+                    self._send_json(
+                        conn, {"success": True, "ret_msg": "pong", "op": "ping"}
+                    )
+                    continue
+                if request.get("op") != "subscribe":
+                    continue
+                topics = request.get("args", [])
+                self.subscriptions.append(topics)
+                self._send_json(
+                    conn, {"success": True, "ret_msg": "", "op": "subscribe"}
+                )
+                for message in self.messages:
+                    if message.get("topic") not in topics:
+                        continue
+                    self._send_json(conn, message)
+                    sent += 1
+                    if (
+                        self.disconnect_after is not None
+                        and sent >= self.disconnect_after
+                    ):
+                        return
+
+    def _accept(self):
+        self.server.settimeout(0.1)
+        while not self.stopped.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(None)
+            threading.Thread(
+                target=self._serve_quietly, args=(conn,), daemon=True
+            ).start()
+
+    def _serve_quietly(self, conn: socket.socket):
+        try:
+            self._serve(conn)
+        except (ConnectionError, OSError):
+            pass
+
+    def start(self):
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        self.server.close()